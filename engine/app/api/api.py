@@ -1,6 +1,7 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
 
-from .routers import health, workspace, upload, chat, mcp, matrix, code
+from .deps import require_admin
+from .routers import health, workspace, upload, chat, mcp, matrix, code, admin
 
 api_router = APIRouter()
 
@@ -12,3 +13,4 @@ api_router.include_router(chat.router, prefix="/chat", tags=["chat"])
 api_router.include_router(code.router, prefix="/code", tags=["code"])
 api_router.include_router(mcp.router, prefix="/mcp", tags=["mcp"])
 api_router.include_router(matrix.router, prefix="/matrix", tags=["matrix"])
+api_router.include_router(admin.router, prefix="/admin", tags=["admin"], dependencies=[Depends(require_admin)])
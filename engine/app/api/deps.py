@@ -1,13 +1,15 @@
 import logging
+import secrets
 from typing import AsyncGenerator
 from app.cloud.cf.r2_client import R2Client
-from fastapi import Request, HTTPException, status
+from fastapi import Header, Request, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.mcp import MCPManager
 from app.kg import KnowledgeGraph
-from app.workers import ThreadPoolWorkerQueue
+from app.workers import ThreadPoolWorkerQueue, ProcessPoolWorker
 
 from app.db.session import AsyncSessionLocal
+from app.settings.config import settings
 
 logger = logging.getLogger(__name__)
 
@@ -93,6 +95,23 @@ def get_thread_pool_worker(request: Request):
     return thread_pool_worker
 
 
+def get_process_pool_worker(request: Request):
+    """
+    FastAPI dependency that provides the process pool worker per request.
+    """
+    process_pool_worker: ProcessPoolWorker | None = getattr(request.app.state, "process_pool_worker", None)
+
+    if process_pool_worker is None or not process_pool_worker:
+        logger.error("Process pool worker dependency requested, but worker is not available or not initialized.")
+
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Process pool worker is not available or not initialized."
+        )
+    
+    return process_pool_worker
+
+
 def get_graph_db(request: Request):
     """
     FastAPI dependency that provides a graph database connection per request.
@@ -107,4 +126,23 @@ def get_graph_db(request: Request):
             detail="Graph database is not available or not initialized."
         )
     
-    return graph_db
\ No newline at end of file
+    return graph_db
+
+
+def require_admin(x_admin_token: str | None = Header(default=None)):
+    """
+    FastAPI dependency that only lets requests carrying the `ADMIN_API_TOKEN` in the `X-Admin-Token` header through.
+    """
+    if not settings.admin_api_token:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin API is disabled, ADMIN_API_TOKEN is not configured."
+        )
+
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, settings.admin_api_token):
+        logger.warning("Admin API request rejected, missing or invalid admin token.")
+
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Missing or invalid admin token."
+        )
@@ -0,0 +1,37 @@
+import logging
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from app.api.deps import get_graph_db
+from app.api.schema.kg import ResetGraphResp
+from app.kg import GraphError, KnowledgeGraph
+
+logger = logging.getLogger("app.api.routers.admin")
+
+router = APIRouter()
+
+@router.post(
+    "/kg/reset",
+    response_model=ResetGraphResp,
+    status_code=status.HTTP_200_OK,
+    summary="Delete every node of the Knowledge Graph",
+)
+async def reset_graph(
+    *,
+    batch_size: int | None = Query(default=None, ge=1, description="Nodes deleted per transaction, defaults to NEO4J_RESET_BATCH_SIZE."),
+    graph_db: KnowledgeGraph = Depends(get_graph_db),
+) -> ResetGraphResp:
+    """
+    Deletes all nodes and relationships of the Knowledge Graph in batches, keeping its schema version.
+    Learned metrics have to be ingested again afterwards.
+    """
+    logger.warning("Knowledge Graph reset requested through the admin API.")
+
+    try:
+        nodes_deleted = await graph_db.clear_graph(batch_size)
+        schema_version = await graph_db.schema_version()
+    except GraphError as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to reset the Knowledge Graph: {e.message}"
+        )
+
+    return ResetGraphResp(nodes_deleted=nodes_deleted, schema_version=schema_version)
@@ -1,5 +1,9 @@
 from fastapi import APIRouter, status
 from pydantic import BaseModel
+from app.services.parquet_cache import ParquetCache
+from app.services.query_cache import QueryResultCache
+from app.llm.embeddings.cache import EmbeddingCache
+from app.services.vector_index import InMemoryVectorIndex
 
 
 class HealthStatus(BaseModel):
@@ -9,6 +13,15 @@ class HealthStatus(BaseModel):
     status: str
     message: str
 
+class CacheStats(BaseModel):
+    """
+    Hit and miss counters of the in-process caches.
+    """
+    parquet: dict
+    query_results: dict
+    embeddings: dict
+    vector_index: dict
+
 router = APIRouter()
 
 @router.get(
@@ -22,3 +35,20 @@ async def health_check() -> HealthStatus:
     Health check endpoint.
     """
     return HealthStatus(status="ok", message="API is healthy")
+
+@router.get(
+    "/caches",
+    response_model=CacheStats,
+    status_code=status.HTTP_200_OK,
+    summary="Report cache hit and miss counters",
+)
+async def cache_stats() -> CacheStats:
+    """
+    Reports the counters of the in-process caches, used to size them.
+    """
+    return CacheStats(
+        parquet=ParquetCache().stats(),
+        query_results=QueryResultCache().stats(),
+        embeddings=EmbeddingCache().stats(),
+        vector_index=InMemoryVectorIndex().stats(),
+    )
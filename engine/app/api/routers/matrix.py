@@ -6,7 +6,7 @@ from app.api.schema.matrix import AskMatrixReq, AskMatrixResp
 from app.llm.modules.matrix import MatrixModule
 from mcp.client.sse import sse_client
 from mcp import ClientSession
-from app.llm.tools import FindRelevantCSV, GetParquetFileSchemaTool, QueryParquetFileUsingStorageKeyTool, QueryParquetFileUsingUploadIdTool
+from app.llm.tools import FindRelevantCSV, FindRelevantCSVBatch, GetParquetFileSchemaTool, QueryParquetFileUsingStorageKeyTool, QueryParquetFileUsingUploadIdTool
 
 logger = logging.getLogger("app.api.routers.matrix")
 
@@ -43,6 +43,7 @@ async def ask_matrix(req: AskMatrixReq):
 
             tools = [
                 FindRelevantCSV,
+                FindRelevantCSVBatch,
                 GetParquetFileSchemaTool,
                 QueryParquetFileUsingStorageKeyTool,
                 QueryParquetFileUsingUploadIdTool
@@ -4,23 +4,40 @@ import uuid
 import duckdb
 import logging
 import traceback
+from typing import BinaryIO
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, status
+from fastapi.responses import StreamingResponse
 from app.utils import APP_LOGGER_NAME 
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.api import deps
-from app.cloud import R2Client, R2UploadError
+from app.cloud import R2Client, R2ClientError
 from app.services.upload import csv as csv_service
+from app.services.upload import query as query_service
 from app.settings.config import settings
 from app.db.models.upload import UploadType, Upload as UploadModel, ProcessingStatus
-from app.api.schema.upload  import UploadCreateResp, ProcessUploadResp, CheckAbleToAccessFileResp
+from app.api.schema.upload  import UploadCreateResp, ProcessUploadResp, CheckAbleToAccessFileResp, UploadQueryReq
 from app.services.duck_db import DuckDBConn
-from app.workers import ThreadPoolWorkerQueue
+from app.services.parquet_cache import ParquetCache
+from app.workers import ThreadPoolWorkerQueue, ProcessPoolWorker
 
 logger = logging.getLogger(APP_LOGGER_NAME)
 
 # Router for CSV Upload
 router = APIRouter()
 
+
+def _upload_create_resp(upload: UploadModel, deduplicated: bool = False) -> UploadCreateResp:
+    return UploadCreateResp(
+        id=upload.id,
+        file_name=upload.file_name,
+        file_size=upload.file_size,
+        file_type=upload.file_type,
+        storage_key=upload.storage_key,
+        storage_url=upload.storage_url,
+        deduplicated=deduplicated,
+    )
+
 @router.get(
     "/validate",
     status_code=status.HTTP_200_OK,
@@ -51,31 +68,35 @@ async def validate_csv_upload(
         )
         
         try:
-            with DuckDBConn() as duckdb_conn:
-                logger.info(f"Upload Storage Key: {upload.storage_key}")
-                s3_uri = f"s3://{settings.r2_bucket_name}/{upload.storage_key}"
+            logger.info(f"Upload Storage Key: {upload.storage_key}")
+            lease = await asyncio.to_thread(ParquetCache().lease, upload.storage_key)
 
-                describe_query = "DESCRIBE SELECT * FROM read_parquet(?);"
+            with lease as parquet_uri:
+                async with DuckDBConn() as duckdb_conn:
 
-                conn = duckdb_conn.conn
+                    describe_query = "DESCRIBE SELECT * FROM read_parquet(?);"
 
-                if conn is None:
-                    raise HTTPException(
-                        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                        detail="Failed to establish DuckDB connection.",
-                    )
-                
-                headers_result = conn.execute(describe_query, parameters=[s3_uri]).fetchall()
+                    conn = duckdb_conn.conn
 
-                if not headers_result:
-                    raise HTTPException(
-                        status_code=status.HTTP_404_NOT_FOUND,
-                        detail="No headers found for the CSV file.",
+                    if conn is None:
+                        raise HTTPException(
+                            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                            detail="Failed to establish DuckDB connection.",
+                        )
+                
+                    headers_result = await asyncio.to_thread(
+                        lambda: conn.execute(describe_query, parameters=[parquet_uri]).fetchall()
                     )
-                response.able_to_access = True
-                response.error_message = None
 
-                return response
+                    if not headers_result:
+                        raise HTTPException(
+                            status_code=status.HTTP_404_NOT_FOUND,
+                            detail="No headers found for the CSV file.",
+                        )
+                    response.able_to_access = True
+                    response.error_message = None
+
+                    return response
 
         except duckdb.Error as e:
             logger.error(f"DuckDB Error: {e}")
@@ -195,6 +216,114 @@ async def get_upload(
             detail="An error occurred while retrieving the upload.",
         )
 
+@router.post(
+    "/query",
+    status_code=status.HTTP_200_OK,
+    summary="Stream query results over an upload",
+    tags=["upload"],
+)
+async def query_upload(
+    *,
+    db: AsyncSession = Depends(deps.get_db),
+    query_req: UploadQueryReq,
+):
+    """
+    Runs a DuckDB query against an upload and streams one page of the result,
+    as newline delimited JSON or in the Arrow IPC stream format.
+
+    The SQL must be a single SELECT reading the upload through the `upload` view, e.g.
+    `SELECT * FROM upload`. It runs in a DuckDB sandbox that can read nothing but this upload.
+    Pages follow the query's ORDER BY, queries without one are ordered by all of their columns.
+    When more rows follow the page, the `X-Next-Cursor` header carries the cursor to send with
+    the next request. A cursor only stays valid for the same query and the same version of the upload's data.
+    Every page sorts the rows before it, so paging stops at `upload_query_max_offset` rows.
+    """
+    page_size = min(query_req.page_size or settings.upload_query_page_size, settings.upload_query_max_page_size)
+
+    try:
+        upload = await csv_service.get_upload_by_id(db=db, upload_id=query_req.upload_id)
+        if not upload:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Upload not found",
+            )
+
+        if not upload.storage_key:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Upload does not have a valid storage key.",
+            )
+
+        storage_key = upload.storage_key
+        etag = await asyncio.to_thread(ParquetCache().etag, storage_key)
+        cursor = query_service.resolve_cursor(query_req.cursor, query_req.sql_query, etag)
+
+        lease = await asyncio.to_thread(ParquetCache().lease, storage_key)
+    except HTTPException as http_exc:
+        raise http_exc
+    except query_service.InvalidQueryCursorError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
+    except Exception as e:
+        logger.error(f"Error querying upload {query_req.upload_id}: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An error occurred while querying the upload.",
+        )
+
+    try:
+        page, has_more = await asyncio.to_thread(
+            query_service.run_page,
+            lease.uri,
+            query_req.sql_query,
+            cursor.offset,
+            page_size,
+        )
+    except query_service.InvalidUploadQueryError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
+    except duckdb.Error as e:
+        logger.error(f"DuckDB error querying upload {query_req.upload_id}: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Query failed: {e}",
+        )
+    except Exception as e:
+        logger.error(f"Error querying upload {query_req.upload_id}: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An error occurred while querying the upload.",
+        )
+    finally:
+        lease.release()
+
+    headers = {"X-Has-More": "true" if has_more else "false"}
+    if has_more:
+        headers["X-Next-Cursor"] = query_service.QueryCursor(
+            offset=cursor.offset + page_size,
+            sql_hash=cursor.sql_hash,
+            etag=etag,
+        ).encode()
+
+    batches = query_service.iter_page_batches(page)
+
+    if query_req.format == "arrow":
+        return StreamingResponse(
+            query_service.stream_arrow_ipc(batches, page.schema),
+            media_type="application/vnd.apache.arrow.stream",
+            headers=headers,
+        )
+
+    return StreamingResponse(
+        query_service.stream_ndjson(batches),
+        media_type="application/x-ndjson",
+        headers=headers,
+    )
+
 # CSV Upload Endpoint
 @router.post(
     "/process",
@@ -239,6 +368,16 @@ async def process_csv(
                 detail="Upload does not have a valid storage key.",
             )
         
+        if upload.processing_status == ProcessingStatus.PROCESSED:
+            # Deduplicated re-uploads land here, their embeddings and graph nodes already exist
+            logger.info(f"Upload with ID {upload_id} is already processed, reusing existing results.")
+            return ProcessUploadResp(
+                id=upload.id,
+                embeddings_count=0,
+                file_name=upload.file_name,
+                file_type=upload.file_type,
+            )
+        
         ems = await csv_service.process_csv(
             db=db,
             upload=upload,
@@ -274,6 +413,7 @@ async def upload_csv(
     csv_file: UploadFile = File(..., description="CSV file to upload"),
     db: AsyncSession = Depends(deps.get_db),
     r2_client: R2Client = Depends(deps.get_r2_client),
+    process_pool: ProcessPoolWorker = Depends(deps.get_process_pool_worker),
 ):
     """
     Accepts CSV, and uploads using R2Client.
@@ -284,29 +424,48 @@ async def upload_csv(
             detail="Invalid file type. Only CSV files are allowed.",
         )
     
-    parquet_buffer: io.BytesIO | None = None
+    parquet_buffer: BinaryIO | None = None
     file_name = csv_file.filename[:-4] + ".parquet"
-    r2_object_key = f"uploads/parquet/{uuid.uuid4()}/{file_name}"
 
     try:
         logger.info(f"Processing CSV file: {csv_file.filename}")
 
-        parquet_buffer = await csv_service.convert_csv_to_parquet_stream(csv_file.file)
-        logger.info(f"CSV file converted to Parquet format: {file_name}")
+        async with csv_service.spool_csv_stream(csv_file.file) as (csv_path, content_hash):
+            existing_upload = await csv_service.get_upload_by_content_hash(db=db, content_hash=content_hash)
 
-        try:
-            r2_upload_url = await asyncio.to_thread(
-                r2_client.upload_fileobj,
-                file_obj=parquet_buffer,
-                object_key=r2_object_key,
-                content_type="application/vnd.apache.parquet",
-            )
-        except R2UploadError as e:
-            logger.error(f"R2 Upload Error: {e}")
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Failed to upload file to R2.",
-            )
+            if existing_upload:
+                logger.info(f"CSV file {csv_file.filename} is a duplicate of upload {existing_upload.id}, reusing it.")
+                return _upload_create_resp(existing_upload, deduplicated=True)
+
+            # Content addressed key, identical files always map to the same object
+            r2_object_key = csv_service.content_addressed_key(content_hash)
+
+            try:
+                if settings.r2_pipelined_upload:
+                    # Conversion and multipart upload overlap inside the process pool
+                    r2_upload_url, parquet_size = await csv_service.convert_csv_to_parquet_and_upload(
+                        csv_path,
+                        process_pool,
+                        object_key=r2_object_key,
+                    )
+                    logger.info(f"CSV file converted and uploaded in Parquet format: {file_name} ({parquet_size} bytes)")
+                else:
+                    parquet_buffer = await csv_service.convert_csv_to_parquet_stream(csv_path, process_pool)
+                    parquet_size = parquet_buffer.seek(0, io.SEEK_END)
+                    logger.info(f"CSV file converted to Parquet format: {file_name} ({parquet_size} bytes)")
+
+                    r2_upload_url = await asyncio.to_thread(
+                        r2_client.upload_fileobj,
+                        file_obj=parquet_buffer,
+                        object_key=r2_object_key,
+                        content_type="application/vnd.apache.parquet",
+                    )
+            except R2ClientError as e:
+                logger.error(f"R2 Upload Error: {e}")
+                raise HTTPException(
+                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail="Failed to upload file to R2.",
+                )
         
 
         if not r2_upload_url:
@@ -316,27 +475,30 @@ async def upload_csv(
                 detail="Failed to upload file to R2.",
             )
         
-        upload_info = await csv_service.create_upload(
-            db=db,
-            upload_info=UploadModel(
-                file_name=file_name,
-                file_type=UploadType.PARQUET,
-                file_size=parquet_buffer.getbuffer().nbytes,
-                storage_key=r2_object_key,
-                storage_url=r2_upload_url,
-            ),
-        )
+        try:
+            upload_info = await csv_service.create_upload(
+                db=db,
+                upload_info=UploadModel(
+                    file_name=file_name,
+                    file_type=UploadType.PARQUET,
+                    file_size=parquet_size,
+                    storage_key=r2_object_key,
+                    storage_url=r2_upload_url,
+                    content_hash=content_hash,
+                ),
+            )
+        except IntegrityError:
+            # A concurrent upload of the same content won the race, both wrote the same object
+            await db.rollback()
 
-        response = UploadCreateResp(
-            id = upload_info.id,
-            file_name= upload_info.file_name,
-            file_size= upload_info.file_size,
-            file_type= upload_info.file_type,
-            storage_key= upload_info.storage_key,
-            storage_url= upload_info.storage_url,
-        )
+            existing_upload = await csv_service.get_upload_by_content_hash(db=db, content_hash=content_hash)
+            if not existing_upload:
+                raise
 
-        return response
+            logger.info(f"CSV file {csv_file.filename} was concurrently uploaded as {existing_upload.id}, reusing it.")
+            return _upload_create_resp(existing_upload, deduplicated=True)
+
+        return _upload_create_resp(upload_info)
     except ValueError as ve:
         logger.error(f"Error During Processing CSV file: {ve}")
         raise HTTPException(
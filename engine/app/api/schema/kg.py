@@ -9,4 +9,11 @@ class EncodeCSVResp(BaseModel):
         "from_attributes": True,
     }
 
+# =============================
+
+# ===== Reset Graph ======
+class ResetGraphResp(BaseModel):
+    nodes_deleted: int
+    schema_version: int | None
+
 # =============================
\ No newline at end of file
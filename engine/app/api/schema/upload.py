@@ -1,6 +1,6 @@
 import uuid
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import Literal, Optional
 
 
 # ===== Upload Create ======
@@ -12,6 +12,7 @@ class UploadCreateResp(BaseModel):
     file_size: int
     storage_key: str
     storage_url: str
+    deduplicated: bool = False
 
     model_config = {
         "from_attributes": True,
@@ -58,4 +59,18 @@ class CheckAbleToAccessFileResp(BaseModel):
         "from_attributes": True,
     }
 
+# =============================
+
+# ===== Upload Query ======
+class UploadQueryReq(BaseModel):
+    upload_id: uuid.UUID
+    sql_query: str
+    format: Literal["ndjson", "arrow"] = "ndjson"
+    page_size: Optional[int] = Field(default=None, ge=1)
+    cursor: Optional[str] = None
+
+    model_config = {
+        "from_attributes": True,
+    }
+
 # =============================
\ No newline at end of file
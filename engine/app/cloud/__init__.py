@@ -1,4 +1,4 @@
-from .cf.r2_client import R2Client, R2ClientError, R2ConfigError, R2UploadError
+from .cf.r2_client import R2Client, R2ClientError, R2ConfigError, R2UploadError, R2DownloadError, R2MultipartWriter
 
 
-__all__ = ["R2Client", "R2ClientError", "R2ConfigError", "R2UploadError"]
\ No newline at end of file
+__all__ = ["R2Client", "R2ClientError", "R2ConfigError", "R2UploadError", "R2DownloadError", "R2MultipartWriter"]
\ No newline at end of file
@@ -1,10 +1,13 @@
 
 import logging
+import math
+import threading
 import boto3
 import boto3.s3
 import boto3.s3.transfer
 from botocore.config import Config
 from botocore.exceptions import NoCredentialsError, PartialCredentialsError, ClientError
+from concurrent.futures import ThreadPoolExecutor, Future
 from typing import Optional, BinaryIO
 
 from app.settings.config import settings
@@ -25,6 +28,166 @@ class R2UploadError(R2ClientError):
     """Error during R2 upload operation."""
     pass
 
+class R2DownloadError(R2ClientError):
+    """Error during R2 download operation."""
+    pass
+
+MIN_MULTIPART_CHUNKSIZE = 5 * 1024 * 1024
+"""
+Smallest part size S3 compatible stores accept for every part but the last one.
+"""
+
+MAX_MULTIPART_PARTS = 10_000
+"""
+Largest number of parts S3 compatible stores accept for a single multipart upload.
+"""
+
+MULTIPART_CHUNK_ALIGNMENT = 1024 * 1024
+"""
+Part sizes are rounded up to a whole number of MiB.
+"""
+
+class R2MultipartWriter:
+    """
+    Writable file-like object that uploads its content to R2 as a multipart upload.
+
+    Bytes are buffered until a full part is available, which is then uploaded in the background
+    while the caller keeps writing. At most `max_concurrency` parts are in flight at once, so memory
+    stays bounded at roughly `part_size * (max_concurrency + 1)`.
+
+    Call `close()` to upload the last part and complete the upload, or `abort()` to discard it.
+    """
+
+    def __init__(self, client, endpoint_url: str, bucket_name: str, object_key: str, part_size: int, max_concurrency: int, content_type: Optional[str] = None):
+        self._client = client
+        self._endpoint_url = endpoint_url
+        self._bucket_name = bucket_name
+        self._object_key = object_key
+        self._part_size = max(part_size, MIN_MULTIPART_CHUNKSIZE)
+
+        extra_args = {}
+        if content_type:
+            extra_args['ContentType'] = content_type
+
+        try:
+            response = self._client.create_multipart_upload(Bucket=bucket_name, Key=object_key, **extra_args)
+        except ClientError as e:
+            logger.error("Client error creating multipart upload: %s", e)
+            raise R2UploadError("Client error creating multipart upload") from e
+
+        self._upload_id = response['UploadId']
+
+        self._buffer = bytearray()
+        self._position = 0
+        self._parts: list[Future] = []
+        self._in_flight = threading.BoundedSemaphore(max_concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="r2-multipart")
+        self._closed = False
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def writable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        # Parts are only sent once full, the remainder is uploaded on close.
+        pass
+
+    def write(self, data) -> int:
+        if self._closed:
+            raise ValueError("I/O operation on closed R2MultipartWriter.")
+
+        self._buffer += data
+        self._position += len(data)
+
+        while len(self._buffer) >= self._part_size:
+            chunk = bytes(self._buffer[:self._part_size])
+            del self._buffer[:self._part_size]
+            self._submit_part(chunk)
+
+        return len(data)
+
+    def close(self) -> str:
+        """
+        Uploads the remaining buffer as the last part and completes the multipart upload.
+
+        Returns the URL of the uploaded object.
+        """
+        if self._closed:
+            return self._object_url()
+
+        try:
+            if self._buffer or not self._parts:
+                self._submit_part(bytes(self._buffer))
+                self._buffer.clear()
+
+            parts = [future.result() for future in self._parts]
+
+            self._client.complete_multipart_upload(
+                Bucket=self._bucket_name,
+                Key=self._object_key,
+                UploadId=self._upload_id,
+                MultipartUpload={'Parts': parts},
+            )
+            logger.info("Multipart upload completed successfully to R2: %s (%d parts, %d bytes)", self._object_key, len(parts), self._position)
+
+            return self._object_url()
+        except Exception as e:
+            logger.error("Error completing multipart upload: %s", e)
+            self.abort()
+            raise R2UploadError("Error completing multipart upload") from e
+        finally:
+            self._closed = True
+            self._executor.shutdown(wait=False)
+
+    def abort(self):
+        """
+        Aborts the multipart upload, discarding any parts already uploaded.
+        """
+        self._closed = True
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+        try:
+            self._client.abort_multipart_upload(Bucket=self._bucket_name, Key=self._object_key, UploadId=self._upload_id)
+            logger.info("Multipart upload aborted: %s", self._object_key)
+        except ClientError as e:
+            logger.error("Client error aborting multipart upload: %s", e)
+
+    def _submit_part(self, chunk: bytes):
+        # Surface a failed part as soon as possible instead of after the whole file is written
+        for future in self._parts:
+            if future.done() and future.exception() is not None:
+                raise R2UploadError("Client error during multipart upload") from future.exception()
+
+        part_number = len(self._parts) + 1
+        if part_number > MAX_MULTIPART_PARTS:
+            raise R2UploadError(f"Multipart upload exceeded {MAX_MULTIPART_PARTS} parts, pass a larger size hint.")
+
+        # Blocks the writer while `max_concurrency` parts are already in flight
+        self._in_flight.acquire()
+        self._parts.append(self._executor.submit(self._upload_part, part_number, chunk))
+
+    def _upload_part(self, part_number: int, chunk: bytes) -> dict:
+        try:
+            response = self._client.upload_part(
+                Bucket=self._bucket_name,
+                Key=self._object_key,
+                UploadId=self._upload_id,
+                PartNumber=part_number,
+                Body=chunk,
+            )
+            return {'ETag': response['ETag'], 'PartNumber': part_number}
+        finally:
+            self._in_flight.release()
+
+    def _object_url(self) -> str:
+        return f"{self._endpoint_url}/{self._bucket_name}/{self._object_key}"
+
 # R2Client is a singleton class that manages the connection to Cloudflare R2 storage.
 class R2Client(metaclass=SingletonMeta):
     """
@@ -40,12 +203,9 @@ class R2Client(metaclass=SingletonMeta):
         self._access_key_id = settings.r2_access_key_id
         self._secret_access_key = settings.r2_secret_access_key
 
-        self._transfer_config = boto3.s3.transfer.TransferConfig(
-            multipart_threshold=1024 * 25,
-            max_concurrency=10,
-            multipart_chunksize=1024 * 25,
-            use_threads=True,
-        )
+        self._multipart_threshold = settings.r2_multipart_threshold
+        self._multipart_min_chunksize = max(settings.r2_multipart_min_chunksize, MIN_MULTIPART_CHUNKSIZE)
+        self._multipart_max_concurrency = settings.r2_multipart_max_concurrency
 
         # Initialize the Boto3 client
         self._client = self._create_client()
@@ -87,6 +247,30 @@ class R2Client(metaclass=SingletonMeta):
             raise R2ConfigError("Error creating R2 client") from e
         
 
+    def transfer_config_for(self, object_size: Optional[int]) -> boto3.s3.transfer.TransferConfig:
+        """
+        Builds the transfer configuration for an object of the given size.
+
+        The part size starts at `r2_multipart_min_chunksize` and grows with the object so the
+        upload stays within the multipart part limit. Concurrency is capped at the number of parts,
+        so small objects do not spin up idle threads. Unknown sizes use the minimum part size.
+        """
+        chunksize = self._multipart_min_chunksize
+        concurrency = self._multipart_max_concurrency
+
+        if object_size is not None and object_size > 0:
+            chunksize = max(chunksize, math.ceil(object_size / MAX_MULTIPART_PARTS))
+            chunksize = math.ceil(chunksize / MULTIPART_CHUNK_ALIGNMENT) * MULTIPART_CHUNK_ALIGNMENT
+
+            concurrency = max(1, min(concurrency, math.ceil(object_size / chunksize)))
+
+        return boto3.s3.transfer.TransferConfig(
+            multipart_threshold=self._multipart_threshold,
+            max_concurrency=concurrency,
+            multipart_chunksize=chunksize,
+            use_threads=True,
+        )
+
     def close(self):
         """
         Close the R2 client connection.
@@ -112,6 +296,7 @@ class R2Client(metaclass=SingletonMeta):
             if content_type:
                 extra_args['ContentType'] = content_type
 
+            object_size = file_obj.seek(0, 2) if file_obj.seekable() else None
             file_obj.seek(0)  # Ensure the file pointer is at the beginning
 
             self._client.upload_fileobj(
@@ -119,7 +304,7 @@ class R2Client(metaclass=SingletonMeta):
                 self._bucket_name,
                 object_key,
                 ExtraArgs=extra_args,
-                Config=self._transfer_config
+                Config=self.transfer_config_for(object_size),
             )
             logger.info("File uploaded successfully to R2: %s", object_key)
 
@@ -132,4 +317,68 @@ class R2Client(metaclass=SingletonMeta):
 
         except Exception as e:
             logger.error("Error setting extra arguments for upload: %s", e)
-            raise R2UploadError("Error setting extra arguments for upload") from e
\ No newline at end of file
+            raise R2UploadError("Error setting extra arguments for upload") from e
+
+    def open_multipart_writer(self, object_key: str, content_type: Optional[str] = None, size_hint: Optional[int] = None) -> R2MultipartWriter:
+        """
+        Opens a writable stream that is uploaded to R2 as a multipart upload while it is being written.
+
+        Part size and concurrency follow `transfer_config_for(size_hint)`, pass an upper bound of the
+        final object size when it is known so large streams stay within the part limit.
+        """
+        if not self._client:
+            logger.error("R2 Client not initialized, cannot upload file.")
+
+            raise R2ConfigError("R2 Client not initialized, cannot upload file.")
+
+        transfer_config = self.transfer_config_for(size_hint)
+
+        return R2MultipartWriter(
+            client=self._client,
+            endpoint_url=self._endpoint_url,
+            bucket_name=self._bucket_name,
+            object_key=object_key,
+            part_size=transfer_config.multipart_chunksize,
+            max_concurrency=transfer_config.max_concurrency,
+            content_type=content_type,
+        )
+
+    def head_object(self, object_key: str) -> tuple[str, int]:
+        """
+        Fetches the metadata of an object in R2.
+
+        Returns the object's ETag and size in bytes.
+        """
+        if not self._client:
+            logger.error("R2 Client not initialized, cannot fetch object metadata.")
+
+            raise R2ConfigError("R2 Client not initialized, cannot fetch object metadata.")
+
+        try:
+            response = self._client.head_object(Bucket=self._bucket_name, Key=object_key)
+
+            return response['ETag'].strip('"'), response['ContentLength']
+        except ClientError as e:
+            logger.error("Client error fetching object metadata: %s", e)
+            raise R2DownloadError("Client error fetching object metadata") from e
+
+    def download_file(self, object_key: str, file_path: str, object_size: Optional[int] = None):
+        """
+        Downloads an object from R2 to a local file, using ranged parallel requests if necessary.
+        """
+        if not self._client:
+            logger.error("R2 Client not initialized, cannot download file.")
+
+            raise R2ConfigError("R2 Client not initialized, cannot download file.")
+
+        try:
+            self._client.download_file(
+                self._bucket_name,
+                object_key,
+                file_path,
+                Config=self.transfer_config_for(object_size),
+            )
+            logger.info("File downloaded successfully from R2: %s", object_key)
+        except ClientError as e:
+            logger.error("Client error during download: %s", e)
+            raise R2DownloadError("Client error during download") from e
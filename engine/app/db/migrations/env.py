@@ -18,6 +18,7 @@ try:
     from app.db.models import vector_embedding # noqa: F401
     from app.db.models import upload # noqa: F401
     from app.db.models import workspace_upload # noqa: F401
+    from app.db.models import embedding_cache # noqa: F401
 except ImportError as e:
     print(f"Alembic: Error importing models or Base: {e}")
     raise
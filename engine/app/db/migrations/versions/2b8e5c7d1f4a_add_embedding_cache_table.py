@@ -0,0 +1,35 @@
+"""Add embedding_cache table
+
+Revision ID: 2b8e5c7d1f4a
+Revises: 7d2e4f1a9c3b
+Create Date: 2026-10-17 14:03:52.207614
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import pgvector.sqlalchemy
+
+# revision identifiers, used by Alembic.
+revision: str = '2b8e5c7d1f4a'
+down_revision: Union[str, None] = '7d2e4f1a9c3b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('embedding_cache',
+    sa.Column('model', sa.Text(), nullable=False),
+    sa.Column('task_type', sa.Text(), server_default='', nullable=False),
+    sa.Column('text_hash', sa.Text(), nullable=False),
+    sa.Column('embedding', pgvector.sqlalchemy.vector.VECTOR(dim=768), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('model', 'task_type', 'text_hash', name=op.f('embedding_cache_pk'))
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('embedding_cache')
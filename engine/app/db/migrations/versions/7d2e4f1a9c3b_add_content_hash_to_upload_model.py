@@ -0,0 +1,29 @@
+"""Add content_hash to Upload model
+
+Revision ID: 7d2e4f1a9c3b
+Revises: 0c9ffc76397b
+Create Date: 2026-10-17 10:12:31.482913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '7d2e4f1a9c3b'
+down_revision: Union[str, None] = '0c9ffc76397b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('uploads', sa.Column('content_hash', sa.Text(), nullable=True))
+    op.create_index('ix_upload_content_hash', 'uploads', ['content_hash'], unique=True, postgresql_where=sa.text('deleted_at IS NULL'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_upload_content_hash', table_name='uploads', postgresql_where=sa.text('deleted_at IS NULL'))
+    op.drop_column('uploads', 'content_hash')
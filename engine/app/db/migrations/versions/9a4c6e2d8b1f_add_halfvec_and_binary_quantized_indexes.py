@@ -0,0 +1,34 @@
+"""Add halfvec and binary quantized HNSW indexes to vector_embeddings
+
+Revision ID: 9a4c6e2d8b1f
+Revises: 2b8e5c7d1f4a
+Create Date: 2026-10-17 16:41:08.935127
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '9a4c6e2d8b1f'
+down_revision: Union[str, None] = '2b8e5c7d1f4a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # halfvec and binary_quantize need pgvector 0.7.0 or newer
+    with op.get_context().autocommit_block():
+        # Full precision index from 04b9e99e4425, dropped by 0c9ffc76397b, kept for the dual-read period
+        op.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_vector_embeddings_embedding ON vector_embeddings USING hnsw (embedding vector_cosine_ops);")
+        op.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_vector_embeddings_embedding_halfvec ON vector_embeddings USING hnsw ((CAST(embedding AS HALFVEC(768))) halfvec_cosine_ops);")
+        op.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_vector_embeddings_embedding_bq ON vector_embeddings USING hnsw ((CAST(binary_quantize(CAST(embedding AS VECTOR(768))) AS BIT(768))) bit_hamming_ops);")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_vector_embeddings_embedding_bq;")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_vector_embeddings_embedding_halfvec;")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_vector_embeddings_embedding;")
@@ -0,0 +1,37 @@
+"""Add partial HNSW indexes per source type to vector_embeddings
+
+Revision ID: c3f1a7e5d9b2
+Revises: 9a4c6e2d8b1f
+Create Date: 2026-10-17 18:02:44.512309
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3f1a7e5d9b2'
+down_revision: Union[str, None] = '9a4c6e2d8b1f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Enum labels of the source types, matches PARTIAL_INDEX_SOURCE_TYPES of the model
+SOURCE_TYPES = ['DOCUMENT', 'BLOCK', 'CSV_COLUMN', 'POSTGRES_COLUMN', 'PDF_CHUNK']
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.get_context().autocommit_block():
+        for source_type in SOURCE_TYPES:
+            op.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_vector_embeddings_embedding_{source_type.lower()} "
+                f"ON vector_embeddings USING hnsw (embedding vector_cosine_ops) "
+                f"WHERE source_type = '{source_type}' AND deleted_at IS NULL;"
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for source_type in reversed(SOURCE_TYPES):
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS ix_vector_embeddings_embedding_{source_type.lower()};")
@@ -0,0 +1,39 @@
+"""Add full-text and trigram GIN indexes to vector_embeddings
+
+Revision ID: e8b2d4f6a1c7
+Revises: c3f1a7e5d9b2
+Create Date: 2026-10-17 19:14:27.220581
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'e8b2d4f6a1c7'
+down_revision: Union[str, None] = 'c3f1a7e5d9b2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm;")
+
+    with op.get_context().autocommit_block():
+        # Expression must stay identical to `searchable_text` of the model, or searches can't use the index
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_vector_embeddings_search_text ON vector_embeddings "
+            "USING gin ((to_tsvector('simple', coalesce(column_or_chunk_name, '') || ' ' || coalesce(original_text, ''))));"
+        )
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_vector_embeddings_column_or_chunk_name_trgm ON vector_embeddings "
+            "USING gin (column_or_chunk_name gin_trgm_ops);"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_vector_embeddings_column_or_chunk_name_trgm;")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_vector_embeddings_search_text;")
@@ -6,6 +6,7 @@ from .block import Block
 from .block_matrix import BlockMatrix
 from .upload import Upload
 from .workspace_upload import WorkspaceUpload
+from .embedding_cache import EmbeddingCacheEntry
 
 
 __all__ = [
@@ -15,5 +16,6 @@ __all__ = [
     "Block",
     "BlockMatrix",
     "Upload",
-    "WorkspaceUpload"
+    "WorkspaceUpload",
+    "EmbeddingCacheEntry"
 ]
\ No newline at end of file
@@ -0,0 +1,34 @@
+# app/models/embedding_cache.py
+
+import datetime
+from typing import List
+
+from sqlalchemy import DateTime, func, Text
+from sqlalchemy.orm import Mapped, mapped_column
+
+# Import the Base class
+from app.db.base_class import Base
+from pgvector.sqlalchemy import Vector
+from app.db.models.vector_embedding import EMBEDDING_DIMENSIONS
+
+class EmbeddingCacheEntry(Base):
+    """
+    Stores embeddings of previously embedded texts, keyed by the embedding model,
+    the task type and the SHA-256 of the text, so identical texts are not sent
+    to the embedding provider again.
+    """
+    __tablename__ = "embedding_cache"
+
+    model: Mapped[str] = mapped_column(Text, primary_key=True)
+    task_type: Mapped[str] = mapped_column(Text, primary_key=True, server_default="") # Empty when no task type was set
+    text_hash: Mapped[str] = mapped_column(Text, primary_key=True) # SHA-256 hex digest of the embedded text
+
+    embedding: Mapped[List[float]] = mapped_column(Vector(EMBEDDING_DIMENSIONS), nullable=False)
+
+    # Timestamps
+    created_at: Mapped[datetime.datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+
+    def __repr__(self):
+        return f"<EmbeddingCacheEntry(model='{self.model}', task_type='{self.task_type}', text_hash='{self.text_hash}')>"
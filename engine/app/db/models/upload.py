@@ -5,7 +5,7 @@ import enum
 import datetime
 from typing import Optional, List, TYPE_CHECKING
 
-from sqlalchemy import DateTime, func, Text
+from sqlalchemy import DateTime, func, Text, Index, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.dialects.postgresql import UUID as PG_UUID
 from sqlalchemy.dialects.postgresql import ENUM as PG_Enum
@@ -34,6 +34,11 @@ class Upload(Base):
     """
     __tablename__ = "uploads"
 
+    __table_args__ = (
+        # One live upload per content, duplicates reuse the existing object and its processing results
+        Index('ix_upload_content_hash', 'content_hash', unique=True, postgresql_where=text('deleted_at IS NULL')),
+    )
+
     # Primary key for the upload
     id: Mapped[uuid.UUID] = mapped_column(
         PG_UUID(as_uuid=True), primary_key=True, default=uuid.uuid4
@@ -48,6 +53,7 @@ class Upload(Base):
     file_size: Mapped[int] = mapped_column(nullable=False) # Size in bytes
     storage_key: Mapped[str] = mapped_column(Text, nullable=False) # R2 Unique key for the file
     storage_url: Mapped[str] = mapped_column(Text, nullable=False) # Path or URL, e.g., S3 URL
+    content_hash: Mapped[Optional[str]] = mapped_column(Text, nullable=True) # SHA-256 hex digest of the uploaded source file
 
     # Processing Information
     processing_status: Mapped[ProcessingStatus] = mapped_column(
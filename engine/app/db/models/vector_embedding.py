@@ -5,14 +5,16 @@ import enum
 import datetime
 from typing import Optional, List
 
-from sqlalchemy import DateTime, func, Text, Index
+from sqlalchemy import DateTime, func, Text, Index, cast, text
 from sqlalchemy.orm import Mapped, mapped_column
 from sqlalchemy.dialects.postgresql import UUID as PG_UUID
 from sqlalchemy.dialects.postgresql import ENUM as PG_Enum
 
 # Import the Base class
 from app.db.base_class import Base
-from pgvector.sqlalchemy import Vector
+from pgvector.sqlalchemy import Vector, HALFVEC, BIT
+
+EMBEDDING_DIMENSIONS = 768
 
 class EmbeddingSourceType(str, enum.Enum):
     DOCUMENT = "document"
@@ -60,7 +62,93 @@ class VectorEmbedding(Base):
     column_or_chunk_name: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
     original_text: Mapped[Optional[str]] = mapped_column(Text, nullable=True) # Store original text if possible
 
-    embedding: Mapped[List[float]] = mapped_column(Vector(768), nullable=False)
+    embedding: Mapped[List[float]] = mapped_column(Vector(EMBEDDING_DIMENSIONS), nullable=False)
 
     def __repr__(self):
         return f"<VectorEmbedding(id={self.id}, source_type='{self.source_type}', source_id='{self.source_identifier}')>"
+
+
+def halfvec_embedding(embedding):
+    """
+    Half precision form of an embedding column or value, matches the expression of `ix_vector_embeddings_embedding_halfvec`.
+    """
+    return cast(embedding, HALFVEC(EMBEDDING_DIMENSIONS))
+
+
+def binary_quantized_embedding(embedding):
+    """
+    Binary quantized form of an embedding column or value, matches the expression of `ix_vector_embeddings_embedding_bq`.
+    """
+    return cast(func.binary_quantize(cast(embedding, Vector(EMBEDDING_DIMENSIONS))), BIT(EMBEDDING_DIMENSIONS))
+
+
+def searchable_text(model=None):
+    """
+    Full-text vector of the column or chunk name and the original text, matches the expression of `ix_vector_embeddings_search_text`.
+
+    The 'simple' configuration neither stems nor drops stop words, so identifiers like `signup_dt` match as written.
+    Constants are inlined, an expression index is only matched against literals, never against bind parameters.
+    """
+    model = model or VectorEmbedding
+    return func.to_tsvector(
+        text("'simple'"),
+        func.coalesce(model.column_or_chunk_name, text("''"))
+        .op("||")(text("' '"))
+        .op("||")(func.coalesce(model.original_text, text("''"))),
+    )
+
+
+# HNSW indexes over the embeddings, declared here so autogenerate keeps them.
+# The half precision and binary quantized indexes are expression indexes, the table keeps
+# float32 vectors which the binary quantized search uses to rerank its candidates.
+Index(
+    'idx_vector_embeddings_embedding',
+    VectorEmbedding.embedding,
+    postgresql_using='hnsw',
+    postgresql_ops={'embedding': 'vector_cosine_ops'},
+)
+Index(
+    'ix_vector_embeddings_embedding_halfvec',
+    halfvec_embedding(VectorEmbedding.embedding).label('embedding_halfvec'),
+    postgresql_using='hnsw',
+    postgresql_ops={'embedding_halfvec': 'halfvec_cosine_ops'},
+)
+Index(
+    'ix_vector_embeddings_embedding_bq',
+    binary_quantized_embedding(VectorEmbedding.embedding).label('embedding_bq'),
+    postgresql_using='hnsw',
+    postgresql_ops={'embedding_bq': 'bit_hamming_ops'},
+)
+
+# Source types searched on their own get a partial HNSW index each. A filtered search over the
+# shared index walks neighbours of every type and can run out of candidates before it finds k
+# rows of the requested type, the partial index only holds that type's live rows.
+PARTIAL_INDEX_SOURCE_TYPES = (
+    EmbeddingSourceType.DOCUMENT,
+    EmbeddingSourceType.BLOCK,
+    EmbeddingSourceType.CSV_COLUMN,
+    EmbeddingSourceType.POSTGRES_COLUMN,
+    EmbeddingSourceType.PDF_CHUNK,
+)
+
+for _source_type in PARTIAL_INDEX_SOURCE_TYPES:
+    Index(
+        f'ix_vector_embeddings_embedding_{_source_type.name.lower()}',
+        VectorEmbedding.embedding,
+        postgresql_using='hnsw',
+        postgresql_ops={'embedding': 'vector_cosine_ops'},
+        postgresql_where=(VectorEmbedding.source_type == _source_type) & VectorEmbedding.deleted_at.is_(None),
+    )
+
+# GIN indexes for the lexical half of hybrid search
+Index(
+    'ix_vector_embeddings_search_text',
+    searchable_text().label('search_text'),
+    postgresql_using='gin',
+)
+Index(
+    'ix_vector_embeddings_column_or_chunk_name_trgm',
+    VectorEmbedding.column_or_chunk_name,
+    postgresql_using='gin',
+    postgresql_ops={'column_or_chunk_name': 'gin_trgm_ops'},
+)
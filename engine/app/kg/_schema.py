@@ -29,4 +29,71 @@ class KgMetricsNode():
     """
     Additional remarks or comments about the node,
     Use this field to store any additional information or comments about the node.
-    """
\ No newline at end of file
+    """
+
+
+@dataclass
+class KgBulkWriteResult():
+    """
+    Outcome of a bulk write of Metrics Nodes.
+    """
+
+    ids: list[str]
+    """
+    Element ids of the written nodes, new and already existing ones, in the order of the unique input nodes.
+    """
+
+    nodes_created: int
+    """
+    Number of nodes that did not exist before the write.
+    """
+
+    batches: int
+    """
+    Number of transactions the nodes were written in.
+    """
+
+    seconds: float
+    """
+    Wall time of the write.
+    """
+
+    @property
+    def nodes_written(self) -> int:
+        return len(self.ids)
+
+    @property
+    def nodes_per_second(self) -> float:
+        return self.nodes_written / self.seconds if self.seconds else 0.0
+
+
+@dataclass
+class KgNodeMatch():
+    """
+    A Metrics Node found by a vector search, without its embedding.
+    """
+
+    id: str
+    """
+    Element id of the node.
+    """
+
+    raw_metric: str
+    """
+    Raw metric of the node.
+    """
+
+    source_id: str
+    """
+    The upload ID associated with the node.
+    """
+
+    score: float
+    """
+    Cosine similarity of the node to the probe, normalized by Neo4j to [0, 1] with 1 for identical directions.
+    """
+
+    remarks: str | None = None
+    """
+    Remarks of the node, if any.
+    """
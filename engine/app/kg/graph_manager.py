@@ -1,14 +1,99 @@
+import asyncio
 import logging
+import time
 from threading import Lock
-from neo4j import GraphDatabase, exceptions
+from neo4j import AsyncGraphDatabase, AsyncManagedTransaction, exceptions
 from app.settings.config import settings
 from app.utils.logging_config import APP_LOGGER_NAME
 from ._error import GraphError
-from ._schema import KgMetricsNode
+from ._schema import KgBulkWriteResult, KgMetricsNode, KgNodeMatch
 
 # Configure a logger for better debugging and monitoring in production
 logger = logging.getLogger(APP_LOGGER_NAME).getChild("kg.graph_manager")
 
+KG_SCHEMA_VERSION = 1
+"""
+Version of the graph schema this code reads and writes, bump it together with a new entry in `_SCHEMA_MIGRATIONS`.
+"""
+
+SCHEMA_LABEL = "KgSchema"
+SCHEMA_NODE_ID = "knowledge_graph"
+
+_SCHEMA_MIGRATIONS: dict[int, list[str]] = {
+    # The first constraint covered properties no node has, it is replaced by `unique_node_metric_source`
+    1: ["DROP CONSTRAINT unique_node_source IF EXISTS"],
+}
+"""
+Cypher statements that migrate a graph to each version from the one before it.
+"""
+
+DATABASE = "neo4j"
+
+VECTOR_INDEX_NAME = "node_embedding_index"
+
+_NEAREST_NODES_QUERY = f"""
+UNWIND $probes AS probe
+CALL {{
+    WITH probe
+    CALL db.index.vector.queryNodes('{VECTOR_INDEX_NAME}', $candidates, probe.embedding)
+    YIELD node, score
+    WHERE ($source_ids IS NULL OR node.source_id IN $source_ids)
+        AND ($min_score IS NULL OR score >= $min_score)
+    RETURN node, score
+    ORDER BY score DESC
+    LIMIT $k
+}}
+RETURN probe.index AS probe, elementId(node) AS id, node.raw_metric AS raw_metric,
+    node.source_id AS source_id, node.remarks AS remarks, score
+"""
+
+
+def _describe_query(cypher_query: str, params: dict | None) -> str:
+    """
+    Names a query for logs by its first line, with its parameter names and the length of list
+    parameters. Values are left out, they can hold embeddings and user data.
+    """
+    first_line = next((line.strip() for line in cypher_query.splitlines() if line.strip()), "")
+    name = first_line if len(first_line) <= 80 else f"{first_line[:77]}..."
+
+    described = [
+        f"{key}[{len(value)}]" if isinstance(value, (list, tuple)) else key
+        for key, value in (params or {}).items()
+    ]
+
+    return f"'{name}' with params {described}"
+
+
+async def _collect(tx: AsyncManagedTransaction, cypher_query: str, params: dict) -> list[dict]:
+    """
+    Transaction function of `read` and `write`, consumes the result inside the transaction
+    so a retried transaction never hands back a partially read result.
+    """
+    result = await tx.run(cypher_query, params)
+    return [record.data() async for record in result]
+
+
+async def _write_metrics_batch(tx: AsyncManagedTransaction, nodes: list[dict]) -> tuple[list[str], int]:
+    """
+    Transaction function of `add_metrics_nodes`, returns the element ids of a batch and how many of them were created.
+    """
+    result = await tx.run(
+        """
+        UNWIND $nodes AS node
+        MERGE (n:Node {raw_metric: node.raw_metric, source_id: node.source_id})
+        ON CREATE SET 
+            n.embedding = node.embedding,
+            n.remarks = node.remarks,
+            n.created_at = timestamp()
+        RETURN elementId(n) AS id
+        """,
+        {"nodes": nodes},
+    )
+    ids = [record["id"] async for record in result]
+    summary = await result.consume()
+
+    return ids, summary.counters.nodes_created
+
 class KnowledgeGraph:
     """
     A thread-safe Singleton class to manage the connection to a Neo4j database.
@@ -16,6 +101,12 @@ class KnowledgeGraph:
     This class ensures only one connection driver is instantiated across the application,
     handles connection verification, and provides a clean interface for executing queries
     and closing the connection.
+
+    Queries run on the async neo4j driver in managed transactions, which the driver retries on
+    transient errors for up to `neo4j_max_transaction_retry_time` seconds. Every query borrows a
+    session, and with it a pooled connection, only for the duration of its transaction, so concurrent
+    tasks share the connection pool without blocking the event loop. `initialize` has to be awaited
+    once before the first query.
     """
     _instance = None
     _lock = Lock()  # To ensure thread-safety during instantiation
@@ -29,58 +120,83 @@ class KnowledgeGraph:
 
     def __init__(self):
         """
-        Initializes the Neo4j driver connection.
-        This is designed to be idempotent; it will only run the connection logic once.
+        Creates the Neo4j driver, connections are only opened by `initialize` and the queries.
+        This is designed to be idempotent; it will only create the driver once.
         """
         if hasattr(self, 'driver'):
-            logger.warning("KnowledgeGraph instance already initialized. Skipping re-initialization.")
+            logger.debug("KnowledgeGraph instance already initialized. Skipping re-initialization.")
             return
 
-        self.driver = None
-        try:
-            self.driver = GraphDatabase.driver(
-                settings.neo4j_uri,
-                auth=(settings.neo4j_user, settings.neo4j_password),
-                max_connection_lifetime=settings.neo4j_max_connection_lifetime,
-                max_connection_pool_size=settings.neo4j_max_connection_pool_size,
-                encrypted=settings.neo4j_encrypted
-            )
-            self.driver.verify_connectivity()
-            logger.info("Successfully connected to Neo4j.")
+        self.driver = AsyncGraphDatabase.driver(
+            settings.neo4j_uri,
+            auth=(settings.neo4j_user, settings.neo4j_password),
+            max_connection_lifetime=settings.neo4j_max_connection_lifetime,
+            max_connection_pool_size=settings.neo4j_max_connection_pool_size,
+            max_transaction_retry_time=settings.neo4j_max_transaction_retry_time,
+            encrypted=settings.neo4j_encrypted
+        )
 
-            self._ensure_constraints()
-            self._ensure_indexes() # Ensure indexes are created after connection
+        self._ready = False
+        self._init_lock = asyncio.Lock()
 
-            # ⚠️ Cleaning the graph after every initialization is not recommended in production.
-            self.clear_graph()  # Clear the graph on initialization, if needed
-        except exceptions.ServiceUnavailable as e:
-            logger.error(f"Neo4j connection failed: {e}")
-            self.driver = None
-            raise GraphError(f"Failed to connect to Neo4j SERVICE_UNAVAILABLE: {e}")
-        
-        except Exception as e:
-            logger.error(f"🔥 An unexpected error occurred during Neo4j setup: {e}")
-            if self.driver:
-                self.driver.close()
-            self.driver = None
-            raise
+    async def initialize(self):
+        """
+        Verifies the connection and brings the graph schema, constraints and indexes up to date.
+        Safe to await from every user of the graph, only the first call does the work.
+        """
+        if self._ready:
+            return
+
+        async with self._init_lock:
+            if self._ready:
+                return
+
+            if not self.driver:
+                raise GraphError("Driver not initialized. Cannot initialize the Knowledge Graph.")
 
-    def close(self):
+            try:
+                await self.driver.verify_connectivity()
+                logger.info("Successfully connected to Neo4j.")
+
+                await self._ensure_schema_version()
+                await self._ensure_constraints()
+                await self._ensure_indexes() # Ensure indexes are created after connection
+
+                if not settings.neo4j_persistent:
+                    # Throwaway graphs for local development, persistent graphs are only reset through the admin API
+                    await self.clear_graph()
+            except exceptions.ServiceUnavailable as e:
+                logger.error(f"Neo4j connection failed: {e}")
+                raise GraphError(f"Failed to connect to Neo4j SERVICE_UNAVAILABLE: {e}")
+
+            except Exception as e:
+                logger.error(f"🔥 An unexpected error occurred during Neo4j setup: {e}")
+                raise
+
+            self._ready = True
+
+    async def close(self):
         """Closes the Neo4j connection driver if it exists."""
         if self.driver:
-            self.driver.close()
+            await self.driver.close()
             logger.info("Neo4j connection closed.")
             KnowledgeGraph._instance = None
     
-    def add_metrics_nodes(self, nodes: list[KgMetricsNode]):
+    async def add_metrics_nodes(self, nodes: list[KgMetricsNode], batch_size: int | None = None) -> KgBulkWriteResult:
         """
         Add multiple Metrics Nodes to the Knowledge Graph in bulk.
 
+        Nodes are written `batch_size` at a time (`neo4j_write_batch_size` by default), each batch
+        in its own transaction, with at most `neo4j_write_concurrency` transactions in flight.
+        Nodes are merged on `(raw_metric, source_id)`, duplicates in `nodes` are written once and
+        a failed write can be repeated safely.
+
         Args:
             nodes (list[KgMetricsNode]): A list of KgMetricsNode instances to be added.
+            batch_size (int, optional): Nodes per transaction.
 
         Returns:
-            list: A list of dictionaries representing the added nodes.
+            KgBulkWriteResult: Element ids of the written nodes and write counters.
         
         Raises:
             GraphError: If the bulk addition fails or no data is returned.
@@ -89,34 +205,143 @@ class KnowledgeGraph:
             logger.error("No nodes provided for bulk addition.")
             raise GraphError("No nodes provided for bulk addition.")
 
-        query = """
-        UNWIND $nodes AS node
-        MERGE (n:Node {raw_metric: node.raw_metric, source_id: node.source_id})
-        ON CREATE SET 
-            n.raw_metric = node.raw_metric,
-            n.source_id = node.source_id,
-            n.embedding = node.embedding,
-            n.remarks = node.remarks,
-            n.created_at = timestamp()
-        RETURN n
-        """
+        if not self.driver:
+            raise GraphError("Driver not initialized. Cannot add Metrics Nodes.")
+
+        started = time.perf_counter()
+        batch_size = batch_size or settings.neo4j_write_batch_size
 
-        params = {"nodes": [node.__dict__ for node in nodes]}
+        # Two transactions merging the same key would contend on the uniqueness constraint
+        unique = list({(node.raw_metric, node.source_id): node.__dict__ for node in nodes}.values())
+        batches = [unique[i:i + batch_size] for i in range(0, len(unique), batch_size)]
+        slots = asyncio.Semaphore(settings.neo4j_write_concurrency)
 
-        logger.info(f"Adding Bulk Metrics Nodes with params: {params}")
+        async def _run(batch: list[dict]) -> tuple[list[str], int]:
+            async with slots:
+                async with self.driver.session(database=DATABASE) as session:
+                    return await session.execute_write(_write_metrics_batch, batch)
 
-        result = self.query(query, params)
-        if not result:
-            logger.error("Failed to add Bulk Metrics Nodes to the Knowledge Graph.")
+        try:
+            outputs = await asyncio.gather(*(_run(batch) for batch in batches))
+        except Exception as e:
+            logger.error(f"Failed to add {len(unique)} Metrics Nodes in {len(batches)} batches: {e}")
+            raise GraphError(f"Failed to add Bulk Metrics Nodes to the Knowledge Graph: {e}")
+
+        result = KgBulkWriteResult(
+            ids=[id_ for ids, _ in outputs for id_ in ids],
+            nodes_created=sum(created for _, created in outputs),
+            batches=len(batches),
+            seconds=time.perf_counter() - started,
+        )
+
+        if result.nodes_written != len(unique):
+            logger.error(f"Knowledge Graph wrote {result.nodes_written} of {len(unique)} Metrics Nodes.")
             raise GraphError("Failed to add Bulk Metrics Nodes to the Knowledge Graph.")
-        
-        logger.info(f"Bulk Metrics Nodes added successfully: {result}")
+
+        logger.info(
+            f"Added {result.nodes_written} Metrics Nodes ({result.nodes_created} new) in {result.batches} batches, "
+            f"{result.seconds:.2f}s ({result.nodes_per_second:.0f} nodes/s)"
+        )
 
         return result
     
-    def query(self, cypher_query, params=None):
+    async def nearest_metrics_nodes(
+            self,
+            embedding: list[float],
+            k: int = 10,
+            source_ids: list[str] | None = None,
+            min_score: float | None = None,
+    ) -> list[KgNodeMatch]:
+        """
+        Finds the `k` Metrics Nodes nearest to `embedding` through the Metrics Nodes vector index.
+
+        Args:
+            embedding (list[float]): The probe vector.
+            k (int): Maximum number of nodes to return.
+            source_ids (list[str], optional): Only return nodes of these uploads.
+            min_score (float, optional): Only return nodes with at least this similarity score, in [0, 1].
+
+        Returns:
+            list[KgNodeMatch]: The matching nodes, most similar first.
+        """
+        matches = await self.nearest_metrics_nodes_batch([embedding], k, source_ids, min_score)
+        return matches[0]
+
+    async def nearest_metrics_nodes_batch(
+            self,
+            embeddings: list[list[float]],
+            k: int = 10,
+            source_ids: list[str] | None = None,
+            min_score: float | None = None,
+    ) -> list[list[KgNodeMatch]]:
+        """
+        `nearest_metrics_nodes` for many probe vectors in one read transaction.
+
+        The vector index returns the nearest nodes before filters apply, with `source_ids` or
+        `min_score` each probe asks the index for `k * neo4j_vector_search_overfetch` candidates,
+        so fewer than `k` nodes come back only when the filters leave fewer.
+
+        Returns:
+            list[list[KgNodeMatch]]: One list per probe, in the order of `embeddings`, most similar first.
+        """
+        if not embeddings:
+            return []
+
+        if k <= 0:
+            raise GraphError("k must be a positive integer.")
+
+        filtered = source_ids is not None or min_score is not None
+        candidates = k * settings.neo4j_vector_search_overfetch if filtered else k
+
+        records = await self.read(
+            _NEAREST_NODES_QUERY,
+            {
+                "probes": [{"index": i, "embedding": embedding} for i, embedding in enumerate(embeddings)],
+                "candidates": candidates,
+                "k": k,
+                "source_ids": source_ids,
+                "min_score": min_score,
+            },
+        )
+
+        matches: list[list[KgNodeMatch]] = [[] for _ in embeddings]
+        for record in records:
+            probe = record.pop("probe")
+            matches[probe].append(KgNodeMatch(**record))
+
+        logger.debug(f"Vector search of {len(embeddings)} probes returned {len(records)} Metrics Nodes.")
+
+        return matches
+
+    async def read(self, cypher_query, params=None):
         """
-        A general method to run Cypher queries.
+        Runs a Cypher query in a managed read transaction, routed to a reader in a cluster.
+
+        Args:
+            cypher_query (str): The Cypher query to be executed.
+            params (dict, optional): A dictionary of parameters to pass to the query.
+
+        Returns:
+            list: A list of dictionaries representing the query result records.
+        """
+        return await self._execute(cypher_query, params, write=False)
+
+    async def write(self, cypher_query, params=None):
+        """
+        Runs a Cypher query in a managed write transaction.
+
+        Args:
+            cypher_query (str): The Cypher query to be executed.
+            params (dict, optional): A dictionary of parameters to pass to the query.
+
+        Returns:
+            list: A list of dictionaries representing the query result records.
+        """
+        return await self._execute(cypher_query, params, write=True)
+
+    async def query(self, cypher_query, params=None):
+        """
+        A general method to run Cypher queries, in a write transaction as the query may write.
 
         Args:
             cypher_query (str): The Cypher query to be executed.
@@ -128,95 +353,147 @@ class KnowledgeGraph:
         Raises:
             Exception: If the driver is not initialized or the query fails.
         """
+        return await self._execute(cypher_query, params, write=True)
+
+    async def clear_graph(self, batch_size: int | None = None) -> int:
+        """
+        Clears the entire Knowledge Graph by deleting all nodes and relationships.
+
+        Nodes are deleted `batch_size` at a time (`neo4j_reset_batch_size` by default), each
+        batch in its own transaction, so clearing a large graph never builds one transaction
+        holding every node in memory. The schema version node is kept.
+
+        This method is destructive and should be used with caution.
+
+        Returns:
+            int: The number of nodes deleted.
+        """
+        if not self.driver:
+            logger.error("Cannot clear graph, no valid driver available.")
+            return 0
+
+        batch_size = batch_size or settings.neo4j_reset_batch_size
+
+        query = f"""
+        MATCH (n) WHERE NOT n:{SCHEMA_LABEL}
+        WITH n LIMIT $batch_size
+        DETACH DELETE n
+        RETURN count(*) AS deleted
+        """
+
+        nodes_deleted = 0
+        batches = 0
+
+        try:
+            while True:
+                result = await self.write(query, {"batch_size": batch_size})
+                deleted = result[0]["deleted"] if result else 0
+
+                if not deleted:
+                    break
+
+                nodes_deleted += deleted
+                batches += 1
+                logger.debug(f"Deleted {nodes_deleted} nodes so far in {batches} batches.")
+
+            logger.info(f"Cleared the graph, {nodes_deleted} nodes deleted in {batches} batches.")
+
+            return nodes_deleted
+        except exceptions.ClientError as e:
+            logger.error(f"Failed to clear the graph after deleting {nodes_deleted} nodes: {e}")
+            raise GraphError(f"Failed to clear the graph in Neo4j: {e}")
+
+    async def schema_version(self) -> int | None:
+        """
+        Returns the schema version stored in the graph, None for a graph without one.
+        """
+        result = await self.read(f"MATCH (s:{SCHEMA_LABEL} {{id: $id}}) RETURN s.version AS version", {"id": SCHEMA_NODE_ID})
+        return result[0]["version"] if result else None
+
+    ######################################################
+    ################### Private methods ##################
+    ######################################################
+
+    async def _execute(self, cypher_query, params, write: bool):
         if not self.driver:
             raise Exception("Driver not initialized. Cannot run query.")
-        
+
         try:
-            with self.driver.session(database="neo4j") as session:
-                result = session.run(cypher_query, params or {})
-                return [record.data() for record in result]
+            async with self.driver.session(database=DATABASE) as session:
+                if write:
+                    return await session.execute_write(_collect, cypher_query, params or {})
+
+                return await session.execute_read(_collect, cypher_query, params or {})
         except exceptions.ServiceUnavailable as e:
             logger.error(f"Connection to Neo4j lost. Please reconnect. Error: {e}")
             raise GraphError(f"Connection to Neo4j lost: {e}")
         
         except exceptions.ClientError as e:
             logger.error(f"Cypher query failed: {e.code} - {e.message}")
-            logger.error(f"Query: {cypher_query} | Params: {params}")
+            logger.error(f"Query: {_describe_query(cypher_query, params)}")
             raise
 
         except Exception as e:
             logger.error(f"An unexpected error occurred while executing the query: {e}")
             raise GraphError(f"An unexpected error occurred while executing the query: {e}")
 
-
-    def clear_graph(self):
+    async def _ensure_schema_version(self):
         """
-        Clears the entire Knowledge Graph by deleting all nodes and relationships.
+        Brings a persisted graph to `KG_SCHEMA_VERSION` and records the version in the graph.
 
-        This method is destructive and should be used with caution.
+        A graph without a version node is either new or was written before versioning, both
+        are migrated from version 0. A graph written by a newer schema is refused.
         """
-        if not self.driver:
-            logger.error("Cannot clear graph, no valid driver available.")
-            return
-        
-        query = "MATCH (n) DETACH DELETE n"
-        
-        try:
-            result = self.query(query)
+        version = await self.schema_version() or 0
 
-            nodes_deleted = len(result)
-            logger.info(f"Cleared the graph, {nodes_deleted} nodes deleted.")
+        if version > KG_SCHEMA_VERSION:
+            raise GraphError(f"Knowledge Graph has schema version {version}, newer than the supported {KG_SCHEMA_VERSION}.")
 
-            return nodes_deleted
-        except exceptions.ClientError as e:
-            logger.error(f"Failed to clear the graph: {e}")
-            raise GraphError(f"Failed to clear the graph in Neo4j: {e}")
+        for target in range(version + 1, KG_SCHEMA_VERSION + 1):
+            for statement in _SCHEMA_MIGRATIONS.get(target, []):
+                await self.write(statement)
 
-    ######################################################
-    ################### Private methods ##################
-    ######################################################
+            await self.write(
+                f"""
+                MERGE (s:{SCHEMA_LABEL} {{id: $id}})
+                SET s.version = $version, s.updated_at = timestamp()
+                """,
+                {"id": SCHEMA_NODE_ID, "version": target},
+            )
+            logger.info(f"Migrated the Knowledge Graph schema to version {target}.")
 
-    def _ensure_indexes(self):
+    async def _ensure_indexes(self):
         """Ensures the necessary vector indexes are created."""
-        if not self.driver:
-            logger.error("Cannot ensure indexes, no valid driver available.")
-            return
-        
         try:
-            with self.driver.session(database="neo4j") as session:
-                # Assuming nodes are labeled 'Node' and embeddings are stored in 'embedding' property
-                session.run(
-                    """
-                    CREATE VECTOR INDEX `node_embedding_index` IF NOT EXISTS
-                    FOR (n:Node) ON (n.embedding)
-                    OPTIONS {
-                        indexConfig: {
-                            `vector.dimensions`: 768,
-                            `vector.similarity_function`: 'cosine'
-                        }
-                    }
-                    """
-                )
+            # Assuming nodes are labeled 'Node' and embeddings are stored in 'embedding' property
+            await self.write(
+                f"""
+                CREATE VECTOR INDEX `{VECTOR_INDEX_NAME}` IF NOT EXISTS
+                FOR (n:Node) ON (n.embedding)
+                OPTIONS {{
+                    indexConfig: {{
+                        `vector.dimensions`: 768,
+                        `vector.similarity_function`: 'cosine'
+                    }}
+                }}
+                """
+            )
             logger.info("Vector indexes ensured.")
         except Exception as e:
             logger.error(f"Failed to ensure vector indexes: {e}")
             raise GraphError(f"Failed to ensure vector indexes in Neo4j: {e}")
 
-    def _ensure_constraints(self):
+    async def _ensure_constraints(self):
         """Ensures the database has the necessary constraints for data integrity."""
-        if not self.driver:
-            logger.error("Cannot ensure constraints, no valid driver available.")
-            return
-        
         try:
-            with self.driver.session(database="neo4j") as session:
-                session.run(
-                    """
-                    CREATE CONSTRAINT unique_node_source IF NOT EXISTS
-                    FOR (n:Node) REQUIRE (n.raw_name, n.source_file) IS UNIQUE
-                    """
-                )
+            # Also backs the MERGE of `add_metrics_nodes` with an index, which a persisted graph needs to stay fast
+            await self.write(
+                """
+                CREATE CONSTRAINT unique_node_metric_source IF NOT EXISTS
+                FOR (n:Node) REQUIRE (n.raw_metric, n.source_id) IS UNIQUE
+                """
+            )
             logger.info("Graph constraints ensured.")
         except exceptions.ClientError as e:
             logger.error(f"Failed to ensure constraints: {e}")
-            raise GraphError(f"Failed to ensure constraints in Neo4j: {e}")
\ No newline at end of file
+            raise GraphError(f"Failed to ensure constraints in Neo4j: {e}")
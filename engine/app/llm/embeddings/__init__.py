@@ -1,4 +1,6 @@
 from .embedder import Embedder, EmbedContentConfig, EmbeddingModel
+from .backends import BaseEmbeddingBackend, GeminiEmbeddingBackend, HashingEmbeddingBackend, EMBEDDING_DIMENSIONS, get_embedding_backend
+from .bulk import copy_embeddings, BulkWriteStats
 from app.db.models.vector_embedding import EmbeddingSourceType
 
 __all__ = [
@@ -6,4 +8,11 @@ __all__ = [
     "EmbedContentConfig",
     "EmbeddingSourceType",
     "EmbeddingModel",
+    "BaseEmbeddingBackend",
+    "GeminiEmbeddingBackend",
+    "HashingEmbeddingBackend",
+    "EMBEDDING_DIMENSIONS",
+    "get_embedding_backend",
+    "copy_embeddings",
+    "BulkWriteStats",
 ]
\ No newline at end of file
@@ -0,0 +1,160 @@
+import hashlib
+import math
+import re
+import threading
+from typing import Optional
+from google import genai
+from google.genai import errors as genai_errors
+from google.genai.types import EmbedContentConfig
+from app.db.models.vector_embedding import EMBEDDING_DIMENSIONS
+from app.settings.config import settings
+
+
+class BaseEmbeddingBackend:
+    """
+    Base class for the providers an `Embedder` sends its batches to.
+    A backend only embeds batches, batching, retries and caching are handled by the `Embedder`.
+    """
+    @property
+    def model_name(self) -> str:
+        """Name of the model, embeddings of different models are never mixed in the cache."""
+        raise NotImplementedError("Subclasses must implement the model_name property.")
+
+    def embed(self, batch: list[str], config: Optional[EmbedContentConfig] = None) -> list[list[float]]:
+        """Embeds a batch of texts, returns one vector per text."""
+        raise NotImplementedError("Subclasses must implement the embed method.")
+
+    async def aembed(self, batch: list[str], config: Optional[EmbedContentConfig] = None) -> list[list[float]]:
+        """Embeds a batch of texts without blocking the event loop."""
+        raise NotImplementedError("Subclasses must implement the aembed method.")
+
+    def is_retryable(self, e: Exception) -> bool:
+        """Whether a failed batch is worth sending again."""
+        return False
+
+
+_client: genai.Client | None = None
+_client_lock = threading.Lock()
+
+
+def _get_client() -> genai.Client:
+    """
+    Returns the genai client shared by all Embedders in the process, its HTTP connections are reused between calls.
+    """
+    global _client
+
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = genai.Client(api_key=settings.gemini_api_key)
+
+    return _client
+
+
+def _values(embeddings) -> list[list[float]]:
+    return [embedding.values if embedding is not None else None for embedding in embeddings or []]
+
+
+class GeminiEmbeddingBackend(BaseEmbeddingBackend):
+    """
+    Embeds texts with a Gemini embedding model.
+    """
+    def __init__(self, model: str = "text-embedding-004"):
+        self._model = model
+
+    @property
+    def model_name(self) -> str:
+        return self._model
+
+    def embed(self, batch: list[str], config: Optional[EmbedContentConfig] = None) -> list[list[float]]:
+        response = _get_client().models.embed_content(
+            model = self._model,
+            contents= batch, # type: ignore
+            config=config,
+        )
+
+        return _values(response.embeddings)
+
+    async def aembed(self, batch: list[str], config: Optional[EmbedContentConfig] = None) -> list[list[float]]:
+        response = await _get_client().aio.models.embed_content(
+            model = self._model,
+            contents= batch, # type: ignore
+            config=config,
+        )
+
+        return _values(response.embeddings)
+
+    def is_retryable(self, e: Exception) -> bool:
+        """
+        Rate limits, server errors and network failures are retried, other client errors would fail again.
+        """
+        if isinstance(e, genai_errors.ClientError):
+            return e.code == 429
+
+        return True
+
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+class HashingEmbeddingBackend(BaseEmbeddingBackend):
+    """
+    Embeds texts locally by feature hashing, without any network access or model weights.
+
+    Words and character trigrams of the lowercased text are hashed into `EMBEDDING_DIMENSIONS`
+    signed buckets and the vector is L2 normalized, so the same text always yields the same
+    vector and texts sharing words or spellings land close under cosine similarity. Meant for
+    offline runs, benchmarks and load tests, not for retrieval quality.
+    """
+    @property
+    def model_name(self) -> str:
+        return f"local-hashing-{EMBEDDING_DIMENSIONS}"
+
+    @staticmethod
+    def _features(text: str) -> list[str]:
+        text = text.lower()
+        words = _TOKEN_RE.findall(text)
+        trigrams = [f"#{word[i:i + 3]}" for word in words for i in range(max(1, len(word) - 2))]
+        return words + trigrams
+
+    def _embed_text(self, text: str) -> list[float]:
+        vector = [0.0] * EMBEDDING_DIMENSIONS
+
+        for feature in self._features(text):
+            digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % EMBEDDING_DIMENSIONS
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+
+        norm = math.sqrt(sum(v * v for v in vector))
+
+        if norm == 0:
+            # Texts without any word, e.g. empty or punctuation only, still need a valid unit vector
+            vector[0] = 1.0
+            return vector
+
+        return [v / norm for v in vector]
+
+    def embed(self, batch: list[str], config: Optional[EmbedContentConfig] = None) -> list[list[float]]:
+        return [self._embed_text(text) for text in batch]
+
+    async def aembed(self, batch: list[str], config: Optional[EmbedContentConfig] = None) -> list[list[float]]:
+        # Pure CPU and fast enough per batch that a thread hop would cost more than it saves
+        return self.embed(batch, config)
+
+
+EMBEDDING_BACKENDS: dict[str, type[BaseEmbeddingBackend]] = {
+    "gemini": GeminiEmbeddingBackend,
+    "hashing": HashingEmbeddingBackend,
+}
+
+
+def get_embedding_backend(name: Optional[str] = None) -> BaseEmbeddingBackend:
+    """
+    Returns the backend named by `name`, or by the `EMBEDDING_BACKEND` setting.
+    """
+    name = name or settings.embedding_backend
+
+    if name not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown embedding backend '{name}', expected one of {list(EMBEDDING_BACKENDS)}.")
+
+    return EMBEDDING_BACKENDS[name]()
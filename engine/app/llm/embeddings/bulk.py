@@ -0,0 +1,167 @@
+import logging
+import time
+import uuid
+from dataclasses import dataclass
+from itertools import islice
+from typing import Iterable, Optional
+from pgvector.asyncpg import register_vector
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.models.vector_embedding import VectorEmbedding as EmbeddingModel
+from app.utils import APP_LOGGER_NAME
+from app.settings.config import settings
+
+logger = logging.getLogger(APP_LOGGER_NAME)
+
+_COPY_COLUMNS = [
+    "id",
+    "source_type",
+    "source_identifier",
+    "related_id",
+    "column_or_chunk_name",
+    "original_text",
+    "embedding",
+]
+"""
+Columns written by COPY, `created_at` is filled in by its server default.
+"""
+
+
+@dataclass
+class BulkWriteStats:
+    """
+    Outcome of a bulk write into `vector_embeddings`.
+    """
+
+    rows: int
+    """
+    Number of rows written.
+    """
+
+    batches: int
+    """
+    Number of COPY batches sent.
+    """
+
+    seconds: float
+    """
+    Wall time of the COPY batches.
+    """
+
+    index_seconds: float = 0.0
+    """
+    Wall time of dropping and rebuilding the HNSW indexes when they were deferred, not part of `seconds`.
+    """
+
+    @property
+    def rows_per_second(self) -> float:
+        """
+        COPY throughput, index rebuilds excluded.
+        """
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+def _to_record(em: EmbeddingModel) -> tuple:
+    if em.id is None:
+        em.id = uuid.uuid4()
+
+    return (
+        em.id,
+        # Postgres enum labels are the member names, e.g. 'CSV_COLUMN'
+        em.source_type.name,
+        em.source_identifier,
+        em.related_id,
+        em.column_or_chunk_name,
+        em.original_text,
+        em.embedding,
+    )
+
+
+async def _drop_hnsw_indexes(db: AsyncSession) -> list[str]:
+    """
+    Drops the HNSW indexes of `vector_embeddings` and returns their definitions to recreate them.
+    """
+    result = await db.execute(text(
+        "SELECT indexname, indexdef FROM pg_indexes "
+        "WHERE schemaname = current_schema() AND tablename = 'vector_embeddings' AND indexdef ILIKE '%USING hnsw%'"
+    ))
+    indexes = result.all()
+
+    for index_name, _ in indexes:
+        await db.execute(text(f'DROP INDEX IF EXISTS "{index_name}"'))
+
+    if indexes:
+        logger.info(f"Dropped {len(indexes)} HNSW indexes for the bulk write: {[name for name, _ in indexes]}")
+
+    return [index_def for _, index_def in indexes]
+
+
+async def copy_embeddings(
+        db: AsyncSession,
+        ems: Iterable[EmbeddingModel],
+        batch_size: Optional[int] = None,
+        defer_index: bool = False,
+) -> BulkWriteStats:
+    """
+    Writes embeddings into `vector_embeddings` with binary COPY, `batch_size` rows per COPY.
+
+    Skips ORM flushes and per-row INSERTs, vectors are sent in pgvector's binary format.
+    The rows are written in the session's transaction, the caller commits. Embeddings without
+    an id get one assigned.
+
+    With `defer_index`, HNSW indexes are dropped before the write and rebuilt once afterwards,
+    which is much faster than maintaining them row by row for large backfills. DROP INDEX takes
+    an ACCESS EXCLUSIVE lock on `vector_embeddings` that is held until the caller commits, so every
+    similarity search and `store_embeddings` call waits for the whole write and the rebuild of all
+    HNSW indexes. Only use it for backfills run while the table may be unavailable.
+    """
+    batch_size = batch_size or settings.embedding_bulk_batch_size
+    rows = batches = 0
+
+    started = time.perf_counter()
+    index_defs = await _drop_hnsw_indexes(db) if defer_index else []
+    index_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+
+    connection = await db.connection()
+    raw_connection = await connection.get_raw_connection()
+    asyncpg_conn = raw_connection.driver_connection
+
+    # COPY needs a binary codec for vector, it is removed again so the pooled
+    # connection keeps the text codec the SQLAlchemy pgvector type relies on
+    await register_vector(asyncpg_conn)
+
+    try:
+        iterator = iter(ems)
+
+        while True:
+            records = [_to_record(em) for em in islice(iterator, batch_size)]
+            if not records:
+                break
+
+            await asyncpg_conn.copy_records_to_table(
+                EmbeddingModel.__tablename__,
+                records=records,
+                columns=_COPY_COLUMNS,
+            )
+
+            rows += len(records)
+            batches += 1
+    finally:
+        await asyncpg_conn.reset_type_codec("vector", schema="public")
+
+    seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for index_def in index_defs:
+        await db.execute(text(index_def))
+    index_seconds += time.perf_counter() - started
+
+    stats = BulkWriteStats(rows=rows, batches=batches, seconds=seconds, index_seconds=index_seconds)
+    logger.info(
+        f"Bulk wrote {stats.rows} embeddings in {stats.batches} batches, {stats.seconds:.2f}s ({stats.rows_per_second:.0f} rows/s)"
+        + (f", rebuilt {len(index_defs)} HNSW indexes in {stats.index_seconds:.2f}s" if index_defs else "")
+    )
+
+    return stats
@@ -0,0 +1,192 @@
+import hashlib
+import logging
+import threading
+from array import array
+from collections import OrderedDict
+from sqlalchemy import select, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from app.db.models.embedding_cache import EmbeddingCacheEntry
+from app.db.models.vector_embedding import EMBEDDING_DIMENSIONS
+from app.db.session import AsyncSessionLocal
+from app.utils import APP_LOGGER_NAME, SingletonMeta
+from app.settings.config import settings
+
+logger = logging.getLogger(APP_LOGGER_NAME)
+
+PERSIST_BATCH_ROWS = 1000
+"""
+Rows written per INSERT into, and keys looked up per SELECT from, the `embedding_cache` table.
+"""
+
+CacheKey = tuple[str, str, str]
+"""
+Model, task type and SHA-256 of the text.
+"""
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache(metaclass=SingletonMeta):
+    """
+    EmbeddingCache keeps embeddings of texts that were embedded before, so repeated
+    header and query strings are not sent to the embedding provider again.
+
+    Entries are keyed by model, task type and the SHA-256 of the text. An in-process LRU
+    of `embedding_cache_max_entries` embeddings sits in front of the `embedding_cache`
+    Postgres table, which survives restarts and is shared between workers. The sync
+    embedding path only uses the in-process tier.
+    """
+    def __init__(self):
+        if hasattr(self, '_initialized') and self._initialized:
+            return
+
+        self._enabled = settings.embedding_cache_enabled
+        self._persistent = settings.embedding_cache_persistent
+        self._max_entries = settings.embedding_cache_max_entries
+
+        # float32 arrays take a fraction of the memory of lists of Python floats
+        self._entries: OrderedDict[CacheKey, array] = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.memory_hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+
+        self._initialized = True
+
+    @property
+    def enabled(self) -> bool:
+        return self._enabled
+
+    def get_many(self, keys: list[CacheKey]) -> dict[CacheKey, list[float]]:
+        """
+        Looks the keys up in the in-process tier, returns the embeddings that were found.
+        """
+        found: dict[CacheKey, list[float]] = {}
+
+        with self._lock:
+            for key in keys:
+                values = self._entries.get(key)
+                if values is not None:
+                    self._entries.move_to_end(key)
+                    found[key] = values.tolist()
+
+            self.memory_hits += len(found)
+
+        return found
+
+    def put_many(self, items: dict[CacheKey, list[float]]):
+        """
+        Adds embeddings to the in-process tier, evicting the least recently used ones.
+        """
+        with self._lock:
+            for key, values in items.items():
+                self._entries[key] = array("f", values)
+                self._entries.move_to_end(key)
+
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    async def aget_many(self, keys: list[CacheKey]) -> dict[CacheKey, list[float]]:
+        """
+        Looks the keys up in the in-process tier and then in Postgres, returns the embeddings that were found.
+
+        Embeddings found in Postgres are promoted into the in-process tier. Keys found in neither count as misses.
+        Failures to read from Postgres are logged, never raised, keys read before the failure are still returned.
+        """
+        found = self.get_many(keys)
+        remaining = [key for key in keys if key not in found]
+
+        if remaining and self._persistent:
+            persisted: dict[CacheKey, list[float]] = {}
+
+            try:
+                async with AsyncSessionLocal() as db:
+                    # A tuple IN binds 3 parameters per key, asyncpg allows at most 32767 per statement
+                    for start in range(0, len(remaining), PERSIST_BATCH_ROWS):
+                        batch = remaining[start:start + PERSIST_BATCH_ROWS]
+                        rows = await db.execute(
+                            select(
+                                EmbeddingCacheEntry.model,
+                                EmbeddingCacheEntry.task_type,
+                                EmbeddingCacheEntry.text_hash,
+                                EmbeddingCacheEntry.embedding,
+                            ).where(
+                                tuple_(
+                                    EmbeddingCacheEntry.model,
+                                    EmbeddingCacheEntry.task_type,
+                                    EmbeddingCacheEntry.text_hash,
+                                ).in_(batch)
+                            )
+                        )
+
+                        persisted.update(
+                            ((model, task_type, hash_), [float(v) for v in embedding])
+                            for model, task_type, hash_, embedding in rows
+                        )
+            except Exception as e:
+                logger.error(f"Failed to read embeddings from the persistent cache: {e}")
+
+            if persisted:
+                self.put_many(persisted)
+                found.update(persisted)
+
+            with self._lock:
+                self.persistent_hits += len(persisted)
+
+        with self._lock:
+            self.misses += len(keys) - len(found)
+
+        return found
+
+    async def aput_many(self, items: dict[CacheKey, list[float]]):
+        """
+        Adds embeddings to both tiers. Failures to write to Postgres are logged, never raised.
+        """
+        self.put_many(items)
+
+        rows = [
+            {"model": model, "task_type": task_type, "text_hash": hash_, "embedding": values}
+            for (model, task_type, hash_), values in items.items()
+            # The table column has a fixed size, embeddings of any other size are only kept in memory
+            if len(values) == EMBEDDING_DIMENSIONS
+        ]
+
+        if not rows or not self._persistent:
+            return
+
+        try:
+            async with AsyncSessionLocal() as db:
+                # A multi-row INSERT binds 4 parameters per row, asyncpg allows at most 32767 per statement
+                for start in range(0, len(rows), PERSIST_BATCH_ROWS):
+                    batch = rows[start:start + PERSIST_BATCH_ROWS]
+                    await db.execute(insert(EmbeddingCacheEntry).values(batch).on_conflict_do_nothing())
+                await db.commit()
+        except Exception as e:
+            logger.error(f"Failed to write embeddings to the persistent cache: {e}")
+
+    def record_misses(self, count: int):
+        """
+        Counts lookups of the sync path that missed the in-process tier.
+        """
+        with self._lock:
+            self.misses += count
+
+    def stats(self) -> dict:
+        """
+        Hit and miss counters along with the current size of the in-process tier.
+        """
+        with self._lock:
+            hits = self.memory_hits + self.persistent_hits
+            lookups = hits + self.misses
+
+            return {
+                "memory_hits": self.memory_hits,
+                "persistent_hits": self.persistent_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "max_entries": self._max_entries,
+            }
@@ -1,53 +1,294 @@
+import asyncio
 import logging
-from google import genai
+import time
+from concurrent.futures import ThreadPoolExecutor
 from app.settings.config import settings
 from app.utils import APP_LOGGER_NAME
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional, List
-from google.genai.types import EmbedContentConfig
+from google.genai.types import EmbedContentConfig, ContentEmbedding
 from app.db.models.vector_embedding import VectorEmbedding as EmbeddingModel
+from app.llm.embeddings.backends import BaseEmbeddingBackend, get_embedding_backend
+from app.llm.embeddings.bulk import copy_embeddings
+from app.llm.embeddings.cache import CacheKey, EmbeddingCache, text_hash
+from app.services.vector_index import InMemoryVectorIndex
 
 logger = logging.getLogger(APP_LOGGER_NAME)
 
+def _make_batches(content: list[str], max_items: int, max_chars: int) -> list[tuple[int, list[str]]]:
+    """
+    Splits `content` into batches of at most `max_items` texts and roughly `max_chars` characters.
+
+    Returns each batch along with the index of its first text in `content`.
+    """
+    batches: list[tuple[int, list[str]]] = []
+    start, batch, batch_chars = 0, [], 0
+
+    for i, text in enumerate(content):
+        if batch and (len(batch) >= max_items or batch_chars + len(text) > max_chars):
+            batches.append((start, batch))
+            start, batch, batch_chars = i, [], 0
+
+        batch.append(text)
+        batch_chars += len(text)
+
+    if batch:
+        batches.append((start, batch))
+
+    return batches
+
+
+def _check_embeddings(batch: list[str], vectors: list[list[float]]) -> list[ContentEmbedding]:
+    if not vectors or len(vectors) != len(batch) or any(not values for values in vectors):
+        raise ValueError(f"Expected {len(batch)} embeddings, received {len([v for v in vectors or [] if v])}.")
+
+    return [ContentEmbedding(values=values) for values in vectors]
+
+
+def _retry_delay(backend: BaseEmbeddingBackend, batch: list[str], attempt: int, e: Exception) -> float:
+    """
+    Returns how long to wait before retrying a failed batch, re-raises `e` when it should not be retried.
+    """
+    if attempt > settings.embedding_max_retries or not backend.is_retryable(e):
+        raise e
+
+    delay = settings.embedding_retry_backoff_seconds * 2 ** (attempt - 1)
+    logger.warning(f"Embedding batch of {len(batch)} texts failed, retrying in {delay:.1f}s ({attempt}/{settings.embedding_max_retries}): {e}")
+
+    return delay
+
+
+def _collect_results(
+        content: list[str],
+        batches: list[tuple[int, list[str]]],
+        outputs: list[Optional[list[ContentEmbedding]]],
+) -> Optional[list[Optional[ContentEmbedding]]]:
+    """
+    Places the embeddings of each batch at the position of its texts, texts of failed batches stay `None`.
+    """
+    results: list[Optional[ContentEmbedding]] = [None] * len(content)
+    failed = 0
+
+    for (start, batch), embeddings in zip(batches, outputs):
+        if embeddings is None:
+            failed += len(batch)
+            continue
+
+        results[start:start + len(batch)] = embeddings
+
+    if failed == len(content):
+        return None
+
+    if failed:
+        logger.warning(f"Generated embeddings for {len(content) - failed} of {len(content)} texts, {failed} failed.")
+
+    return results
+
+
+def _assemble_results(keys: list[CacheKey], embeddings: dict[CacheKey, list[float]]) -> Optional[list[Optional[ContentEmbedding]]]:
+    """
+    Builds the result aligned with the input texts from embeddings found by key, `None` when none was found.
+    """
+    results = [ContentEmbedding(values=embeddings[key]) if key in embeddings else None for key in keys]
+
+    if all(result is None for result in results):
+        return None
+
+    return results
+
+
 class Embedder:
     """
     Embedder is a class that is responsible for generating embeddings
     for a given text using a specified gemini model.
+
+    The provider is an embedding backend, Gemini by default. The `EMBEDDING_BACKEND` setting,
+    or the `backend` argument, selects another one, e.g. the local hashing backend for offline runs.
     """
-    def __init__(self, config: Optional[EmbedContentConfig] = None):
+    def __init__(self, config: Optional[EmbedContentConfig] = None, backend: Optional[BaseEmbeddingBackend] = None):
         self._embedding_config: Optional[EmbedContentConfig] = None
-        self._model = "text-embedding-004"
+        self._backend = backend or get_embedding_backend()
+        self._model = self._backend.model_name
 
         if config:
             self._embedding_config = config
-    
-    def generate_embeddings(self, content: list[str]) :
+
+    def _embed_batch(self, batch: list[str]) -> list[ContentEmbedding]:
+        """
+        Embeds a single batch, retrying transient failures with exponential backoff.
+        """
+        attempt = 0
+
+        while True:
+            try:
+                return _check_embeddings(batch, self._backend.embed(batch, self._embedding_config))
+            except Exception as e:
+                attempt += 1
+                time.sleep(_retry_delay(self._backend, batch, attempt, e))
+
+    async def _aembed_batch(self, batch: list[str]) -> list[ContentEmbedding]:
+        """
+        Embeds a single batch without blocking the event loop, retrying transient failures with exponential backoff.
+        """
+        attempt = 0
+
+        while True:
+            try:
+                return _check_embeddings(batch, await self._backend.aembed(batch, self._embedding_config))
+            except Exception as e:
+                attempt += 1
+                await asyncio.sleep(_retry_delay(self._backend, batch, attempt, e))
+
+    def _cache_keys(self, content: list[str]) -> list[CacheKey]:
+        """
+        Cache keys of the texts, embeddings differ per model, task type and output size.
+        """
+        model = self._model
+        task_type = ""
+
+        if self._embedding_config:
+            task_type = self._embedding_config.task_type or ""
+            if self._embedding_config.output_dimensionality:
+                model = f"{model}/{self._embedding_config.output_dimensionality}"
+
+        return [(model, task_type, text_hash(text)) for text in content]
+
+    @staticmethod
+    def _pending(content: list[str], keys: list[CacheKey], cached: dict[CacheKey, list[float]]) -> tuple[list[CacheKey], list[str]]:
+        """
+        Keys and texts that still need embedding, each distinct text once.
+        """
+        pending = {key: text for key, text in zip(keys, content) if key not in cached}
+        return list(pending.keys()), list(pending.values())
+
+    @staticmethod
+    def _fresh_items(pending_keys: list[CacheKey], fresh: Optional[list[Optional[ContentEmbedding]]]) -> dict[CacheKey, list[float]]:
+        return {
+            key: embedding.values
+            for key, embedding in zip(pending_keys, fresh or [])
+            if embedding is not None and embedding.values
+        }
+
+    def generate_embeddings(self, content: list[str]) -> Optional[list[Optional[ContentEmbedding]]]:
         """
         Generate embeddings for the given text using the specified gemini model.
+
+        Texts embedded before are served from the in-process tier of the `EmbeddingCache`,
+        only the remaining ones are sent to the provider.
+
+        Blocks on network I/O, async callers should use `agenerate_embeddings`.
         """
-        try:
-            client = genai.Client(api_key=settings.gemini_api_key)
+        cache = EmbeddingCache()
 
-            response = client.models.embed_content(
-                model = self._model,
-                contents= content, # type: ignore
-                config=self._embedding_config,
-            )
+        if not content or not cache.enabled:
+            return self._generate_uncached(content)
+
+        keys = self._cache_keys(content)
+        cached = cache.get_many(list(dict.fromkeys(keys)))
+        pending_keys, pending_texts = self._pending(content, keys, cached)
+        cache.record_misses(len(pending_keys))
+
+        if pending_texts:
+            fresh = self._fresh_items(pending_keys, self._generate_uncached(pending_texts))
+            cache.put_many(fresh)
+            cached.update(fresh)
+
+        return _assemble_results(keys, cached)
+
+    async def agenerate_embeddings(self, content: list[str]) -> Optional[list[Optional[ContentEmbedding]]]:
+        """
+        Async version of `generate_embeddings`, batches are awaited on the event loop
+        with at most `embedding_max_concurrency` requests in flight.
+
+        Texts embedded before are served from the `EmbeddingCache`, in memory or from Postgres,
+        only the remaining ones are sent to the provider and then added to both tiers.
+        """
+        cache = EmbeddingCache()
+
+        if not content or not cache.enabled:
+            return await self._agenerate_uncached(content)
+
+        keys = self._cache_keys(content)
+        cached = await cache.aget_many(list(dict.fromkeys(keys)))
+        pending_keys, pending_texts = self._pending(content, keys, cached)
+
+        if pending_texts:
+            fresh = self._fresh_items(pending_keys, await self._agenerate_uncached(pending_texts))
+            await cache.aput_many(fresh)
+            cached.update(fresh)
+
+        return _assemble_results(keys, cached)
+
+    def _generate_uncached(self, content: list[str]) -> Optional[list[Optional[ContentEmbedding]]]:
+        """
+        Sends all texts to the provider.
+
+        Large inputs are split into batches of `embedding_batch_size` texts, which are sent
+        concurrently, at most `embedding_max_concurrency` at a time. The result is aligned with
+        `content`, texts of a batch that failed after its retries are `None`. Returns `None`
+        when no embedding could be generated at all.
+        """
+        if not content:
+            return []
+
+        batches = _make_batches(content, settings.embedding_batch_size, settings.embedding_batch_max_chars)
+
+        def _run(batch: list[str]) -> Optional[list[ContentEmbedding]]:
+            try:
+                return self._embed_batch(batch)
+            except Exception as e:
+                logger.error(f"Error generating embeddings for a batch of {len(batch)} texts: {e}")
+                return None
+
+        if len(batches) == 1:
+            outputs = [_run(batches[0][1])]
+        else:
+            with ThreadPoolExecutor(max_workers=min(settings.embedding_max_concurrency, len(batches))) as executor:
+                outputs = list(executor.map(_run, [batch for _, batch in batches]))
+
+        return _collect_results(content, batches, outputs)
+
+    async def _agenerate_uncached(self, content: list[str]) -> Optional[list[Optional[ContentEmbedding]]]:
+        """
+        Async version of `_generate_uncached`, batches are awaited on the event loop
+        with at most `embedding_max_concurrency` requests in flight.
+        """
+        if not content:
+            return []
+
+        batches = _make_batches(content, settings.embedding_batch_size, settings.embedding_batch_max_chars)
+        slots = asyncio.Semaphore(settings.embedding_max_concurrency)
+
+        async def _run(batch: list[str]) -> Optional[list[ContentEmbedding]]:
+            async with slots:
+                try:
+                    return await self._aembed_batch(batch)
+                except Exception as e:
+                    logger.error(f"Error generating embeddings for a batch of {len(batch)} texts: {e}")
+                    return None
+
+        outputs = await asyncio.gather(*(_run(batch) for _, batch in batches))
+
+        return _collect_results(content, batches, list(outputs))
 
-            return response.embeddings
-        except Exception as e:
-            logger.error(f"Error generating embeddings: {e}")
-            return None
-        
 
     async def store_embeddings(self, db: AsyncSession, ems: List[EmbeddingModel]):
         """
         Store the generated embeddings in a database or any other storage.
+
+        Lists of at least `embedding_bulk_min_rows` embeddings are written with binary COPY,
+        see `copy_embeddings`, smaller ones through the ORM.
         """
         if not ems or not isinstance(ems, list):
             raise ValueError("ems must be a non-empty list of EmbeddingModel objects")
         
-        db.add_all(ems)
+        if len(ems) >= settings.embedding_bulk_min_rows:
+            await copy_embeddings(db, ems)
+        else:
+            db.add_all(ems)
+
         await db.commit()
 
+        InMemoryVectorIndex().mark_stale({em.source_identifier for em in ems})
+
         return ems
\ No newline at end of file
@@ -1,4 +1,4 @@
-from .search.similarity_search import FindRelevantCSV
+from .search.similarity_search import FindRelevantCSV, FindRelevantCSVBatch
 from .embeddings.generate_embedding import QueryEmbeddingGeneratorTool
 from .parquet.get_schema import GetParquetFileSchemaTool
 from .parquet.query_using_storage_key import QueryParquetFileUsingStorageKeyTool
@@ -7,6 +7,7 @@ from .parquet.query_using_upload_id import QueryParquetFileUsingUploadIdTool
 __all__ = [
     "QueryEmbeddingGeneratorTool",
     "FindRelevantCSV",
+    "FindRelevantCSVBatch",
     "GetParquetFileSchemaTool",
     "QueryParquetFileUsingStorageKeyTool",
     "QueryParquetFileUsingUploadIdTool"
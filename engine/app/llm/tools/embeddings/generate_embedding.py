@@ -29,7 +29,7 @@ async def generate_query_embedding(query: str) -> List[float]:
     try:
         embedder = Embedder() 
         
-        embeddings_response = embedder.generate_embeddings(content=[query])
+        embeddings_response = await embedder.agenerate_embeddings(content=[query])
 
         if embeddings_response is None:
             logger.error(f"Embedder failed to generate embeddings for query: '{query}'. Received None.")
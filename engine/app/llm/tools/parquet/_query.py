@@ -0,0 +1,81 @@
+import logging
+import pyarrow as pa
+from pydantic import BaseModel
+from typing import Optional, Any
+from app.services.arrow_results import table_preview
+from app.services.duck_db import DuckDBConn, execute_with_row_limit
+from app.services.parquet_cache import ParquetCache
+from app.services.query_cache import QueryResultCache
+from app.utils import APP_LOGGER_NAME
+
+logger = logging.getLogger(APP_LOGGER_NAME)
+
+MAX_ROWS_RETURNED = 500
+"""
+Maximum number of rows to return from a query. This is a safeguard to prevent excessive data retrieval.
+"""
+
+class QueryResult(BaseModel):
+    """
+    Represents the Result of a query executed on a Parquet file.
+    """
+    result: Optional[Any] = None
+    """
+    The result of the query execution as a column-major preview, see `table_preview`.
+    """
+
+    truncated: bool = False
+    """
+    True when the query produced more rows than the row limit and only the first rows were returned.
+    """
+
+    error_message: Optional[str] = None
+    """
+    Error message if any error occurs during query execution.
+    """
+
+
+def run_parquet_query_arrow(storage_key: str, sql_query: str, max_rows: int = MAX_ROWS_RETURNED) -> tuple[pa.Table, bool]:
+    """
+    Runs `sql_query` against the Parquet object at `storage_key`, returning at most `max_rows` rows
+    as an Arrow table along with whether the result was truncated.
+
+    The row limit is enforced inside DuckDB, see `execute_with_row_limit`. Results are served
+    from the `QueryResultCache` when the same query was run recently against the same object.
+    """
+    max_rows = max(1, min(max_rows, MAX_ROWS_RETURNED))
+
+    def _run_query() -> tuple[pa.Table, bool]:
+        # The SQL is written by the LLM, so it only gets a sandbox that can read this one object
+        with ParquetCache().lease(storage_key) as parquet_uri, DuckDBConn(sandbox_paths=[parquet_uri]) as duckdb_conn:
+            conn = duckdb_conn.conn
+
+            if conn is None:
+                raise ValueError("DuckDB connection is not established.")
+
+            return execute_with_row_limit(conn, sql_query, (parquet_uri,), max_rows)
+
+    table, truncated = QueryResultCache().fetch(
+        storage_key,
+        sql_query,
+        _run_query,
+        sizeof=lambda result: result[0].nbytes,
+        key_parts=(max_rows,),
+    )
+
+    if truncated:
+        logger.info(f"Query returned more than {max_rows} rows. Returning only the first {max_rows} rows.")
+    else:
+        logger.info(f"Query Executed, {table.num_rows} rows returned.")
+
+    return table, truncated
+
+
+def run_parquet_query(storage_key: str, sql_query: str, max_rows: int = MAX_ROWS_RETURNED) -> QueryResult:
+    """
+    Runs `sql_query` against the Parquet object at `storage_key` and returns a column-major
+    preview of at most `max_rows` rows, the form the LLM tools hand back to the model.
+    """
+    table, truncated = run_parquet_query_arrow(storage_key, sql_query, max_rows)
+
+    return QueryResult(result=table_preview(table), truncated=truncated)
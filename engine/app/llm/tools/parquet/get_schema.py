@@ -1,10 +1,11 @@
+import asyncio
 import logging
 import dspy
 import uuid
 from typing import Any, Optional
 from pydantic import BaseModel
-from app.settings.config import settings
 from app.services.duck_db import DuckDBConn
+from app.services.parquet_cache import ParquetCache
 from app.utils import APP_LOGGER_NAME
 from app.db.session import AsyncSessionLocal 
 from app.db.models.upload import Upload as UploadModel 
@@ -79,27 +80,28 @@ async def _fetch_schema_from_db(upload_id: str):
         try:
             logger.info(f"Upload record found for upload_id {upload_id}: {upload_record.storage_key}")
 
-            s3_uri = f"s3://{settings.r2_bucket_name}/{upload_record.storage_key}"
+            lease = await asyncio.to_thread(ParquetCache().lease, upload_record.storage_key)
 
             describe_query = "DESCRIBE SELECT * FROM read_parquet(?);"
 
-            with DuckDBConn() as duck_conn:
-                conn = duck_conn.conn
+            with lease as parquet_uri:
+                async with DuckDBConn() as duck_conn:
+                    conn = duck_conn.conn
                 
-                if conn is None:
-                    raise ValueError("DuckDB connection is not established.")
+                    if conn is None:
+                        raise ValueError("DuckDB connection is not established.")
                 
-                header_result = conn.execute(describe_query, (s3_uri,)).fetchall()
+                    header_result = await asyncio.to_thread(lambda: conn.execute(describe_query, (parquet_uri,)).fetchall())
 
-                if not header_result:
-                    raise ValueError(f"No schema information found for upload_id: {upload_id}. The file might not be a valid Parquet file or is empty.")
+                    if not header_result:
+                        raise ValueError(f"No schema information found for upload_id: {upload_id}. The file might not be a valid Parquet file or is empty.")
                 
-                return FileSchemaResult(
-                    upload_id=upload_id,
-                    file_name=upload_record.file_name,
-                    header_result=header_result,
-                    error_message=None
-                )
+                    return FileSchemaResult(
+                        upload_id=upload_id,
+                        file_name=upload_record.file_name,
+                        header_result=header_result,
+                        error_message=None
+                    )
         except ValueError as ve:
             logger.error(f"ValueError while querying upload_id: {upload_id} storage_key: {upload_record.storage_key}: {ve}")
             raise ve
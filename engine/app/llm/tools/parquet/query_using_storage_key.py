@@ -2,45 +2,16 @@ import logging
 import dspy
 import duckdb
 import asyncio
-from pydantic import BaseModel
-from typing import Optional, Any
-from app.services.duck_db import DuckDBConn
+from app.llm.tools.parquet._query import QueryResult, run_parquet_query
 
 from app.utils import APP_LOGGER_NAME
-from app.settings.config import settings
 
 logger = logging.getLogger(APP_LOGGER_NAME)
 
-class QueryResult(BaseModel):
-    """
-    Represents the Result of a query executed on a Parquet file.
-    """
-    result: Optional[Any] = None
-    """
-    The result of the query execution, which can be any type depending on the query.
-    """
 
-    error_message: Optional[str] = None
-    """
-    Error message if any error occurs during query execution.
-    """
-        
-
-def _execute_duckdb_query(storage_key: str, sql_query: str, max_rows_to_return: int = 0) -> QueryResult:
+def _execute_duckdb_query(storage_key: str, sql_query: str, max_rows_to_return: int = 10) -> QueryResult:
     try:
-        s3_uri = f"s3://{settings.r2_bucket_name}/{storage_key}"
-
-        with DuckDBConn() as duckdb_conn:
-            conn = duckdb_conn.conn
-
-            if conn is None:
-                raise ValueError("DuckDB connection is not established.")
-
-            result = conn.execute(sql_query, (s3_uri,)).fetchall()
-
-            logger.info("Query Executed, Result", result)
-
-            return QueryResult(result=result)
+        return run_parquet_query(storage_key, sql_query, max_rows_to_return)
     except duckdb.Error as e:
         logger.error(f"DuckDB error executing query on storage_key {storage_key}: {e}", exc_info=True)
         return QueryResult(error_message=str(e))
@@ -53,7 +24,7 @@ def _execute_duckdb_query(storage_key: str, sql_query: str, max_rows_to_return:
 async def dspy_query_parquet_tool_func(storage_key: str, sql_query: str, max_rows_to_return: int = 10):
     """
     DSPy tool function wrapper. Executes DuckDB query in a thread.
-    Returns list of rows (as dicts) or a list containing a single error dictionary.
+    Returns the rows along with a `truncated` flag, or an error message.
     """
     logger.info(f"Executing query on storage_key {storage_key} with SQL: {sql_query}")
 
@@ -74,7 +45,7 @@ async def dspy_query_parquet_tool_func(storage_key: str, sql_query: str, max_row
             error_message="No results returned from the query."
         )
 
-    return output.result
+    return output
 
 
 
@@ -89,8 +60,10 @@ QueryParquetFileUsingStorageKeyTool = dspy.Tool(
         The SQL query MUST include 'read_parquet(?)' where the '?' will be replaced by the file's S3 URI.
         Example SQL: 'SELECT column1, column2 FROM read_parquet(?) WHERE column1 = ''some_value'' LIMIT 5;
         
-        Returns a list of dictionaries, where each dictionary represents a row (keys are column names)
-        If an error occurs, it returns a list containing a single dictionary with an 'error' key and the 'query_attempted'."
+        Returns the rows under 'result' in column-major form: 'columns', 'types', and 'data' with one list of
+        values per column. At most 'max_rows_to_return' rows are returned. 'truncated' is true when the query
+        produced more rows than that, narrow the query down instead of asking for more rows.
+        If an error occurs, 'error_message' describes it.
         """        
     ),
     func=dspy_query_parquet_tool_func,
@@ -102,6 +75,6 @@ QueryParquetFileUsingStorageKeyTool = dspy.Tool(
     arg_desc={
         "storage_key": "R2 path for the Parquet file, ideally it will be an endpoint ending with '.parquet'.",
         "sql_query": "DuckDB SQL query using 'read_parquet(?)' (e.g., 'SELECT * FROM read_parquet(?) LIMIT 5;').",
-        "max_rows_to_return": "Maximum rows to fetch (default: 10). Results may be truncated if query yields more."
+        "max_rows_to_return": "Maximum rows to fetch (default: 10, at most 500). Results are truncated if the query yields more."
     }
 )
\ No newline at end of file
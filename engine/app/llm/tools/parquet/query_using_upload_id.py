@@ -1,37 +1,16 @@
 import logging
 import dspy
-import re
 import duckdb
 import asyncio
 import uuid
-from pydantic import BaseModel
-from typing import Optional, Any
+from typing import Optional
 from app.db.models.upload import Upload as UploadModel 
-from app.services.duck_db import DuckDBConn
+from app.llm.tools.parquet._query import MAX_ROWS_RETURNED, QueryResult, run_parquet_query
 from app.db.session import AsyncSessionLocal
 from app.utils import APP_LOGGER_NAME
-from app.settings.config import settings
 
 logger = logging.getLogger(APP_LOGGER_NAME)
 
-MAX_ROWS_RETURNED = 500
-"""
-Maximum number of rows to return from a query. This is a safeguard to prevent excessive data retrieval.
-"""
-class QueryResult(BaseModel):
-    """
-    Represents the Result of a query executed on a Parquet file.
-    """
-    result: Optional[Any] = None
-    """
-    The result of the query execution, which can be any type depending on the query.
-    """
-
-    error_message: Optional[str] = None
-    """
-    Error message if any error occurs during query execution.
-    """
-
 async def _fetch_upload_record(upload_id: str) -> Optional[UploadModel]:
     """
     Fetches the upload record from the database using the provided upload_id.
@@ -62,32 +41,7 @@ async def _fetch_upload_record(upload_id: str) -> Optional[UploadModel]:
 
 def _execute_duckdb_query(storage_key: str, sql_query: str) -> QueryResult:
     try:
-        s3_uri = f"s3://{settings.r2_bucket_name}/{storage_key}"
-
-        fetch_limit = MAX_ROWS_RETURNED + 1
-
-        if re.search(r'LIMIT\s+\d+', sql_query, re.IGNORECASE):
-            final_sql = re.sub(r'LIMIT\s+\d+', f'LIMIT {fetch_limit}', sql_query, flags=re.IGNORECASE)
-        else:
-            final_sql = f"{sql_query.rstrip(';')} LIMIT {fetch_limit}"
-
-        logger.info(f"Executing modified SQL: {final_sql}")
-
-        with DuckDBConn() as duckdb_conn:
-            conn = duckdb_conn.conn
-
-            if conn is None:
-                raise ValueError("DuckDB connection is not established.")
-
-            result = conn.execute(sql_query, (s3_uri,)).fetchall()
-
-            if len(result) > MAX_ROWS_RETURNED:
-                logger.info(f"Query returned more than {MAX_ROWS_RETURNED} rows. Returning only the first {MAX_ROWS_RETURNED} rows.")
-                raise ValueError(
-                    f"Query returned more than {MAX_ROWS_RETURNED} rows."
-                )
-
-            return QueryResult(result=result)
+        return run_parquet_query(storage_key, sql_query, MAX_ROWS_RETURNED)
     except duckdb.Error as e:
         logger.error(f"DuckDB error executing query on storage_key {storage_key}: {e}", exc_info=True)
         return QueryResult(error_message=str(e))
@@ -104,7 +58,7 @@ def _execute_duckdb_query(storage_key: str, sql_query: str) -> QueryResult:
 async def dspy_query_parquet_tool_func(upload_id: str, sql_query: str):
     """
     DSPy tool function wrapper. Executes DuckDB query in a thread.
-    Returns list of rows (as dicts) or a list containing a single error dictionary.
+    Returns the rows along with a `truncated` flag, or an error message.
     """
     logger.info(f"Executing query using upload_id {upload_id}")
 
@@ -136,7 +90,7 @@ async def dspy_query_parquet_tool_func(upload_id: str, sql_query: str):
             error_message="No results returned from the query."
         )
 
-    return output.result
+    return output
 
 
 
@@ -154,6 +108,8 @@ QueryParquetFileUsingUploadIdTool = dspy.Tool(
         * **Safety:** "You MUST ALWAYS include a `LIMIT` clause to prevent data overflow. Default to `LIMIT 10` if the user doesn't specify a count."
         * **Intent:** "Analyze the user's intent. If they ask for categories or unique values, you MUST use aggregation functions like `SELECT DISTINCT` or `GROUP BY`."
         * **Syntax:** "e.g., 'The SQL query MUST contain `read_parquet(?)` as the table name.'"
+        * **Result Format:** "The rows come back column-major, `columns` and `types` list each column once and `data` holds one list of values per column."
+        * **Row Limit:** "At most 500 rows are returned. If `truncated` is true the result was cut off, narrow the query or aggregate instead."
 
         Common Scenarios & Examples (Show, Don't Just Tell):
         - **Scenario 1:** User wants to retrieve specific columns from a Parquet file.
@@ -1,13 +1,15 @@
 import logging
 import dspy
-from typing import Dict, List
+from typing import Dict, List, Tuple
 from pydantic import BaseModel, Field
-from sqlalchemy import select
 from app.utils import APP_LOGGER_NAME
 from typing import Optional
 from app.db.session import AsyncSessionLocal
 from app.llm.embeddings import Embedder
-from app.db.models.vector_embedding import VectorEmbedding as EmbeddingModel
+from app.db.models.vector_embedding import EmbeddingSourceType, VectorEmbedding as EmbeddingModel
+from app.services.vector_search import search_embeddings, search_embeddings_batch, hybrid_search_embeddings, hybrid_search_embeddings_batch
+from app.services.vector_index import InMemoryVectorIndex
+from app.settings.config import settings
 
 logger = logging.getLogger(APP_LOGGER_NAME)
 
@@ -39,6 +41,17 @@ class FindRelevantCSVResult(BaseModel):
     Original text of the embedding, if available.
     """
 
+class BatchSimilaritySearchResult(BaseModel):
+    """
+    Results of one query of a batched similarity search.
+    """
+    query_str: str
+
+    results: List[FindRelevantCSVResult]
+    """
+    Most similar embeddings for `query_str`, empty when its embedding could not be generated.
+    """
+
 class SimilaritySearchInput(BaseModel):
     """Input schema for the FindRelevantCSVResult tool."""
     query_str: str = Field(
@@ -77,7 +90,7 @@ async def generate_query_embedding(query: str) -> List[float]:
     try:
         embedder = Embedder() 
         
-        embeddings_response = embedder.generate_embeddings(content=[query])
+        embeddings_response = await embedder.agenerate_embeddings(content=[query])
 
         if embeddings_response is None:
             logger.error(f"Embedder failed to generate embeddings for query: '{query}'. Received None.")
@@ -112,6 +125,68 @@ async def generate_query_embedding(query: str) -> List[float]:
 
 
 
+def _parse_source_type(value) -> Optional[EmbeddingSourceType]:
+    """
+    Accepts a source type by value, e.g. 'csv', or by name, e.g. 'CSV_COLUMN'.
+    """
+    try:
+        return EmbeddingSourceType(value)
+    except ValueError:
+        pass
+
+    try:
+        return EmbeddingSourceType[str(value).upper()]
+    except KeyError:
+        logger.warning(f"Invalid source_type filter: {value}. Skipping this filter.")
+        return None
+
+
+def _build_filters(additional_filters: Optional[dict]) -> Tuple[list, Optional[EmbeddingSourceType]]:
+    """
+    Turns the filters of a tool call into column conditions and a source type.
+    """
+    filters = []
+    source_type = None
+
+    if additional_filters:
+        for key, value in additional_filters.items():
+            if key == "source_type":
+                # Passed on separately so the search can use the partial index of the type
+                source_type = _parse_source_type(value)
+            elif hasattr(EmbeddingModel, key):
+                filters.append(getattr(EmbeddingModel, key) == value)
+            else:
+                logger.warning(f"Invalid filter key: {key}. Skipping this filter.")
+
+    return filters, source_type
+
+
+def _in_memory_source_identifier(additional_filters: Optional[dict]) -> Optional[str]:
+    """
+    Source identifier of a search the in-process vector index can answer, one filtered
+    by `source_identifier` and at most `source_type`.
+    """
+    if not additional_filters or not InMemoryVectorIndex().enabled:
+        return None
+
+    if set(additional_filters) - {"source_identifier", "source_type"}:
+        return None
+
+    source_identifier = additional_filters.get("source_identifier")
+    return source_identifier if isinstance(source_identifier, str) else None
+
+
+def _to_result(embedding: EmbeddingModel) -> FindRelevantCSVResult:
+    return FindRelevantCSVResult(
+        id=str(embedding.id),
+        source_type=embedding.source_type.value,
+        source_identifier=embedding.source_identifier,
+        related_id=embedding.related_id,
+        column_or_chunk_name=embedding.column_or_chunk_name,
+        original_text=embedding.original_text
+    )
+
+
 async def similarity_search(query_str: str, k: int = 5, additional_filters: Optional[dict] = None) -> List[FindRelevantCSVResult]:
     """
     Based on the query string, find the most simialr embeddings in the Database
@@ -135,36 +210,29 @@ async def similarity_search(query_str: str, k: int = 5, additional_filters: Opti
     if not isinstance(k, int) or k <= 0:
         logger.error(f"Invalid k value: {k}. Must be a positive integer.")
         raise ValueError("k must be a positive integer.")
-    
-    async with AsyncSessionLocal() as db:
-        try:
-            stmt = select(EmbeddingModel).where(EmbeddingModel.deleted_at.is_(None))
 
-            if additional_filters:
-                for key, value in additional_filters.items():
-                    if hasattr(EmbeddingModel, key):
-                        stmt = stmt.where(getattr(EmbeddingModel, key) == value)
-                    else:
-                        logger.warning(f"Invalid filter key: {key}. Skipping this filter.")
+    filters, source_type = _build_filters(additional_filters)
+    source_identifier = _in_memory_source_identifier(additional_filters)
 
+    if source_identifier:
+        similar_embeddings = InMemoryVectorIndex().search(
+            source_identifier, embedding, k, source_type, query_str if settings.vector_search_hybrid else None
+        )
 
-            stmt = stmt.order_by(EmbeddingModel.embedding.cosine_distance(embedding)).limit(k) 
-            
-            result = await db.execute(stmt)
-            similar_embeddings = result.scalars().all()
+        if similar_embeddings is not None:
+            logger.info(f"Found {len(similar_embeddings)} similar embeddings in memory for query_str: '{query_str}'")
+            return [_to_result(embedding) for embedding in similar_embeddings]
+
+    async with AsyncSessionLocal() as db:
+        try:
+            if settings.vector_search_hybrid:
+                similar_embeddings = await hybrid_search_embeddings(db, query_str, embedding, k, filters, source_type=source_type)
+            else:
+                similar_embeddings = await search_embeddings(db, embedding, k, filters, source_type=source_type)
 
             logger.info(f"Found {len(similar_embeddings)} similar embeddings for query_str: '{query_str}'")
 
-            search_result: List[FindRelevantCSVResult] = [
-                FindRelevantCSVResult(
-                    id=str(embedding.id),
-                    source_type=embedding.source_type.value,
-                    source_identifier=embedding.source_identifier,
-                    related_id=embedding.related_id,
-                    column_or_chunk_name=embedding.column_or_chunk_name,
-                    original_text=embedding.original_text
-                ) for embedding in similar_embeddings
-            ]
+            search_result: List[FindRelevantCSVResult] = [_to_result(embedding) for embedding in similar_embeddings]
 
             return search_result
         
@@ -201,4 +269,99 @@ FindRelevantCSV = dspy.Tool(
         "k": "The number of similar embeddings to return.",
         "additional_filters": "Optional filters to apply to the search."
     }
-)
\ No newline at end of file
+)
+
+
+async def batch_similarity_search(query_strs: List[str], k: int = 5, additional_filters: Optional[dict] = None) -> List[BatchSimilaritySearchResult]:
+    """
+    Similarity search for several query strings at once, the queries are embedded in one
+    request and all searches run in a single database round trip.
+
+    Args:
+        - query_strs: The query strings to search for, one result entry per query string in the same order.
+        - k: The number of similar embeddings to return per query string.
+        - additional_filters: Optional filters applied to every search.
+    """
+    logger.info(f"Starting batched similarity search for {len(query_strs)} queries, k: {k}, additional_filters: {additional_filters}")
+
+    if not query_strs or not all(isinstance(query, str) and query for query in query_strs):
+        logger.error("Invalid query_strs provided. Must be a non-empty list of non-empty strings.")
+        raise ValueError("query_strs must be a non-empty list of non-empty strings.")
+
+    if not isinstance(k, int) or k <= 0:
+        logger.error(f"Invalid k value: {k}. Must be a positive integer.")
+        raise ValueError("k must be a positive integer.")
+
+    embeddings_response = await Embedder().agenerate_embeddings(content=query_strs)
+
+    if embeddings_response is None:
+        logger.error(f"Embedder failed to generate embeddings for all {len(query_strs)} queries.")
+        raise ValueError("Failed to generate embeddings for the queries due to an internal embedder error.")
+
+    # Queries whose embedding failed get no results, the others are still searched
+    embedded = [
+        (i, [float(v) for v in embedding.values])
+        for i, embedding in enumerate(embeddings_response)
+        if embedding is not None and embedding.values
+    ]
+
+    results: List[List[FindRelevantCSVResult]] = [[] for _ in query_strs]
+
+    query_texts = [query_strs[i] for i, _ in embedded]
+    query_embeddings = [embedding for _, embedding in embedded]
+
+    filters, source_type = _build_filters(additional_filters)
+    source_identifier = _in_memory_source_identifier(additional_filters)
+    similar_embeddings = None
+
+    if source_identifier and embedded:
+        similar_embeddings = InMemoryVectorIndex().search_batch(
+            source_identifier, query_embeddings, k, source_type, query_texts if settings.vector_search_hybrid else None
+        )
+
+    if similar_embeddings is not None:
+        for (i, _), embeddings in zip(embedded, similar_embeddings):
+            results[i] = [_to_result(embedding) for embedding in embeddings]
+
+        return [BatchSimilaritySearchResult(query_str=query, results=result) for query, result in zip(query_strs, results)]
+
+    async with AsyncSessionLocal() as db:
+        try:
+            if settings.vector_search_hybrid:
+                similar_embeddings = await hybrid_search_embeddings_batch(db, query_texts, query_embeddings, k, filters, source_type=source_type)
+            else:
+                similar_embeddings = await search_embeddings_batch(db, query_embeddings, k, filters, source_type=source_type)
+
+            for (i, _), embeddings in zip(embedded, similar_embeddings):
+                results[i] = [_to_result(embedding) for embedding in embeddings]
+
+            logger.info(f"Found {sum(len(r) for r in results)} similar embeddings for {len(query_strs)} queries")
+
+            return [BatchSimilaritySearchResult(query_str=query, results=result) for query, result in zip(query_strs, results)]
+
+        except Exception as e:
+            logger.error(f"Error during batched similarity search database operation: {e}", exc_info=True)
+            return [BatchSimilaritySearchResult(query_str=query, results=[]) for query in query_strs]
+
+FindRelevantCSVBatch = dspy.Tool(
+    name="FindRelevantCSVBatch",
+    desc=(
+        """
+            Same as FindRelevantCSV for several query strings at once, use it instead of calling FindRelevantCSV repeatedly when a question mentions multiple entities or metrics.
+
+            It returns one entry per query string, in the same order, each containing:
+            - query_str: The query string of the entry.
+            - results: The Relevant CSVs for that query string, with the same fields as FindRelevantCSV returns.
+        """),
+    func=batch_similarity_search,
+    arg_types={
+        "query_strs": List[str],
+        "additional_filters": Optional[dict],
+        "k": int,
+    },
+    arg_desc={
+        "query_strs": "The query strings to search for similar embeddings, one per entity or metric. Detailed query strings give better results.",
+        "k": "The number of similar embeddings to return per query string.",
+        "additional_filters": "Optional filters applied to every search."
+    }
+)
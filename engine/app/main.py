@@ -10,8 +10,9 @@ from app.cloud.cf.r2_client import R2Client
 from fastapi.middleware.cors import CORSMiddleware
 from app.llm.modules import GenerativeModel
 from app.mcp import MCPManager
-from app.workers import ThreadPoolWorkerQueue
+from app.workers import ThreadPoolWorkerQueue, ProcessPoolWorker
 from app.kg.graph_manager import KnowledgeGraph
+from app.services.duck_db import DuckDBPool
 
 # setup logging configuration
 setup_logging() 
@@ -28,14 +29,23 @@ async def lifespan(app: FastAPI):
     """
     logger.info("Application startup initiated.")
     try:
-        app.state.graph_db = KnowledgeGraph()
+        graph_db = KnowledgeGraph()
+        await graph_db.initialize()
+        app.state.graph_db = graph_db
         r2_client = R2Client()
         mcp_manager = MCPManager()
+        duckdb_pool = DuckDBPool()
         thread_pool_worker = ThreadPoolWorkerQueue(num_workers=settings.thread_pool_worker_count)
+        process_pool_worker = ProcessPoolWorker(
+            num_workers=settings.multi_process_worker_count,
+            max_pending=settings.multi_process_max_pending,
+        )
 
         app.state.r2_client = r2_client
         app.state.mcp_manager = mcp_manager
+        app.state.duckdb_pool = duckdb_pool
         app.state.thread_pool_worker = thread_pool_worker
+        app.state.process_pool_worker = process_pool_worker
 
         # Set up MLflow for tracking DSPy Runs
         mlflow.set_tracking_uri("http://localhost:3080")  
@@ -58,7 +68,7 @@ async def lifespan(app: FastAPI):
 
     if hasattr(app.state, "graph_db"):
         try:
-            app.state.graph_db.close()
+            await app.state.graph_db.close()
         except Exception as e:
             logger.error(f"Error closing Neo4j connection: {e}")
 
@@ -74,6 +84,18 @@ async def lifespan(app: FastAPI):
         except Exception as e:
             logger.error(f"Error closing MCP manager connection: {e}")
 
+    if hasattr(app.state, "duckdb_pool"):
+        try:
+            app.state.duckdb_pool.close()
+        except Exception as e:
+            logger.error(f"Error closing DuckDB pool: {e}")
+
+    if hasattr(app.state, "process_pool_worker"):
+        try:
+            app.state.process_pool_worker.shutdown(wait=False)
+        except Exception as e:
+            logger.error(f"Error shutting down process pool worker: {e}")
+
 # Initialize FastAPI app
 app = FastAPI(
     title=settings.project_name,
@@ -89,6 +111,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Has-More"],
 )
 
 app.include_router(api.api_router, prefix="/api/v1", tags=["api"])
\ No newline at end of file
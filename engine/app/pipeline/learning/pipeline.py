@@ -101,7 +101,7 @@ class LearningPipeline(dspy.Module):
 
             nodes: list[KgMetricsNode] = []
             
-            ems = self._embedder.generate_embeddings([enc.model_dump_json() for enc in encodings if isinstance(enc, Encoding)])
+            ems = await self._embedder.agenerate_embeddings([enc.model_dump_json() for enc in encodings if isinstance(enc, Encoding)])
             
             if not ems or not isinstance(ems, list):
                 logger.error("Embedder did not return valid embeddings")
@@ -114,11 +114,12 @@ class LearningPipeline(dspy.Module):
                 
                 # Create an embedding for each encoding
                 
-                em = ems[i].values
+                em = ems[i].values if ems[i] is not None else None
 
                 if em is None or not isinstance(em, list):
-                    logger.error("Embedding values are not valid")
-                    raise ValueError("Embedding values are not valid")
+                    # The batch holding this encoding failed, keep the metrics that were embedded
+                    logger.warning(f"No embedding generated for metric {enc.raw_metric}, skipping it")
+                    continue
                 
                 nodes.append(KgMetricsNode(
                     raw_metric=enc.raw_metric,
@@ -127,7 +128,12 @@ class LearningPipeline(dspy.Module):
                     remarks=None
                 ))
 
-            self._kg.add_metrics_nodes(nodes)
+            if not nodes:
+                logger.error("No valid embeddings were generated for the encoded metrics")
+                raise ValueError("No valid embeddings were generated for the encoded metrics")
+
+            await self._kg.initialize()
+            await self._kg.add_metrics_nodes(nodes)
 
             logger.info(f"LearningPipeline completed successfully with session ID: {self.session_id}")
 
@@ -0,0 +1,38 @@
+import pyarrow as pa
+
+PREVIEW_MAX_CELL_CHARS = 256
+"""
+String cells longer than this are cut short in previews, a single free text column should not fill the LLM context.
+"""
+
+
+def _preview_value(value, max_cell_chars: int):
+    if isinstance(value, str) and len(value) > max_cell_chars:
+        return value[:max_cell_chars] + "..."
+
+    return value
+
+
+def table_preview(
+        table: pa.Table,
+        max_rows: int | None = None,
+        max_cell_chars: int = PREVIEW_MAX_CELL_CHARS,
+) -> dict:
+    """
+    Builds a compact, column-major preview of an Arrow table for the LLM context.
+
+    Column names and types are listed once instead of being repeated for every row,
+    and `data` holds one list of values per column. Only the first `max_rows` rows are
+    converted to Python values, long strings are cut at `max_cell_chars` characters.
+    """
+    preview = table if max_rows is None else table.slice(0, max_rows)
+
+    return {
+        "columns": preview.column_names,
+        "types": [str(field.type) for field in preview.schema],
+        "data": [
+            [_preview_value(value, max_cell_chars) for value in column.to_pylist()]
+            for column in preview.columns
+        ],
+        "num_rows": preview.num_rows,
+    }
@@ -1,55 +1,378 @@
+import asyncio
 import logging
+import re
+import threading
+from collections import OrderedDict
 import duckdb
-from app.utils import APP_LOGGER_NAME
+import pyarrow as pa
+from app.utils import APP_LOGGER_NAME, SingletonMeta
 from app.settings.config import settings
 
 logger = logging.getLogger(APP_LOGGER_NAME)
 
+_MEMORY_UNITS = {
+    "b": 1, "bytes": 1,
+    "kb": 1000, "mb": 1000**2, "gb": 1000**3, "tb": 1000**4,
+    "kib": 1024, "mib": 1024**2, "gib": 1024**3, "tib": 1024**4,
+}
+
+_MEMORY_LIMIT_RE = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([a-z]*)\s*$", re.IGNORECASE)
+
+# Everything SQL run in a sandbox can add to or change in its catalog
+_SANDBOX_CATALOG_SQL = """
+SELECT 'schema', schema_name, NULL FROM duckdb_schemas() WHERE NOT internal
+UNION ALL SELECT 'table', table_name, sql FROM duckdb_tables()
+UNION ALL SELECT 'view', view_name, sql FROM duckdb_views() WHERE NOT internal
+UNION ALL SELECT 'sequence', sequence_name, sql FROM duckdb_sequences()
+UNION ALL SELECT 'function', function_name, CAST(macro_definition AS VARCHAR) FROM duckdb_functions() WHERE NOT internal
+UNION ALL SELECT 'type', type_name, NULL FROM duckdb_types() WHERE NOT internal
+UNION ALL SELECT 'secret', name, secret_string FROM duckdb_secrets()
+ORDER BY ALL
+"""
+
+class DuckDBPool(metaclass=SingletonMeta):
+    """
+    DuckDBPool holds one shared in-memory DuckDB database for the process,
+    configured once with httpfs and the R2 credentials, and hands out cursors over it.
+
+    Extension loading and settings are paid once per process instead of once per query.
+    Every checkout gets a fresh cursor that is closed on release, so session settings, `USE`
+    and temporary objects never carry over to the next caller. Global settings, attached
+    databases and tables are shared by all cursors, so the shared database is only for SQL
+    the app writes itself. SQL written by the LLM or a client runs in a sandbox, see `acquire_sandbox`.
+
+    `duckdb_memory_limit` and `duckdb_threads` bound the shared database, and are split evenly
+    between the `duckdb_pool_size` slots for sandboxes, so sandboxes checked out at once stay
+    within them too.
+    """
+    def __init__(self):
+        if hasattr(self, '_initialized') and self._initialized:
+            return
+
+        self._size = settings.duckdb_pool_size
+        self._timeout = settings.duckdb_pool_timeout
+
+        # Bounds cursors and sandboxes checked out at once
+        self._slots = threading.BoundedSemaphore(self._size)
+
+        self._sandbox_memory_limit = _memory_limit_bytes(settings.duckdb_memory_limit) // self._size
+        self._sandbox_threads = max(1, settings.duckdb_threads // self._size)
+
+        # Idle sandboxes by the paths and views they expose, least recently used first
+        self._idle_sandboxes: OrderedDict[tuple, list[tuple[duckdb.DuckDBPyConnection, list]]] = OrderedDict()
+        self._idle_count = 0
+        # Sandboxes checked out, by the id of the cursor handed out over them
+        self._sandboxes_out: dict[int, tuple[tuple, duckdb.DuckDBPyConnection, list]] = {}
+        self._sandbox_lock = threading.Lock()
+
+        self._database = self._create_database()
+
+        self._initialized = True
+
+    def _create_database(self) -> duckdb.DuckDBPyConnection:
+        """
+        Creates and configures the shared DuckDB database.
+        """
+        logger.info("Initializing shared DuckDB database")
+
+        database = duckdb.connect(database=':memory:', read_only=False)
+
+        try:
+            database.execute(f"SET GLOBAL threads={settings.duckdb_threads};")
+            database.execute(f"SET GLOBAL memory_limit='{settings.duckdb_memory_limit}';")
+            database.execute("INSTALL httpfs;")
+            database.execute("LOAD httpfs;")
+            database.execute(f"SET GLOBAL s3_endpoint='{_r2_endpoint()}';")
+            database.execute(f"SET GLOBAL s3_access_key_id='{settings.r2_access_key_id}';")
+            database.execute(f"SET GLOBAL s3_secret_access_key='{settings.r2_secret_access_key}';")
+            database.execute("SET GLOBAL s3_use_ssl=true;")
+            database.execute("SET GLOBAL s3_region='auto';")
+            database.execute("SET GLOBAL s3_url_style='path';")
+            # Keep Parquet footers and HTTP metadata of remote objects in memory between queries
+            database.execute("SET GLOBAL enable_object_cache=true;")
+            database.execute("SET GLOBAL enable_http_metadata_cache=true;")
+        except duckdb.Error as e:
+            logger.error(f"Failed to configure DuckDB database: {e}")
+            database.close()
+            raise
+
+        return database
+
+    def _create_sandbox(self, allowed_paths: list[str], views: dict[str, str]) -> duckdb.DuckDBPyConnection:
+        """
+        Creates an in-memory database that can only read `allowed_paths`.
+
+        External access is switched off apart from those paths and the configuration is locked,
+        so the SQL run on it can't read other local files or objects, change settings, ATTACH
+        databases or load extensions. `views` maps view names to the Parquet file they read.
+        """
+        sandbox = duckdb.connect(database=':memory:', read_only=False)
+
+        try:
+            sandbox.execute(f"SET threads={self._sandbox_threads};")
+            sandbox.execute(f"SET memory_limit='{self._sandbox_memory_limit}B';")
+            sandbox.execute("SET enable_object_cache=true;")
+            sandbox.execute("SET enable_http_metadata_cache=true;")
+            sandbox.execute("SET allow_persistent_secrets=false;")
+
+            if any(path.startswith("s3://") for path in allowed_paths):
+                # Installed by the shared database, a secret is redacted from SQL unlike the s3_* settings
+                sandbox.execute("LOAD httpfs;")
+                sandbox.execute(
+                    f"""
+                    CREATE SECRET r2 (
+                        TYPE s3,
+                        KEY_ID {_sql_literal(settings.r2_access_key_id)},
+                        SECRET {_sql_literal(settings.r2_secret_access_key)},
+                        ENDPOINT {_sql_literal(_r2_endpoint())},
+                        REGION 'auto',
+                        URL_STYLE 'path',
+                        USE_SSL true
+                    );
+                    """
+                )
+
+            for name, path in views.items():
+                sandbox.execute(f'CREATE VIEW "{name}" AS SELECT * FROM read_parquet({_sql_literal(path)});')
+
+            sandbox.execute(f"SET allowed_paths=[{', '.join(_sql_literal(path) for path in allowed_paths)}];")
+            sandbox.execute("SET autoinstall_known_extensions=false;")
+            sandbox.execute("SET autoload_known_extensions=false;")
+            sandbox.execute("SET enable_external_access=false;")
+            sandbox.execute("SET lock_configuration=true;")
+        except duckdb.Error as e:
+            logger.error(f"Failed to configure DuckDB sandbox: {e}")
+            sandbox.close()
+            raise
+
+        return sandbox
+
+    def _take_slot(self):
+        if not self._slots.acquire(timeout=self._timeout):
+            logger.error(f"No DuckDB cursor available after {self._timeout} seconds.")
+            raise TimeoutError("Timed out waiting for a DuckDB connection.")
+
+    def acquire(self) -> duckdb.DuckDBPyConnection:
+        """
+        Checks out a fresh cursor over the shared database, waiting while the pool is full.
+
+        Blocks for up to `duckdb_pool_timeout` seconds, async callers use `DuckDBConn` with `async with`.
+
+        Raises:
+            TimeoutError: If no cursor is available within `duckdb_pool_timeout` seconds.
+        """
+        self._take_slot()
+
+        try:
+            return self._database.cursor()
+        except Exception:
+            self._slots.release()
+            raise
+
+    def acquire_sandbox(self, allowed_paths: list[str], views: dict[str, str] | None = None) -> duckdb.DuckDBPyConnection:
+        """
+        Checks out a cursor over a sandboxed database for SQL the app didn't write, that can only read `allowed_paths`.
+
+        Sandboxes take a slot of the pool like cursors do. An idle sandbox over the same paths
+        and views is reused when there is one, which skips loading httpfs, creating the secret
+        and the views, and keeps the Parquet footers it already read. A new one is created otherwise.
+
+        Raises:
+            TimeoutError: If no slot is available within `duckdb_pool_timeout` seconds.
+        """
+        views = views or {}
+        key = (tuple(allowed_paths), tuple(sorted(views.items())))
+
+        self._take_slot()
+
+        try:
+            with self._sandbox_lock:
+                idle = self._idle_sandboxes.get(key)
+                sandbox = None
+                if idle:
+                    sandbox, catalog = idle.pop()
+                    self._idle_count -= 1
+                    if not idle:
+                        del self._idle_sandboxes[key]
+
+            if sandbox is None:
+                sandbox = self._create_sandbox(allowed_paths, views)
+                catalog = sandbox.execute(_SANDBOX_CATALOG_SQL).fetchall()
+
+            cursor = sandbox.cursor()
+            with self._sandbox_lock:
+                self._sandboxes_out[id(cursor)] = (key, sandbox, catalog)
+
+            return cursor
+        except Exception:
+            self._slots.release()
+            raise
+
+    def _return_sandbox(self, key: tuple, sandbox: duckdb.DuckDBPyConnection, catalog: list):
+        """
+        Keeps a released sandbox for reuse, unless the SQL run on it changed its catalog.
+
+        Temporary objects go with the cursor, anything else the SQL created, dropped or
+        replaced, e.g. a table or a view named like one of `views`, would be seen by the
+        next caller, so the sandbox is closed instead.
+        """
+        try:
+            reusable = sandbox.execute(_SANDBOX_CATALOG_SQL).fetchall() == catalog
+        except duckdb.Error:
+            reusable = False
+
+        if not reusable:
+            sandbox.close()
+            return
+
+        with self._sandbox_lock:
+            self._idle_sandboxes.setdefault(key, []).append((sandbox, catalog))
+            self._idle_sandboxes.move_to_end(key)
+            self._idle_count += 1
+
+            evicted = []
+            while self._idle_count > self._size:
+                oldest_key, oldest = next(iter(self._idle_sandboxes.items()))
+                evicted.append(oldest.pop(0)[0])
+                self._idle_count -= 1
+                if not oldest:
+                    del self._idle_sandboxes[oldest_key]
+
+        for idle_sandbox in evicted:
+            idle_sandbox.close()
+
+    def release(self, connection: duckdb.DuckDBPyConnection):
+        """
+        Closes a cursor checked out of the pool and frees its slot, a sandbox is kept for reuse.
+        """
+        try:
+            with self._sandbox_lock:
+                checked_out = self._sandboxes_out.pop(id(connection), None)
+
+            connection.close()
+
+            if checked_out is not None:
+                self._return_sandbox(*checked_out)
+        finally:
+            self._slots.release()
+
+    def close(self):
+        """
+        Closes the shared database and the idle sandboxes.
+        """
+        with self._sandbox_lock:
+            for idle in self._idle_sandboxes.values():
+                for sandbox, _ in idle:
+                    sandbox.close()
+            self._idle_sandboxes.clear()
+            self._idle_count = 0
+
+        self._database.close()
+        SingletonMeta._instances.pop(DuckDBPool, None)
+        logger.info("DuckDB pool closed.")
+
+
+def _r2_endpoint() -> str:
+    return f"{settings.r2_account_id}.r2.cloudflarestorage.com/{settings.r2_bucket_name}"
+
+
+def _sql_literal(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _memory_limit_bytes(memory_limit: str) -> int:
+    """
+    Parses a DuckDB memory limit such as '2GB' or '512MiB' into bytes.
+
+    Raises:
+        ValueError: If the limit has no size or an unknown unit.
+    """
+    match = _MEMORY_LIMIT_RE.match(memory_limit)
+
+    if not match or match.group(2).lower() not in _MEMORY_UNITS:
+        raise ValueError(f"Invalid DuckDB memory limit: {memory_limit!r}")
+
+    return int(float(match.group(1)) * _MEMORY_UNITS[match.group(2).lower()])
+
+
 class DuckDBConn:
     """
-    DuckDBConn is manages and creates DuckDB connections.
+    DuckDBConn checks out a DuckDB cursor from the `DuckDBPool` and returns it to the pool on exit.
+
+    With `sandbox_paths`, it checks out a sandboxed database that can only read those paths
+    instead, for SQL written by the LLM or a client. `sandbox_views` maps view names to the
+    Parquet file they expose in the sandbox.
+
+    Use `async with` from async code, the checkout then waits for a free slot off the event loop.
     """
-    def __init__(self,):
+    def __init__(self, sandbox_paths: list[str] | None = None, sandbox_views: dict[str, str] | None = None):
         self._connection: duckdb.DuckDBPyConnection | None = None
+        self._sandbox_paths = sandbox_paths
+        self._sandbox_views = sandbox_views
 
     @property
     def conn(self):
         return self._connection
 
+    def _acquire(self) -> duckdb.DuckDBPyConnection:
+        if self._sandbox_paths is not None:
+            return DuckDBPool().acquire_sandbox(self._sandbox_paths, self._sandbox_views)
+
+        return DuckDBPool().acquire()
+
     def __enter__(self):
         """
-        Enters the context manager and initializes the DuckDB connection.
+        Enters the context manager and checks out a DuckDB cursor.
         """
-        logger.info("Initializing DuckDB connection")
-
-        self._connection = duckdb.connect(database=':memory:', read_only=False)
-
-        try:
-            self._connection.execute("PRAGMA threads=4") # Set the number of threads to 4
-            self._connection.execute("INSTALL httpfs;")
-            self._connection.execute("LOAD httpfs;")
-            self._connection.execute(f"SET s3_endpoint='{settings.r2_account_id}.r2.cloudflarestorage.com/{settings.r2_bucket_name}';")
-            self._connection.execute(f"SET s3_access_key_id='{settings.r2_access_key_id}';")
-            self._connection.execute(f"SET s3_secret_access_key='{settings.r2_secret_access_key}';")
-            self._connection.execute("SET s3_use_ssl=true;")
-            self._connection.execute("SET s3_region='auto';")
-            self._connection.execute("SET s3_url_style='path';")
-        except duckdb.Error as e:
-            logger.error(f"Failed to configure DuckDB connection: {e}")
-            if self._connection:
-                self._connection.close()
-            
-            self._connection = None
-            raise
+        self._connection = self._acquire()
 
         return self
     
     def __exit__(self, exc_type, exc_val, exc_tb):
         """
-        Exits the context manager and closes the DuckDB connection.
+        Exits the context manager and returns the DuckDB cursor to the pool.
         """
         if self._connection:
-            self._connection.close()
-            logger.info("DuckDB connection closed.")
+            DuckDBPool().release(self._connection)
 
         self._connection = None
+
+    async def __aenter__(self):
+        self._connection = await asyncio.to_thread(self._acquire)
+
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.__exit__(exc_type, exc_val, exc_tb)
+
+
+def execute_with_row_limit(
+        conn: duckdb.DuckDBPyConnection,
+        sql_query: str,
+        parameters: tuple | list | None = None,
+        max_rows: int = 500,
+) -> tuple[pa.Table, bool]:
+    """
+    Executes `sql_query` and returns at most `max_rows` rows as an Arrow table, along with whether more rows were available.
+
+    The query is wrapped in an outer `LIMIT max_rows + 1`, so DuckDB stops producing rows
+    once the limit is reached instead of materializing the whole result. Statements that
+    cannot be used as a subquery, e.g. `PRAGMA`, run as is and stop reading after the limit.
+
+    Rows are fetched as Arrow columns, no Python object is created per cell.
+    """
+    inner_sql = sql_query.strip().rstrip(";").rstrip()
+    limited_sql = f"SELECT * FROM ({inner_sql}) AS limited_query LIMIT {max_rows + 1}"
+
+    try:
+        table = conn.execute(limited_sql, parameters).fetch_arrow_table()
+    except (duckdb.ParserException, duckdb.BinderException):
+        reader = conn.execute(sql_query, parameters).fetch_record_batch(max_rows + 1)
+        try:
+            table = pa.Table.from_batches([reader.read_next_batch()])
+        except StopIteration:
+            table = reader.schema.empty_table()
+
+    truncated = table.num_rows > max_rows
+
+    return table.slice(0, max_rows), truncated
@@ -0,0 +1,361 @@
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Iterator
+from app.cloud import R2Client, R2ClientError
+from app.utils import APP_LOGGER_NAME, SingletonMeta
+from app.settings.config import settings
+
+logger = logging.getLogger(APP_LOGGER_NAME)
+
+_PROCESS_DIR_RE = re.compile(r"^worker-(\d+)$")
+"""
+Name of the subdirectory each process keeps its cached objects in.
+"""
+
+_CACHE_FILE_SUFFIXES = (".parquet", ".parquet.part")
+"""
+Suffixes of the files the cache writes, only such files are ever removed.
+"""
+
+@dataclass
+class _CacheEntry:
+    """
+    A Parquet object stored on local disk.
+    """
+
+    etag: str
+    """
+    ETag of the R2 object the local copy was downloaded from.
+    """
+
+    path: str
+    """
+    Path of the local copy.
+    """
+
+    size: int
+    """
+    Size of the local copy in bytes.
+    """
+
+    validated_at: float
+    """
+    Monotonic time at which the ETag was last confirmed against R2.
+    """
+
+    readers: int = 0
+    """
+    Number of leases handed out for the local copy that were not released yet.
+    """
+
+    evicted: bool = False
+    """
+    Set when the entry left the cache while it still had readers, the last reader removes the file.
+    """
+
+
+class ParquetLease:
+    """
+    A location of a Parquet object that stays readable until the lease is released.
+
+    Use it as a context manager, which yields the path or URI to hand to DuckDB.
+    """
+    def __init__(self, uri: str, entry: _CacheEntry | None = None):
+        self.uri = uri
+        self._entry = entry
+        self._released = False
+
+    def release(self):
+        """
+        Releases the lease, a local copy evicted in the meantime is removed once its last lease is released.
+        """
+        if self._released:
+            return
+
+        self._released = True
+
+        if self._entry is not None:
+            ParquetCache()._release(self._entry)
+
+    def __enter__(self) -> str:
+        return self.uri
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+
+class ParquetCache(metaclass=SingletonMeta):
+    """
+    ParquetCache keeps local copies of Parquet objects stored in R2, so repeated DuckDB
+    queries against the same upload read from local disk instead of fetching it again.
+
+    Entries are keyed by storage key and ETag, an object that changed in R2 is downloaded again.
+    The cache is bounded by `parquet_cache_max_bytes` and evicts the least recently used objects.
+    Large objects are cached like small ones, they are the ones a remote read costs the most for.
+    Only an object larger than the whole cache is read remotely with range requests, its footer
+    is then kept by the object cache of the sandbox reading it.
+
+    Each process keeps its files in its own `worker-<pid>` subdirectory of `parquet_cache_dir`.
+    Local copies are handed out as leases, a copy that is evicted or invalidated while leased is
+    only removed once its last lease is released, so disk usage can briefly exceed the limit.
+    """
+    def __init__(self):
+        if hasattr(self, '_initialized') and self._initialized:
+            return
+
+        self._enabled = settings.parquet_cache_enabled
+        self._root_dir = os.path.abspath(settings.parquet_cache_dir)
+        self._cache_dir = os.path.join(self._root_dir, f"worker-{os.getpid()}")
+        self._max_bytes = settings.parquet_cache_max_bytes
+        self._revalidate_seconds = settings.parquet_cache_revalidate_seconds
+
+        self._entries: OrderedDict[str, _CacheEntry] = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        # Download locks with the number of threads using them, dropped once no thread does
+        self._key_locks: dict[str, tuple[threading.Lock, int]] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.bypasses = 0
+        self.evictions = 0
+
+        if self._enabled:
+            os.makedirs(self._cache_dir, exist_ok=True)
+            self._remove_stale_files()
+
+        self._initialized = True
+
+    def lease(self, storage_key: str) -> ParquetLease:
+        """
+        Resolves a storage key to the location DuckDB should read it from, kept readable until the lease is released.
+
+        The location is the path of a local copy when the object is cached or could be cached,
+        otherwise the `s3://` URI of the object. Never raises for cache failures, any error falls
+        back to reading the object remotely. Downloads on a miss, so async callers run it in a thread.
+        """
+        s3_uri = f"s3://{settings.r2_bucket_name}/{storage_key}"
+
+        if not self._enabled:
+            return ParquetLease(s3_uri)
+
+        try:
+            entry = self._resolve_local(storage_key)
+        except Exception as e:
+            logger.error(f"Parquet cache failed for storage_key {storage_key}, reading remotely: {e}")
+            entry = None
+
+        if entry is None:
+            return ParquetLease(s3_uri)
+
+        return ParquetLease(entry.path, entry)
+
+    def etag(self, storage_key: str) -> str | None:
+        """
+        Returns the ETag of the object, from the cache when it was validated recently.
+        """
+        with self._lock:
+            entry = self._entries.get(storage_key)
+            if entry and self._is_fresh(entry):
+                return entry.etag
+
+        try:
+            etag, _ = R2Client().head_object(storage_key)
+            return etag
+        except R2ClientError:
+            return None
+
+    def invalidate(self, storage_key: str):
+        """
+        Drops the local copy of an object, if any, once it has no readers left.
+        """
+        with self._lock:
+            entry = self._entries.pop(storage_key, None)
+            removable = entry is not None and self._evict(entry)
+
+        if removable:
+            self._remove_file(entry.path)
+
+    def stats(self) -> dict:
+        """
+        Hit and miss counters along with the current size of the cache.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "bypasses": self.bypasses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "total_bytes": self._total_bytes,
+                "max_bytes": self._max_bytes,
+            }
+
+    def _resolve_local(self, storage_key: str) -> _CacheEntry | None:
+        """
+        Returns the entry of the local copy with one more reader, None when the object is read remotely.
+        """
+        with self._lock:
+            entry = self._entries.get(storage_key)
+            if entry and self._is_fresh(entry) and os.path.exists(entry.path):
+                self._entries.move_to_end(storage_key)
+                entry.readers += 1
+                self.hits += 1
+                return entry
+
+        # Only one thread downloads a given object, others wait and then hit the cache
+        with self._key_lock(storage_key):
+            etag, size = R2Client().head_object(storage_key)
+
+            with self._lock:
+                entry = self._entries.get(storage_key)
+                if entry and entry.etag == etag and os.path.exists(entry.path):
+                    entry.validated_at = time.monotonic()
+                    self._entries.move_to_end(storage_key)
+                    entry.readers += 1
+                    self.hits += 1
+                    return entry
+
+            if size > self._max_bytes:
+                with self._lock:
+                    self.bypasses += 1
+                return None
+
+            with self._lock:
+                self.misses += 1
+
+            self.invalidate(storage_key)
+            self._make_room(size)
+
+            # Unique per download, a copy of the same version that is still being read is never overwritten
+            file_name = f"{hashlib.sha256(storage_key.encode()).hexdigest()}-{uuid.uuid4().hex}.parquet"
+            path = os.path.join(self._cache_dir, file_name)
+            tmp_path = f"{path}.part"
+
+            try:
+                R2Client().download_file(storage_key, tmp_path, object_size=size)
+                os.replace(tmp_path, path)
+            except Exception:
+                self._remove_file(tmp_path)
+                raise
+
+            entry = _CacheEntry(etag=etag, path=path, size=size, validated_at=time.monotonic(), readers=1)
+
+            with self._lock:
+                self._entries[storage_key] = entry
+                self._total_bytes += size
+
+            logger.info(f"Cached Parquet object {storage_key} ({size} bytes) at {path}")
+
+            return entry
+
+    @contextmanager
+    def _key_lock(self, storage_key: str) -> Iterator[None]:
+        with self._lock:
+            key_lock, users = self._key_locks.get(storage_key, (threading.Lock(), 0))
+            self._key_locks[storage_key] = (key_lock, users + 1)
+
+        try:
+            with key_lock:
+                yield
+        finally:
+            with self._lock:
+                key_lock, users = self._key_locks[storage_key]
+                if users == 1:
+                    del self._key_locks[storage_key]
+                else:
+                    self._key_locks[storage_key] = (key_lock, users - 1)
+
+    def _release(self, entry: _CacheEntry):
+        with self._lock:
+            entry.readers -= 1
+            removable = entry.evicted and entry.readers == 0
+
+        if removable:
+            self._remove_file(entry.path)
+
+    def _evict(self, entry: _CacheEntry) -> bool:
+        """
+        Accounts for an entry that left the cache, returns whether its file can be removed right away.
+
+        Must be called holding `self._lock`.
+        """
+        self._total_bytes -= entry.size
+        entry.evicted = True
+
+        return entry.readers == 0
+
+    def _make_room(self, size: int):
+        """
+        Evicts least recently used objects until `size` more bytes fit in the cache.
+        """
+        removable: list[_CacheEntry] = []
+
+        with self._lock:
+            while self._entries and self._total_bytes + size > self._max_bytes:
+                _, entry = self._entries.popitem(last=False)
+                self.evictions += 1
+                if self._evict(entry):
+                    removable.append(entry)
+
+        for entry in removable:
+            self._remove_file(entry.path)
+
+    def _remove_stale_files(self):
+        """
+        Removes the files of processes that are gone, and of an earlier process that had the same pid.
+
+        Only files the cache writes are removed, anything else in `parquet_cache_dir` is left alone.
+        """
+        for name in os.listdir(self._root_dir):
+            match = _PROCESS_DIR_RE.match(name)
+            directory = os.path.join(self._root_dir, name)
+
+            if match is None or not os.path.isdir(directory):
+                continue
+
+            pid = int(match.group(1))
+            if pid != os.getpid() and self._is_running(pid):
+                continue
+
+            for file_name in os.listdir(directory):
+                if file_name.endswith(_CACHE_FILE_SUFFIXES):
+                    self._remove_file(os.path.join(directory, file_name))
+
+            if pid != os.getpid():
+                try:
+                    os.rmdir(directory)
+                except OSError:
+                    pass
+
+    @staticmethod
+    def _is_running(pid: int) -> bool:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+
+        return True
+
+    def _is_fresh(self, entry: _CacheEntry) -> bool:
+        return time.monotonic() - entry.validated_at < self._revalidate_seconds
+
+    @staticmethod
+    def _remove_file(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
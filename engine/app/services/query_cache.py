@@ -0,0 +1,162 @@
+import logging
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, TypeVar
+from app.services.parquet_cache import ParquetCache
+from app.utils import APP_LOGGER_NAME, SingletonMeta
+from app.settings.config import settings
+
+logger = logging.getLogger(APP_LOGGER_NAME)
+
+T = TypeVar("T")
+
+_QUOTED_RE = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\")")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_sql(sql_query: str) -> str:
+    """
+    Normalizes a SQL string for use as a cache key.
+
+    Collapses whitespace and drops trailing semicolons, leaving quoted literals and identifiers untouched.
+    """
+    parts = _QUOTED_RE.split(sql_query)
+
+    for i in range(0, len(parts), 2):
+        parts[i] = _WHITESPACE_RE.sub(" ", parts[i])
+
+    return "".join(parts).strip().rstrip(";").rstrip()
+
+
+def estimate_nbytes(value: Any) -> int:
+    """
+    Estimates the memory held by a query result made of nested lists, tuples and dicts.
+    """
+    size = sys.getsizeof(value)
+
+    if isinstance(value, (list, tuple)):
+        size += sum(estimate_nbytes(item) for item in value)
+    elif isinstance(value, dict):
+        size += sum(estimate_nbytes(k) + estimate_nbytes(v) for k, v in value.items())
+
+    return size
+
+
+@dataclass
+class _CacheEntry:
+    value: Any
+    nbytes: int
+    expires_at: float
+
+
+class QueryResultCache(metaclass=SingletonMeta):
+    """
+    QueryResultCache keeps the results of queries run against Parquet objects, so re-issued
+    queries, e.g. across planner iterations or users, return without running DuckDB again.
+
+    Entries are keyed by storage key, the object's ETag and the normalized SQL, so a changed
+    object never serves stale results. Entries expire after `query_cache_ttl_seconds`, the cache
+    is bounded by `query_cache_max_bytes` with LRU eviction, and results larger than
+    `query_cache_max_entry_bytes` are not cached so one large result cannot evict everything else.
+    """
+    def __init__(self):
+        if hasattr(self, '_initialized') and self._initialized:
+            return
+
+        self._enabled = settings.query_cache_enabled
+        self._ttl_seconds = settings.query_cache_ttl_seconds
+        self._max_bytes = settings.query_cache_max_bytes
+        self._max_entry_bytes = settings.query_cache_max_entry_bytes
+
+        self._entries: OrderedDict[tuple, _CacheEntry] = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0
+        self.evictions = 0
+
+        self._initialized = True
+
+    def fetch(
+        self,
+        storage_key: str,
+        sql_query: str,
+        execute: Callable[[], T],
+        sizeof: Callable[[T], int] = estimate_nbytes,
+        key_parts: tuple = (),
+    ) -> T:
+        """
+        Returns the cached result of `sql_query` against `storage_key`, running `execute` on a miss.
+
+        `key_parts` are added to the cache key for anything besides the SQL that changes the result,
+        such as a row limit. Errors raised by `execute` are not cached.
+        """
+        etag = ParquetCache().etag(storage_key) if self._enabled else None
+
+        # Without an ETag there is no way to tell whether the object changed, so do not cache
+        if etag is None:
+            return execute()
+
+        key = (storage_key, etag, normalize_sql(sql_query), *key_parts)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry.expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.value
+
+            if entry:
+                self._remove(key)
+            self.misses += 1
+
+        value = execute()
+        self._put(key, value, sizeof(value))
+
+        return value
+
+    def stats(self) -> dict:
+        """
+        Hit and miss counters along with the current size of the cache.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "rejected": self.rejected,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "total_bytes": self._total_bytes,
+                "max_bytes": self._max_bytes,
+            }
+
+    def _put(self, key: tuple, value: Any, nbytes: int):
+        with self._lock:
+            if nbytes > self._max_entry_bytes or nbytes > self._max_bytes:
+                self.rejected += 1
+                logger.info(f"Query result of {nbytes} bytes is too large to cache.")
+                return
+
+            if key in self._entries:
+                self._remove(key)
+
+            while self._entries and self._total_bytes + nbytes > self._max_bytes:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.evictions += 1
+
+            self._entries[key] = _CacheEntry(value=value, nbytes=nbytes, expires_at=time.monotonic() + self._ttl_seconds)
+            self._total_bytes += nbytes
+
+    def _remove(self, key: tuple):
+        entry = self._entries.pop(key)
+        self._total_bytes -= entry.nbytes
@@ -1,24 +1,34 @@
-import io
+import asyncio
+import hashlib
 import logging
+import tempfile
 import uuid
 import duckdb
-import pandas as pd
 import traceback
-from typing import BinaryIO, Optional
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, BinaryIO, Optional
 from app.utils import APP_LOGGER_NAME
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.db.models.upload import Upload as UploadModel
+from app.db.models.upload import Upload as UploadModel, ProcessingStatus
 from app.llm.modules.encoder._schema import CSVContext
 from app.pipeline.learning.pipeline import LearningPipeline
 
 from google.genai.types import ContentEmbedding
 from sqlalchemy import select
 from fastapi import HTTPException, status
-from app.settings.config import settings
 from app.services.duck_db import DuckDBConn
+from app.services.parquet_cache import ParquetCache
+from app.services.upload import parquet as parquet_service
+from app.cloud import R2ClientError
+from app.workers import ProcessPoolWorker
 
 logger = logging.getLogger(APP_LOGGER_NAME)
 
+COPY_CHUNK_SIZE = 1024 * 1024
+"""
+Chunk size used when spooling an incoming CSV stream to disk.
+"""
+
 async def create_upload(
     db: AsyncSession,
     upload_info: UploadModel,
@@ -58,31 +68,131 @@ async def get_upload_by_id(
     return result.scalars().first()
 
 
+async def get_upload_by_content_hash(
+    db: AsyncSession,
+    content_hash: str,
+) -> Optional[UploadModel]:
+    """
+    Retrieves the live upload whose source file has the given content hash, if any.
+    """
+    statement = select(UploadModel).where(
+        UploadModel.content_hash == content_hash,
+        UploadModel.deleted_at.is_(None),
+    )
+    result = await db.execute(statement)
+
+    return result.scalars().first()
+
+
+def _copy_and_hash(src: BinaryIO, dst: BinaryIO) -> str:
+    """
+    Copies `src` into `dst` in chunks, returns the SHA-256 hex digest of the copied bytes.
+    """
+    digest = hashlib.sha256()
+
+    while chunk := src.read(COPY_CHUNK_SIZE):
+        digest.update(chunk)
+        dst.write(chunk)
+
+    return digest.hexdigest()
+
+
+@asynccontextmanager
+async def spool_csv_stream(csv_stream: BinaryIO) -> AsyncIterator[tuple[str, str]]:
+    """
+    Copies the incoming CSV stream to a temporary file, hashing it on the way.
+
+    Yields the path of the temporary file, which a worker process can read, together with
+    the SHA-256 content hash of the CSV. The file is removed when the context exits.
+    """
+    with tempfile.NamedTemporaryFile(mode="w+b", suffix=".csv") as csv_file:
+        content_hash = await asyncio.to_thread(_copy_and_hash, csv_stream, csv_file) # type: ignore[arg-type]
+        csv_file.flush()
+
+        yield csv_file.name, content_hash
+
+
+def content_addressed_key(content_hash: str) -> str:
+    """
+    Storage key of the Parquet object converted from a source file with the given content hash.
+    """
+    return f"uploads/parquet/sha256/{content_hash[:2]}/{content_hash}.parquet"
+
+
 async def convert_csv_to_parquet_stream(
-        csv_stream: BinaryIO
-) -> io.BytesIO:
+        csv_path: str,
+        process_pool: ProcessPoolWorker,
+) -> BinaryIO:
     """
-    Reads a CSV file from a stream and converts it to a Parquet file stream.
+    Converts the spooled CSV file at `csv_path` to a Parquet file stream.
+
+    Conversion runs in the process pool, so parsing and Parquet encoding never run on the
+    event loop. The returned stream is backed by a temporary file, positioned at the start,
+    and removed once the caller closes it.
     """
+    parquet_file = tempfile.NamedTemporaryFile(mode="w+b", suffix=".parquet")
 
     try:
-        df = pd.read_csv(csv_stream, encoding='utf-8')
-        parquet_buffer = io.BytesIO()
-
-        df.to_parquet(parquet_buffer, index=False, engine='pyarrow')
-        parquet_buffer.seek(0)
-        return parquet_buffer
-    except pd.errors.EmptyDataError:
-        logger.warning("Attempted to process an empty CSV Stream.")
-        raise ValueError("CSV Stream is empty.")
-    except pd.errors.ParserError as e:
-        logger.error(f"Error parsing CSV Stream: {e}")
-        raise ValueError("Error parsing CSV Stream.")
+        await process_pool.run(
+            parquet_service.convert_csv_file_to_parquet,
+            csv_path,
+            parquet_file.name,
+        )
+
+        parquet_file.seek(0)
+        return parquet_file # type: ignore[return-value]
+    except ValueError:
+        parquet_file.close()
+        raise
+    except Exception as e:
+        parquet_file.close()
+
+        logger.error(f"Unexpected error: {e}")
+        raise ValueError("An unexpected error occurred during CSV processing.")
+
+
+async def convert_csv_to_parquet_and_upload(
+        csv_path: str,
+        process_pool: ProcessPoolWorker,
+        object_key: str,
+) -> tuple[str, int]:
+    """
+    Converts the spooled CSV file at `csv_path` to Parquet and uploads it to R2 under `object_key`.
+
+    Conversion and upload are pipelined inside the process pool, Parquet parts are uploaded
+    as soon as they are encoded instead of after the whole file is converted.
+
+    Returns the object URL and the size of the Parquet file in bytes.
+    """
+    try:
+        return await process_pool.run(
+            parquet_service.convert_csv_file_to_r2,
+            csv_path,
+            object_key,
+        )
+    except (ValueError, R2ClientError):
+        raise
     except Exception as e:
         logger.error(f"Unexpected error: {e}")
         raise ValueError("An unexpected error occurred during CSV processing.")
     
 
+async def _set_processing_status(
+    db: AsyncSession,
+    upload: UploadModel,
+    processing_status: ProcessingStatus,
+):
+    """
+    Updates and commits the processing status of an upload.
+    """
+    try:
+        upload.processing_status = processing_status
+        await db.commit()
+    except Exception as e:
+        logger.error(f"Failed to set processing status {processing_status} for upload {upload.id}: {e}")
+        await db.rollback()
+
+
 async def process_csv(
     db: AsyncSession,
     upload: UploadModel,
@@ -90,8 +200,12 @@ async def process_csv(
     """
     Processes a CSV file, using DuckDB to retrieve the headers of the CSV file.
     Generates embeddings for each header and stores them in the database.
+
+    The upload's processing status is tracked, so uploads that were already processed,
+    including deduplicated re-uploads, can be served without encoding them again.
     """
     try:
+        await _set_processing_status(db, upload, ProcessingStatus.PROCESSING)
 
         headers: list[str] = []
         num_sample_rows = 3
@@ -99,51 +213,58 @@ async def process_csv(
         upload_id = upload.id
 
         try:
-            with DuckDBConn() as duckdb_conn:
-                s3_uri = f"s3://{settings.r2_bucket_name}/{upload.storage_key}"
+            # Downloads into the local Parquet cache on first use, so run it off the event loop
+            lease = await asyncio.to_thread(ParquetCache().lease, upload.storage_key)
 
-                # DuckDB query to describe the CSV file
-                describe_query = "DESCRIBE SELECT * FROM read_parquet(?);"
+            with lease as parquet_uri:
+                async with DuckDBConn() as duckdb_conn:
 
-                conn = duckdb_conn.conn
+                    # DuckDB query to describe the CSV file
+                    describe_query = "DESCRIBE SELECT * FROM read_parquet(?);"
 
-                if conn is None:
-                    raise HTTPException(
-                        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                        detail="Failed to establish DuckDB connection.",
-                    )
+                    conn = duckdb_conn.conn
 
-                headers_result = conn.execute(describe_query, parameters=[s3_uri]).fetchall()
+                    if conn is None:
+                        raise HTTPException(
+                            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                            detail="Failed to establish DuckDB connection.",
+                        )
 
-                if not headers_result:
-                    logger.error(f"No headers found for upload {upload_id}.")
-                    raise HTTPException(
-                        status_code=status.HTTP_404_NOT_FOUND,
-                        detail="No headers found for the CSV file.",
+                    headers_result = await asyncio.to_thread(
+                        lambda: conn.execute(describe_query, parameters=[parquet_uri]).fetchall()
                     )
 
-                for row in headers_result:
-                    context = CSVContext(
-                        header_name=row[0],
-                        sample_data=[],
-                    )
-                    headers_context.append(context)
-                    headers.append(row[0])
+                    if not headers_result:
+                        logger.error(f"No headers found for upload {upload_id}.")
+                        raise HTTPException(
+                            status_code=status.HTTP_404_NOT_FOUND,
+                            detail="No headers found for the CSV file.",
+                        )
+
+                    for row in headers_result:
+                        context = CSVContext(
+                            header_name=row[0],
+                            sample_data=[],
+                        )
+                        headers_context.append(context)
+                        headers.append(row[0])
 
-                logger.info(f"Successfully extracted headers for upload {upload_id}: {headers}")
+                    logger.info(f"Successfully extracted headers for upload {upload_id}: {headers}")
 
-                if headers:
-                    sample_query = f"SELECT {', '.join(headers)} FROM read_parquet(?) LIMIT ?;"
-                    sample_result = conn.execute(sample_query, parameters=[s3_uri, num_sample_rows]).fetchall()
+                    if headers:
+                        sample_query = f"SELECT {', '.join(headers)} FROM read_parquet(?) LIMIT ?;"
+                        sample_result = await asyncio.to_thread(
+                            lambda: conn.execute(sample_query, parameters=[parquet_uri, num_sample_rows]).fetchall()
+                        )
 
-                    if sample_result:
-                        for row in sample_result:
-                            for i, sample_data in enumerate(row):
-                                context = headers_context[i]
-                                if context is not None:
-                                    context.sample_data.append(sample_data)
-                    else:
-                        logger.warning(f"No sample data found for upload {upload_id}.")
+                        if sample_result:
+                            for row in sample_result:
+                                for i, sample_data in enumerate(row):
+                                    context = headers_context[i]
+                                    if context is not None:
+                                        context.sample_data.append(sample_data)
+                        else:
+                            logger.warning(f"No sample data found for upload {upload_id}.")
 
         except duckdb.Error as e:
             logger.error(f"DuckDB Processing Error: {e}")
@@ -169,13 +290,16 @@ async def process_csv(
             }
         )
 
+        await _set_processing_status(db, upload, ProcessingStatus.PROCESSED)
 
         return []
     
     except HTTPException as http_exc:
+        await _set_processing_status(db, upload, ProcessingStatus.FAILED)
         raise http_exc
 
     except Exception as e:
+        await _set_processing_status(db, upload, ProcessingStatus.FAILED)
         logger.error(f"Error processing CSV file: {e}")
         logger.error(f"Full traceback: {traceback.format_exc()}")
         raise HTTPException(
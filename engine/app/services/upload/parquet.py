@@ -0,0 +1,193 @@
+import logging
+import os
+import re
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+from typing import BinaryIO, Callable, TypeVar
+from app.utils import APP_LOGGER_NAME
+from app.settings.config import settings
+from app.cloud.cf.r2_client import R2Client
+
+logger = logging.getLogger(APP_LOGGER_NAME)
+
+T = TypeVar("T")
+
+# NOTE: This module is imported inside the conversion worker processes,
+# keep its imports limited to what the conversion itself needs.
+
+_CONVERSION_ERROR_RE = re.compile(r"In CSV column #(\d+): .*CSV conversion error")
+
+
+class _ColumnConversionError(Exception):
+    """
+    A value of a later block did not fit the type inferred for its column from the first block.
+    """
+    def __init__(self, field: pa.Field, error: pa.ArrowInvalid):
+        super().__init__(str(error))
+        self.field = field
+        self.error = error
+
+
+def _widened_type(data_type: pa.DataType) -> pa.DataType | None:
+    """
+    The next wider type to read a column with, None when the column is already read as strings.
+    """
+    if pa.types.is_integer(data_type):
+        return pa.float64()
+
+    if pa.types.is_string(data_type) or pa.types.is_large_string(data_type):
+        return None
+
+    return pa.string()
+
+
+def _write_csv_as_parquet(
+        csv_stream: BinaryIO,
+        sink: BinaryIO,
+        column_types: dict[str, pa.DataType] | None = None,
+) -> int:
+    """
+    Streams a CSV file into a Parquet sink, one bounded batch at a time.
+
+    Each CSV block of `settings.csv_read_block_size` bytes is parsed into a record batch
+    and written out as its own Parquet row group, so peak memory stays at roughly one block
+    regardless of the size of the CSV. Column types are inferred from the first block,
+    except for the columns given in `column_types`.
+
+    Raises `_ColumnConversionError` when a later block holds a value the inferred type of its column can't hold.
+
+    Returns the number of rows written.
+    """
+    reader = pa_csv.open_csv(
+        csv_stream,
+        read_options=pa_csv.ReadOptions(block_size=settings.csv_read_block_size, encoding='utf-8'),
+        convert_options=pa_csv.ConvertOptions(column_types=column_types or {}),
+    )
+
+    rows_written = 0
+
+    with pq.ParquetWriter(sink, reader.schema) as writer:
+        while True:
+            try:
+                batch = reader.read_next_batch()
+            except StopIteration:
+                break
+            except pa.ArrowInvalid as e:
+                match = _CONVERSION_ERROR_RE.search(str(e))
+                if match is None:
+                    raise
+
+                raise _ColumnConversionError(reader.schema.field(int(match.group(1))), e) from e
+
+            if batch.num_rows == 0:
+                continue
+
+            writer.write_batch(batch)
+            rows_written += batch.num_rows
+
+    return rows_written
+
+
+def _convert_with_type_fallback(csv_path: str, write: Callable[[BinaryIO, dict[str, pa.DataType]], T]) -> T:
+    """
+    Runs `write` over the CSV file at `csv_path`, widening column types and starting over whenever
+    a value after the first block doesn't fit the type inferred for its column.
+
+    `write` gets the opened CSV stream and the column types to read with, and must start its
+    output from scratch on every call. Integer columns are widened to float64 first, then to strings.
+    """
+    column_types: dict[str, pa.DataType] = {}
+
+    while True:
+        try:
+            with open(csv_path, "rb") as csv_stream:
+                return write(csv_stream, column_types)
+        except _ColumnConversionError as e:
+            widened = _widened_type(e.field.type)
+            if widened is None:
+                raise e.error
+
+            logger.info(f"CSV column '{e.field.name}' doesn't fit {e.field.type} past the first block, converting again as {widened}.")
+            column_types[e.field.name] = widened
+
+
+def _raise_csv_error(e: pa.ArrowInvalid):
+    """
+    Maps a pyarrow parsing error to a `ValueError` with a message safe to return to the client.
+    """
+    if "Empty CSV file" in str(e):
+        logger.warning("Attempted to process an empty CSV Stream.")
+        raise ValueError("CSV Stream is empty.")
+
+    logger.error(f"Error parsing CSV Stream: {e}")
+    raise ValueError("Error parsing CSV Stream.")
+
+
+def convert_csv_file_to_parquet(
+        csv_path: str,
+        parquet_path: str,
+) -> int:
+    """
+    Converts the CSV file at `csv_path` into a Parquet file at `parquet_path`.
+
+    Runs inside a conversion worker process, so it only takes and returns picklable values.
+
+    Returns the number of rows written.
+    """
+    def write(csv_stream: BinaryIO, column_types: dict[str, pa.DataType]) -> int:
+        with open(parquet_path, "wb") as parquet_stream:
+            return _write_csv_as_parquet(csv_stream, parquet_stream, column_types)
+
+    try:
+        rows_written = _convert_with_type_fallback(csv_path, write)
+
+        logger.info(f"Converted CSV to Parquet, {rows_written} rows written.")
+
+        return rows_written
+    except pa.ArrowInvalid as e:
+        _raise_csv_error(e)
+        raise
+
+
+def convert_csv_file_to_r2(
+        csv_path: str,
+        object_key: str,
+) -> tuple[str, int]:
+    """
+    Converts the CSV file at `csv_path` into Parquet and uploads it to R2 under `object_key`.
+
+    The Parquet output is written straight into a multipart upload, so finished row groups are
+    sent to R2 while the following ones are still being encoded. Runs inside a conversion worker
+    process, which holds its own `R2Client`.
+
+    Returns the object URL and the size of the Parquet file in bytes.
+    """
+    def write(csv_stream: BinaryIO, column_types: dict[str, pa.DataType]) -> tuple[str, int, int]:
+        # Parquet output is almost always smaller than its CSV, which makes the CSV size a safe upper bound
+        writer = R2Client().open_multipart_writer(
+            object_key=object_key,
+            content_type="application/vnd.apache.parquet",
+            size_hint=os.path.getsize(csv_path),
+        )
+
+        try:
+            rows_written = _write_csv_as_parquet(csv_stream, writer, column_types) # type: ignore[arg-type]
+
+            parquet_size = writer.tell()
+            return writer.close(), parquet_size, rows_written
+        except Exception:
+            # Also aborts the upload of a conversion that is started over with wider column types
+            if not writer.closed:
+                writer.abort()
+            raise
+
+    try:
+        object_url, parquet_size, rows_written = _convert_with_type_fallback(csv_path, write)
+
+        logger.info(f"Converted CSV to Parquet and uploaded to R2, {rows_written} rows written.")
+
+        return object_url, parquet_size
+    except pa.ArrowInvalid as e:
+        _raise_csv_error(e)
+        raise
@@ -0,0 +1,212 @@
+import base64
+import binascii
+import hashlib
+import io
+import json
+import logging
+from dataclasses import dataclass
+from typing import Iterator
+import duckdb
+import pyarrow as pa
+from app.services.duck_db import DuckDBConn
+from app.services.query_cache import normalize_sql
+from app.utils import APP_LOGGER_NAME
+from app.settings.config import settings
+
+logger = logging.getLogger(APP_LOGGER_NAME)
+
+
+UPLOAD_VIEW = "upload"
+"""
+Name of the view an upload query reads the upload's rows from.
+"""
+
+
+class InvalidQueryCursorError(ValueError):
+    """Raised when a pagination cursor is malformed or was issued for a different query or version of the data."""
+
+
+class InvalidUploadQueryError(ValueError):
+    """Raised when the SQL of an upload query is not a single SELECT statement."""
+
+
+@dataclass
+class QueryCursor:
+    """
+    Position of a paginated upload query, handed to the client as an opaque token.
+    """
+
+    offset: int
+    """
+    Number of rows already returned.
+    """
+
+    sql_hash: str
+    """
+    Hash of the normalized SQL the cursor was issued for.
+    """
+
+    etag: str | None
+    """
+    ETag of the Parquet object when the cursor was issued, a changed object invalidates the cursor.
+    """
+
+    def encode(self) -> str:
+        payload = json.dumps({"o": self.offset, "q": self.sql_hash, "e": self.etag}, separators=(",", ":"))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+    @classmethod
+    def decode(cls, token: str) -> "QueryCursor":
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+            cursor = cls(offset=int(payload["o"]), sql_hash=str(payload["q"]), etag=payload["e"])
+        except (binascii.Error, ValueError, KeyError, TypeError) as e:
+            raise InvalidQueryCursorError("Malformed cursor.") from e
+
+        if cursor.offset < 0:
+            raise InvalidQueryCursorError("Malformed cursor.")
+
+        return cursor
+
+
+def sql_hash(sql_query: str) -> str:
+    """
+    Hash of the normalized SQL, ties a cursor to the query it was issued for.
+    """
+    return hashlib.sha256(normalize_sql(sql_query).encode()).hexdigest()[:16]
+
+
+def resolve_cursor(token: str | None, sql_query: str, etag: str | None) -> QueryCursor:
+    """
+    Decodes and checks the cursor of a query request, a missing token starts from the first row.
+
+    Raises:
+        InvalidQueryCursorError: If the cursor is malformed, was issued for another query,
+        the Parquet object changed since it was issued, or it is past `upload_query_max_offset` rows.
+    """
+    query_hash = sql_hash(sql_query)
+
+    if not token:
+        return QueryCursor(offset=0, sql_hash=query_hash, etag=etag)
+
+    cursor = QueryCursor.decode(token)
+
+    if cursor.offset > settings.upload_query_max_offset:
+        raise InvalidQueryCursorError(
+            f"Pages past the first {settings.upload_query_max_offset} rows can't be read, narrow the query with a WHERE clause."
+        )
+
+    if cursor.sql_hash != query_hash:
+        raise InvalidQueryCursorError("Cursor was issued for a different query.")
+
+    if cursor.etag != etag:
+        raise InvalidQueryCursorError("Upload data changed since the cursor was issued, restart the query.")
+
+    return cursor
+
+
+def _is_ordered(conn: duckdb.DuckDBPyConnection, sql_query: str) -> bool:
+    """
+    Whether the query has its own top-level ORDER BY, parsed by DuckDB itself.
+
+    Raises:
+        InvalidUploadQueryError: If the SQL does not parse as a single SELECT statement.
+    """
+    parsed = json.loads(conn.execute("SELECT json_serialize_sql(?)", (sql_query,)).fetchone()[0])
+
+    if parsed["error"]:
+        raise InvalidUploadQueryError(f"Only a single SELECT statement can be run: {parsed.get('error_message')}")
+
+    if len(parsed["statements"]) != 1:
+        raise InvalidUploadQueryError("Only a single SELECT statement can be run.")
+
+    modifiers = parsed["statements"][0]["node"].get("modifiers", [])
+
+    return any(modifier["type"] == "ORDER_MODIFIER" for modifier in modifiers)
+
+
+def _page_sql(conn: duckdb.DuckDBPyConnection, sql_query: str, limit: int, offset: int) -> str:
+    """
+    Wraps the query to return one page of its rows.
+
+    OFFSET paging needs the same row order on every request. A query with its own ORDER BY keeps it,
+    so ties in it are up to the client to break, any other query is ordered by all of its columns.
+    DuckDB still produces and sorts the `offset` rows before the page, with a top-N sort
+    over `offset + limit` rows, so a page costs more the further it is, see `upload_query_max_offset`.
+    """
+    inner_sql = sql_query.strip().rstrip(";").rstrip()
+    order_by = "" if _is_ordered(conn, inner_sql) else " ORDER BY ALL"
+
+    return f"SELECT * FROM ({inner_sql}) AS paged_query{order_by} LIMIT {limit} OFFSET {offset}"
+
+
+def _sandbox(parquet_uri: str) -> DuckDBConn:
+    """
+    A sandbox that only exposes the upload, through the `upload` view, to the client's SQL.
+    """
+    return DuckDBConn(sandbox_paths=[parquet_uri], sandbox_views={UPLOAD_VIEW: parquet_uri})
+
+
+def run_page(parquet_uri: str, sql_query: str, offset: int, page_size: int) -> tuple[pa.Table, bool]:
+    """
+    Runs the query once for the page starting at `offset`, and returns its rows along with whether more rows follow.
+
+    One row more than the page is fetched to tell whether there is a next page. The page is held
+    as Arrow columns, bounded by `upload_query_max_page_size` rows, so the sandbox is released
+    before the response starts streaming and errors in the SQL surface before it does.
+    """
+    with _sandbox(parquet_uri) as duckdb_conn:
+        conn = duckdb_conn.conn
+
+        if conn is None:
+            raise ValueError("DuckDB connection is not established.")
+
+        table = conn.execute(_page_sql(conn, sql_query, page_size + 1, offset)).fetch_arrow_table()
+
+    return table.slice(0, page_size), table.num_rows > page_size
+
+
+def iter_page_batches(page: pa.Table) -> Iterator[pa.RecordBatch]:
+    """
+    Yields the rows of a page as Arrow record batches of at most `upload_query_batch_rows` rows.
+    """
+    for batch in page.to_batches(max_chunksize=settings.upload_query_batch_rows):
+        if batch.num_rows:
+            yield batch
+
+
+def stream_ndjson(batches: Iterator[pa.RecordBatch]) -> Iterator[bytes]:
+    """
+    Encodes record batches as newline delimited JSON, one object per row and one chunk per batch.
+    """
+    for batch in batches:
+        yield "".join(json.dumps(row, default=str) + "\n" for row in batch.to_pylist()).encode()
+
+
+def stream_arrow_ipc(batches: Iterator[pa.RecordBatch], schema: pa.Schema) -> Iterator[bytes]:
+    """
+    Encodes record batches in the Arrow IPC stream format, one chunk per batch.
+
+    The schema is taken from the first batch, `schema` is written for pages without rows.
+    """
+    sink = io.BytesIO()
+    writer: pa.ipc.RecordBatchStreamWriter | None = None
+
+    def _drain() -> bytes:
+        data = sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+        return data
+
+    for batch in batches:
+        if writer is None:
+            writer = pa.ipc.new_stream(sink, batch.schema)
+
+        writer.write_batch(batch)
+        yield _drain()
+
+    if writer is None:
+        writer = pa.ipc.new_stream(sink, schema)
+
+    writer.close()
+    yield _drain()
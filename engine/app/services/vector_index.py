@@ -0,0 +1,426 @@
+import asyncio
+import datetime
+import logging
+import time
+import uuid
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass
+from typing import Optional
+import numpy as np
+from sqlalchemy import select, func, or_
+from app.db.models.vector_embedding import EMBEDDING_DIMENSIONS, EmbeddingSourceType, VectorEmbedding as EmbeddingModel
+from app.db.session import AsyncSessionLocal
+from app.services.vector_search import lexical_terms
+from app.utils import APP_LOGGER_NAME, SingletonMeta
+from app.settings.config import settings
+
+logger = logging.getLogger(APP_LOGGER_NAME)
+
+_ROW_COLUMNS = (
+    EmbeddingModel.id,
+    EmbeddingModel.source_type,
+    EmbeddingModel.related_id,
+    EmbeddingModel.column_or_chunk_name,
+    EmbeddingModel.original_text,
+    EmbeddingModel.embedding,
+)
+
+
+@dataclass
+class _Slice:
+    """
+    Live embeddings of one source identifier, held in memory.
+    """
+
+    ids: list[uuid.UUID]
+    """
+    Embedding ids, in the order of the rows of `matrix`.
+    """
+
+    rows: list[tuple]
+    """
+    Source type, related id, column or chunk name and original text of each embedding.
+    """
+
+    matrix: np.ndarray
+    """
+    Contiguous float32 matrix of L2 normalized embeddings, one row per embedding.
+    """
+
+    source_types: np.ndarray
+    """
+    Source type name of each row, for source type filters.
+    """
+
+    postings: dict[str, np.ndarray]
+    """
+    Rows containing each lexical term of the column or chunk name and the original text.
+    """
+
+    synced_at: datetime.datetime
+    """
+    Database time of the last load or refresh, changes after it are picked up by the next refresh.
+    """
+
+    loaded_at: float
+    """
+    Monotonic time of the last full load.
+    """
+
+    refreshed_at: float
+    """
+    Monotonic time of the last load or refresh.
+    """
+
+
+def _as_matrix(vectors) -> np.ndarray:
+    return np.asarray(vectors, dtype=np.float32).reshape(len(vectors), EMBEDDING_DIMENSIONS)
+
+
+def _build_slice(ids: list[uuid.UUID], rows: list[tuple], matrix: np.ndarray, synced_at: datetime.datetime, loaded_at: float) -> _Slice:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix = matrix / np.where(norms == 0, 1, norms)
+
+    postings: dict[str, list[int]] = defaultdict(list)
+    for position, (_, _, name, original_text) in enumerate(rows):
+        for term in lexical_terms(f"{name or ''} {original_text or ''}"):
+            postings[term].append(position)
+
+    return _Slice(
+        ids=ids,
+        rows=rows,
+        matrix=np.ascontiguousarray(matrix),
+        source_types=np.array([source_type.name for source_type, *_ in rows], dtype=object),
+        postings={term: np.array(positions, dtype=np.int64) for term, positions in postings.items()},
+        synced_at=synced_at,
+        loaded_at=loaded_at,
+        refreshed_at=time.monotonic(),
+    )
+
+
+def _top(scores: np.ndarray, count: int) -> np.ndarray:
+    """
+    Positions of the `count` highest finite scores, best first.
+    """
+    count = min(count, int(np.isfinite(scores).sum()))
+    if count <= 0:
+        return np.empty(0, dtype=np.int64)
+
+    top = np.argpartition(-scores, count - 1)[:count]
+    return top[np.argsort(-scores[top], kind="stable")]
+
+
+class InMemoryVectorIndex(metaclass=SingletonMeta):
+    """
+    InMemoryVectorIndex answers similarity searches scoped to one `source_identifier` from
+    process memory, so repeated searches of the matrix loop skip the round trip to Postgres.
+
+    The live embeddings of a source identifier are loaded into a contiguous float32 matrix and
+    searched with one matrix-vector product. A source identifier that is not loaded yet is a miss,
+    the caller falls back to pgvector while the slice loads in the background. Slices above
+    `vector_index_max_slice_rows` are never loaded, the index holds at most `vector_index_max_rows`
+    embeddings and evicts the least recently used slices.
+
+    Loaded slices are refreshed in the background every `vector_index_refresh_seconds` with the
+    rows created or soft deleted since the last sync. The window reaches back
+    `vector_index_refresh_overlap_seconds`, `created_at` is the start of the writing transaction
+    and a long transaction can commit rows older than the last sync. Slices are reloaded in full
+    every `vector_index_full_reload_seconds` to drop rows deleted without `deleted_at`.
+
+    Searches must be called from the event loop, loads and refreshes run as tasks on it.
+    """
+    def __init__(self):
+        if hasattr(self, '_initialized') and self._initialized:
+            return
+
+        self._enabled = settings.vector_index_enabled
+        self._max_rows = settings.vector_index_max_rows
+        self._max_slice_rows = settings.vector_index_max_slice_rows
+
+        self._slices: OrderedDict[str, _Slice] = OrderedDict()
+        self._total_rows = 0
+        self._oversized: dict[str, float] = {}
+        self._tasks: dict[str, asyncio.Task] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._initialized = True
+
+    @property
+    def enabled(self) -> bool:
+        return self._enabled
+
+    def search(
+            self,
+            source_identifier: str,
+            query_embedding: list[float],
+            k: int,
+            source_type: Optional[EmbeddingSourceType] = None,
+            query_text: Optional[str] = None,
+    ) -> Optional[list[EmbeddingModel]]:
+        """
+        Returns the `k` live embeddings of `source_identifier` nearest to `query_embedding`,
+        or None when the source identifier is not loaded.
+
+        With `query_text`, the vector ranking is fused with a ranking by the number of query
+        words in the column or chunk name and original text, as in `hybrid_search_stmt`.
+        """
+        result = self.search_batch(source_identifier, [query_embedding], k, source_type, [query_text] if query_text else None)
+        return result[0] if result is not None else None
+
+    def search_batch(
+            self,
+            source_identifier: str,
+            query_embeddings: list[list[float]],
+            k: int,
+            source_type: Optional[EmbeddingSourceType] = None,
+            query_texts: Optional[list[str]] = None,
+    ) -> Optional[list[list[EmbeddingModel]]]:
+        """
+        `search` for several queries against the same source identifier.
+        """
+        if not self._enabled:
+            return None
+
+        slice_ = self._get(source_identifier)
+        if slice_ is None:
+            return None
+
+        queries = np.asarray(query_embeddings, dtype=np.float32).reshape(len(query_embeddings), EMBEDDING_DIMENSIONS)
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        scores = (slice_.matrix @ (queries / np.where(norms == 0, 1, norms)).T).T
+
+        if source_type is not None:
+            scores[:, slice_.source_types != source_type.name] = -np.inf
+
+        results = []
+
+        for i, query_scores in enumerate(scores):
+            query_text = query_texts[i] if query_texts else None
+
+            if query_text:
+                positions = self._fuse(slice_, query_scores, query_text, k)
+            else:
+                positions = _top(query_scores, k)
+
+            results.append([self._to_model(source_identifier, slice_, position) for position in positions])
+
+        return results
+
+    def mark_stale(self, source_identifiers):
+        """
+        Refreshes the slices of `source_identifiers` on their next search, e.g. after embeddings were written.
+        """
+        for source_identifier in source_identifiers:
+            slice_ = self._slices.get(source_identifier)
+            if slice_ is not None:
+                # Monotonic time starts at an arbitrary point, only -inf is always older than the refresh interval
+                slice_.refreshed_at = float("-inf")
+
+    def invalidate(self, source_identifier: str):
+        """
+        Drops the slice of a source identifier, the next search loads it again.
+        """
+        slice_ = self._slices.pop(source_identifier, None)
+        if slice_ is not None:
+            self._total_rows -= len(slice_.ids)
+
+    def stats(self) -> dict:
+        """
+        Hit and miss counters along with the current size of the index.
+        """
+        lookups = self.hits + self.misses
+
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "slices": len(self._slices),
+            "rows": self._total_rows,
+            "max_rows": self._max_rows,
+        }
+
+    def _get(self, source_identifier: str) -> Optional[_Slice]:
+        slice_ = self._slices.get(source_identifier)
+
+        if slice_ is None:
+            self.misses += 1
+
+            oversized_at = self._oversized.get(source_identifier)
+            if oversized_at is None or time.monotonic() - oversized_at > settings.vector_index_full_reload_seconds:
+                self._oversized.pop(source_identifier, None)
+                self._schedule(source_identifier, self._load(source_identifier))
+
+            return None
+
+        self.hits += 1
+        self._slices.move_to_end(source_identifier)
+
+        # Served as is while it refreshes, a search never waits on Postgres
+        now = time.monotonic()
+        if now - slice_.loaded_at > settings.vector_index_full_reload_seconds:
+            self._schedule(source_identifier, self._load(source_identifier))
+        elif now - slice_.refreshed_at > settings.vector_index_refresh_seconds:
+            self._schedule(source_identifier, self._refresh(source_identifier, slice_))
+
+        return slice_
+
+    def _schedule(self, source_identifier: str, coroutine):
+        task = self._tasks.get(source_identifier)
+        if task is not None and not task.done():
+            coroutine.close()
+            return
+
+        task = asyncio.get_running_loop().create_task(coroutine)
+        task.add_done_callback(lambda done: self._forget_task(source_identifier, done))
+        self._tasks[source_identifier] = task
+
+    def _forget_task(self, source_identifier: str, task: asyncio.Task):
+        # A newer task may have been scheduled for the source identifier since
+        if self._tasks.get(source_identifier) is task:
+            del self._tasks[source_identifier]
+
+    def _mark_oversized(self, source_identifier: str):
+        """
+        Keeps a source identifier too large for a slice out of the index until its next full reload.
+        """
+        self.invalidate(source_identifier)
+
+        now = time.monotonic()
+        self._oversized = {
+            oversized: oversized_at
+            for oversized, oversized_at in self._oversized.items()
+            if now - oversized_at <= settings.vector_index_full_reload_seconds
+        }
+        self._oversized[source_identifier] = now
+
+    async def _load(self, source_identifier: str):
+        started = time.perf_counter()
+
+        try:
+            async with AsyncSessionLocal() as db:
+                synced_at = (await db.execute(select(func.now()))).scalar_one()
+                result = await db.execute(
+                    select(*_ROW_COLUMNS)
+                    .where(EmbeddingModel.source_identifier == source_identifier, EmbeddingModel.deleted_at.is_(None))
+                    .limit(self._max_slice_rows + 1)
+                )
+                records = result.all()
+        except Exception as e:
+            logger.error(f"Failed to load embeddings of {source_identifier} into the in-process vector index: {e}")
+            return
+
+        if len(records) > self._max_slice_rows:
+            self._mark_oversized(source_identifier)
+            logger.info(f"Embeddings of {source_identifier} exceed {self._max_slice_rows} rows, searched in Postgres only")
+            return
+
+        slice_ = _build_slice(
+            ids=[record[0] for record in records],
+            rows=[tuple(record[1:5]) for record in records],
+            matrix=_as_matrix([record[5] for record in records]),
+            synced_at=synced_at,
+            loaded_at=time.monotonic(),
+        )
+
+        self._store(source_identifier, slice_)
+        logger.info(f"Loaded {len(records)} embeddings of {source_identifier} into the in-process vector index in {time.perf_counter() - started:.2f}s")
+
+    async def _refresh(self, source_identifier: str, slice_: _Slice):
+        since = slice_.synced_at - datetime.timedelta(seconds=settings.vector_index_refresh_overlap_seconds)
+
+        try:
+            async with AsyncSessionLocal() as db:
+                synced_at = (await db.execute(select(func.now()))).scalar_one()
+                result = await db.execute(
+                    select(*_ROW_COLUMNS, EmbeddingModel.deleted_at)
+                    .where(
+                        EmbeddingModel.source_identifier == source_identifier,
+                        or_(EmbeddingModel.created_at > since, EmbeddingModel.deleted_at > since),
+                    )
+                )
+                records = result.all()
+        except Exception as e:
+            logger.error(f"Failed to refresh embeddings of {source_identifier} in the in-process vector index: {e}")
+            return
+
+        if not records:
+            slice_.synced_at = synced_at
+            slice_.refreshed_at = time.monotonic()
+            return
+
+        # Changed rows are removed and the live ones appended again, so rows seen twice in the overlap are not duplicated
+        changed = {record[0] for record in records}
+        keep = [position for position, id_ in enumerate(slice_.ids) if id_ not in changed]
+        live = [record for record in records if record[6] is None]
+
+        if len(keep) + len(live) > self._max_slice_rows:
+            self._mark_oversized(source_identifier)
+            return
+
+        refreshed = _build_slice(
+            ids=[slice_.ids[position] for position in keep] + [record[0] for record in live],
+            rows=[slice_.rows[position] for position in keep] + [tuple(record[1:5]) for record in live],
+            matrix=np.concatenate([slice_.matrix[keep], _as_matrix([record[5] for record in live])]),
+            synced_at=synced_at,
+            loaded_at=slice_.loaded_at,
+        )
+
+        self._store(source_identifier, refreshed)
+        logger.debug(f"Refreshed {len(records)} changed embeddings of {source_identifier} in the in-process vector index")
+
+    def _store(self, source_identifier: str, slice_: _Slice):
+        self.invalidate(source_identifier)
+
+        self._slices[source_identifier] = slice_
+        self._total_rows += len(slice_.ids)
+
+        while self._total_rows > self._max_rows and len(self._slices) > 1:
+            evicted_identifier, evicted = self._slices.popitem(last=False)
+            self._total_rows -= len(evicted.ids)
+            self.evictions += 1
+
+            # A refresh still running would store the evicted slice again
+            task = self._tasks.pop(evicted_identifier, None)
+            if task is not None:
+                task.cancel()
+
+    @staticmethod
+    def _fuse(slice_: _Slice, scores: np.ndarray, query_text: str, k: int) -> np.ndarray:
+        """
+        Reciprocal rank fusion of the vector ranking and the lexical ranking, as in `hybrid_search_stmt`.
+        """
+        candidates = max(settings.vector_search_hybrid_candidates, k)
+
+        matches = np.zeros(len(slice_.ids), dtype=np.float32)
+        for term in lexical_terms(query_text)[:settings.vector_search_hybrid_max_terms]:
+            positions = slice_.postings.get(term)
+            if positions is not None:
+                matches[positions] += 1
+
+        # Rows excluded by filters carry -inf vector scores
+        matches[~np.isfinite(scores)] = 0
+        lexical = _top(np.where(matches > 0, matches, -np.inf), candidates)
+
+        fused: dict[int, float] = defaultdict(float)
+        for ranking in (_top(scores, candidates), lexical):
+            for rank, position in enumerate(ranking, start=1):
+                fused[int(position)] += 1.0 / (settings.vector_search_rrf_k + rank)
+
+        return np.array(sorted(fused, key=fused.get, reverse=True)[:k], dtype=np.int64)
+
+    @staticmethod
+    def _to_model(source_identifier: str, slice_: _Slice, position: int) -> EmbeddingModel:
+        source_type, related_id, column_or_chunk_name, original_text = slice_.rows[position]
+
+        return EmbeddingModel(
+            id=slice_.ids[position],
+            source_type=source_type,
+            source_identifier=source_identifier,
+            related_id=related_id,
+            column_or_chunk_name=column_or_chunk_name,
+            original_text=original_text,
+        )
@@ -0,0 +1,422 @@
+import logging
+import re
+import time
+from typing import Optional, Sequence
+from sqlalchemy import Select, select, bindparam, text, func, or_, union_all, literal, cast, true
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.elements import ColumnElement
+from pgvector.sqlalchemy import Vector
+from app.db.models.vector_embedding import (
+    EMBEDDING_DIMENSIONS,
+    EmbeddingSourceType,
+    VectorEmbedding as EmbeddingModel,
+    halfvec_embedding,
+    binary_quantized_embedding,
+    searchable_text,
+)
+from app.utils import APP_LOGGER_NAME
+from app.settings.config import settings
+
+logger = logging.getLogger(APP_LOGGER_NAME)
+
+VECTOR_SEARCH_MODES = ("full", "halfvec", "binary")
+"""
+- full: cosine distance over the float32 vectors, `idx_vector_embeddings_embedding`.
+- halfvec: cosine distance over half precision vectors, `ix_vector_embeddings_embedding_halfvec`.
+- binary: hamming distance over binary quantized vectors, `ix_vector_embeddings_embedding_bq`,
+  with the candidates reranked by full precision cosine distance.
+"""
+
+ITERATIVE_SCAN_MODES = ("off", "strict_order", "relaxed_order")
+"""
+Values of pgvector's `hnsw.iterative_scan`. With an iterative scan the HNSW index keeps
+returning candidates until `k` rows pass the filters, instead of stopping after `ef_search`.
+`relaxed_order` may return the candidates slightly out of order, they are reordered by
+exact distance afterwards.
+"""
+
+
+HNSW_MAX_EF_SEARCH = 1000
+"""
+Largest `hnsw.ef_search` pgvector accepts.
+"""
+
+
+_TERM_RE = re.compile(r"\w+")
+
+
+def _binary_shortlist_size(k: int) -> int:
+    # The index yields at most ef_search candidates without an iterative scan, so a longer shortlist would not fill up
+    return max(k, min(k * settings.vector_search_rerank_factor, HNSW_MAX_EF_SEARCH))
+
+
+def _scan_ef_search(k: int, mode: str, ef_search: Optional[int]) -> int:
+    """
+    `ef_search`, or the setting, raised to the number of rows read from the index and capped at what pgvector accepts.
+    """
+    index_limit = _binary_shortlist_size(k) if mode == "binary" else k
+    return min(max(ef_search or settings.vector_search_ef_search, index_limit), HNSW_MAX_EF_SEARCH)
+
+
+def _reorder_by_distance(candidates: Select, query_vector, k: int) -> Select:
+    """
+    Wraps a query of candidate ids and orders them by full precision cosine distance.
+    """
+    return (
+        select(EmbeddingModel)
+        # Left uncorrelated from the outer vector_embeddings, only correlates with the queries of a batch
+        .where(EmbeddingModel.id.in_(candidates.correlate_except(EmbeddingModel)))
+        .order_by(EmbeddingModel.embedding.cosine_distance(query_vector))
+        .limit(k)
+    )
+
+
+def _source_type_condition(source_type: EmbeddingSourceType) -> ColumnElement[bool]:
+    # Rendered inline, the generic plan of a prepared statement can't match a partial index predicate against a parameter
+    return EmbeddingModel.source_type == bindparam("source_type", source_type, type_=EmbeddingModel.source_type.type, literal_execute=True)
+
+
+def _nearest_stmt(query_vector, k: int, mode: str, conditions: Sequence[ColumnElement[bool]], relaxed_order: bool) -> Select:
+    if mode not in VECTOR_SEARCH_MODES:
+        raise ValueError(f"Unknown vector search mode '{mode}', expected one of {list(VECTOR_SEARCH_MODES)}.")
+
+    if mode == "binary":
+        # Hamming distance over one bit per dimension only shortlists, the float32 vectors decide the order
+        candidates = (
+            select(EmbeddingModel.id)
+            .where(*conditions)
+            .order_by(binary_quantized_embedding(EmbeddingModel.embedding).op("<~>")(binary_quantized_embedding(query_vector)))
+            .limit(_binary_shortlist_size(k))
+        )
+        return _reorder_by_distance(candidates, query_vector, k)
+
+    if mode == "halfvec":
+        distance = halfvec_embedding(EmbeddingModel.embedding).op("<=>")(halfvec_embedding(query_vector))
+    else:
+        distance = EmbeddingModel.embedding.cosine_distance(query_vector)
+
+    if relaxed_order:
+        return _reorder_by_distance(select(EmbeddingModel.id).where(*conditions).order_by(distance).limit(k), query_vector, k)
+
+    return (
+        select(EmbeddingModel)
+        .where(*conditions)
+        .order_by(distance)
+        .limit(k)
+    )
+
+
+def nearest_embeddings_stmt(
+        query_embedding: list[float],
+        k: int,
+        mode: str = "full",
+        filters: Sequence[ColumnElement[bool]] = (),
+        source_type: Optional[EmbeddingSourceType] = None,
+        relaxed_order: bool = False,
+) -> Select:
+    """
+    Builds the query for the `k` live embeddings nearest to `query_embedding` using the index of `mode`.
+
+    Each ordering expression matches its index expression, so Postgres can answer it from the HNSW index.
+    With `source_type` in `PARTIAL_INDEX_SOURCE_TYPES` the full precision search uses the partial index of that type.
+    Set `relaxed_order` when the index is scanned with `hnsw.iterative_scan = relaxed_order`.
+    """
+    query_vector = bindparam("query_embedding", query_embedding, type_=Vector(EMBEDDING_DIMENSIONS))
+    conditions = [EmbeddingModel.deleted_at.is_(None), *filters]
+
+    if source_type is not None:
+        conditions.append(_source_type_condition(source_type))
+
+    return _nearest_stmt(query_vector, k, mode, conditions, relaxed_order)
+
+
+def batch_nearest_embeddings_stmt(
+        query_embeddings: list[list[float]],
+        k: int,
+        mode: str = "full",
+        filters: Sequence[ColumnElement[bool]] = (),
+        source_type: Optional[EmbeddingSourceType] = None,
+        relaxed_order: bool = False,
+) -> Select:
+    """
+    Builds one query for the `k` live embeddings nearest to each of `query_embeddings`.
+
+    The query vectors become a derived table and every one of them runs the search of
+    `nearest_embeddings_stmt` through a LATERAL join. Rows are `(query_index, VectorEmbedding)`,
+    ordered by query and then by distance.
+    """
+    queries = union_all(*[
+        select(
+            literal(i).label("query_index"),
+            cast(bindparam(f"query_embedding_{i}", embedding, type_=Vector(EMBEDDING_DIMENSIONS)), Vector(EMBEDDING_DIMENSIONS)).label("embedding"),
+        )
+        for i, embedding in enumerate(query_embeddings)
+    ]).subquery("queries")
+
+    conditions = [EmbeddingModel.deleted_at.is_(None), *filters]
+
+    if source_type is not None:
+        conditions.append(_source_type_condition(source_type))
+
+    nearest = (
+        _nearest_stmt(queries.c.embedding, k, mode, conditions, relaxed_order)
+        .with_only_columns(EmbeddingModel.id)
+        .correlate(queries)
+        .lateral("nearest")
+    )
+
+    return (
+        select(queries.c.query_index, EmbeddingModel)
+        .select_from(queries)
+        .join(nearest, true())
+        .join(EmbeddingModel, EmbeddingModel.id == nearest.c.id)
+        .order_by(queries.c.query_index, EmbeddingModel.embedding.cosine_distance(queries.c.embedding))
+    )
+
+
+async def configure_hnsw_scan(db: AsyncSession, ef_search: int, iterative_scan: str = "off"):
+    """
+    Sets the HNSW scan parameters for the rest of the session's transaction.
+    """
+    if iterative_scan not in ITERATIVE_SCAN_MODES:
+        raise ValueError(f"Unknown iterative scan mode '{iterative_scan}', expected one of {list(ITERATIVE_SCAN_MODES)}.")
+
+    # set_config is SET LOCAL with bind parameters
+    await db.execute(text("SELECT set_config('hnsw.ef_search', :ef_search, true)"), {"ef_search": str(ef_search)})
+
+    if iterative_scan != "off":
+        await db.execute(
+            text("SELECT set_config('hnsw.iterative_scan', :iterative_scan, true), set_config('hnsw.max_scan_tuples', :max_scan_tuples, true)"),
+            {"iterative_scan": iterative_scan, "max_scan_tuples": str(settings.vector_search_max_scan_tuples)},
+        )
+
+
+async def search_embeddings(
+        db: AsyncSession,
+        query_embedding: list[float],
+        k: int,
+        filters: Sequence[ColumnElement[bool]] = (),
+        mode: Optional[str] = None,
+        source_type: Optional[EmbeddingSourceType] = None,
+        ef_search: Optional[int] = None,
+        iterative_scan: Optional[str] = None,
+) -> list[EmbeddingModel]:
+    """
+    Returns the `k` live embeddings nearest to `query_embedding`, searched with `mode`
+    or the `VECTOR_SEARCH_MODE` setting.
+
+    `ef_search` and `iterative_scan` default to the `VECTOR_SEARCH_EF_SEARCH` and
+    `VECTOR_SEARCH_ITERATIVE_SCAN` settings, `ef_search` is raised to the number of rows
+    read from the index when it is lower, up to pgvector's limit of 1000. The iterative scan is only used for filtered
+    searches, unfiltered ones always find `k` rows within `ef_search` candidates.
+
+    With `VECTOR_SEARCH_DUAL_READ` on, searches in another mode also run the full precision
+    query and log the overlap of both results and their latencies, the results of `mode` are returned.
+    """
+    mode = mode or settings.vector_search_mode
+    ef_search = _scan_ef_search(k, mode, ef_search)
+    iterative_scan = (iterative_scan or settings.vector_search_iterative_scan) if filters or source_type is not None else "off"
+
+    await configure_hnsw_scan(db, ef_search, iterative_scan)
+    relaxed_order = iterative_scan == "relaxed_order"
+
+    started = time.perf_counter()
+    result = await db.execute(nearest_embeddings_stmt(query_embedding, k, mode, filters, source_type, relaxed_order))
+    embeddings = list(result.scalars().all())
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    if len(embeddings) < k:
+        logger.debug(f"Vector search returned {len(embeddings)} of {k} rows, ef_search {ef_search}, iterative scan {iterative_scan}")
+
+    if settings.vector_search_dual_read and mode != "full":
+        started = time.perf_counter()
+        full_result = await db.execute(nearest_embeddings_stmt(query_embedding, k, "full", filters, source_type, relaxed_order))
+        full_ids = {embedding.id for embedding in full_result.scalars().all()}
+        full_elapsed_ms = (time.perf_counter() - started) * 1000
+
+        overlap = len(full_ids.intersection(embedding.id for embedding in embeddings)) / len(full_ids) if full_ids else 1.0
+        logger.info(
+            f"Vector search dual read: {mode} recall@{k} {overlap:.2f} against full precision, "
+            f"{elapsed_ms:.1f}ms vs {full_elapsed_ms:.1f}ms"
+        )
+
+    return embeddings
+
+
+async def search_embeddings_batch(
+        db: AsyncSession,
+        query_embeddings: list[list[float]],
+        k: int,
+        filters: Sequence[ColumnElement[bool]] = (),
+        mode: Optional[str] = None,
+        source_type: Optional[EmbeddingSourceType] = None,
+        ef_search: Optional[int] = None,
+        iterative_scan: Optional[str] = None,
+) -> list[list[EmbeddingModel]]:
+    """
+    Returns the `k` live embeddings nearest to each of `query_embeddings` in one round trip,
+    one list per query in the order of `query_embeddings`. Parameters as in `search_embeddings`.
+    """
+    if not query_embeddings:
+        return []
+
+    mode = mode or settings.vector_search_mode
+    ef_search = _scan_ef_search(k, mode, ef_search)
+    iterative_scan = (iterative_scan or settings.vector_search_iterative_scan) if filters or source_type is not None else "off"
+
+    await configure_hnsw_scan(db, ef_search, iterative_scan)
+
+    started = time.perf_counter()
+    result = await db.execute(batch_nearest_embeddings_stmt(query_embeddings, k, mode, filters, source_type, iterative_scan == "relaxed_order"))
+
+    embeddings: list[list[EmbeddingModel]] = [[] for _ in query_embeddings]
+    for query_index, embedding in result.all():
+        embeddings[query_index].append(embedding)
+
+    logger.debug(f"Batched vector search of {len(query_embeddings)} queries took {(time.perf_counter() - started) * 1000:.1f}ms")
+
+    return embeddings
+
+
+def lexical_terms(text: str) -> list[str]:
+    """
+    Distinct lowercased words of a text, in order, e.g. `signup_dt` stays one term.
+    """
+    return list(dict.fromkeys(term for term in _TERM_RE.findall(text.lower()) if len(term) > 1))
+
+
+def hybrid_search_stmt(
+        query_text: str,
+        query_embedding: list[float],
+        k: int,
+        mode: str = "full",
+        filters: Sequence[ColumnElement[bool]] = (),
+        source_type: Optional[EmbeddingSourceType] = None,
+        relaxed_order: bool = False,
+) -> Select:
+    """
+    Builds one query fusing three rankings of the live embeddings with reciprocal rank fusion:
+
+    - vector: distance to `query_embedding` through the HNSW index of `mode`.
+    - full text: any word of `query_text` in the column or chunk name or the original text, `ix_vector_embeddings_search_text`.
+    - trigram: column or chunk names similar to a word of `query_text`, `ix_vector_embeddings_column_or_chunk_name_trgm`.
+
+    Each ranking contributes `1 / (VECTOR_SEARCH_RRF_K + rank)` for its top `VECTOR_SEARCH_HYBRID_CANDIDATES`
+    rows, so an exact name match ranks high even when its embedding is not among the nearest.
+    """
+    candidates = max(settings.vector_search_hybrid_candidates, k)
+    conditions = [EmbeddingModel.deleted_at.is_(None), *filters]
+
+    if source_type is not None:
+        conditions.append(_source_type_condition(source_type))
+
+    nearest = nearest_embeddings_stmt(query_embedding, candidates, mode, filters, source_type, relaxed_order).with_only_columns(EmbeddingModel.id).subquery("nearest")
+    query_vector = bindparam("query_embedding", query_embedding, type_=Vector(EMBEDDING_DIMENSIONS))
+
+    rankings = [
+        select(
+            EmbeddingModel.id,
+            func.row_number().over(order_by=EmbeddingModel.embedding.cosine_distance(query_vector)).label("rank"),
+        )
+        .where(EmbeddingModel.id.in_(select(nearest.c.id)))
+        .cte("vector_ranking")
+    ]
+
+    terms = lexical_terms(query_text)[:settings.vector_search_hybrid_max_terms]
+
+    if terms:
+        # Words are OR-ed, a question rarely contains every word of a column description
+        ts_query = func.to_tsquery(text("'simple'"), bindparam("ts_query", " | ".join(terms)))
+        ts_rank = func.ts_rank_cd(searchable_text(), ts_query)
+
+        rankings.append(
+            select(EmbeddingModel.id, func.row_number().over(order_by=ts_rank.desc()).label("rank"))
+            .where(*conditions, searchable_text().op("@@")(ts_query))
+            .order_by(ts_rank.desc())
+            .limit(candidates)
+            .cte("text_ranking")
+        )
+
+        name = EmbeddingModel.column_or_chunk_name
+        similarity = func.greatest(*[func.similarity(name, bindparam(f"term_{i}", term)) for i, term in enumerate(terms)])
+
+        rankings.append(
+            select(EmbeddingModel.id, func.row_number().over(order_by=similarity.desc()).label("rank"))
+            .where(*conditions, or_(*[name.op("%")(bindparam(f"term_{i}", term)) for i, term in enumerate(terms)]))
+            .order_by(similarity.desc())
+            .limit(candidates)
+            .cte("trigram_ranking")
+        )
+
+    ranked = union_all(*[select(ranking.c.id, ranking.c.rank) for ranking in rankings]).subquery("ranked")
+    score = func.sum(1.0 / (settings.vector_search_rrf_k + ranked.c.rank)).label("score")
+    fused = select(ranked.c.id, score).group_by(ranked.c.id).order_by(score.desc()).limit(k).subquery("fused")
+
+    return (
+        select(EmbeddingModel)
+        .join(fused, fused.c.id == EmbeddingModel.id)
+        .order_by(fused.c.score.desc())
+    )
+
+
+async def hybrid_search_embeddings(
+        db: AsyncSession,
+        query_text: str,
+        query_embedding: list[float],
+        k: int,
+        filters: Sequence[ColumnElement[bool]] = (),
+        mode: Optional[str] = None,
+        source_type: Optional[EmbeddingSourceType] = None,
+        ef_search: Optional[int] = None,
+        iterative_scan: Optional[str] = None,
+) -> list[EmbeddingModel]:
+    """
+    Returns the `k` live embeddings ranked best by `hybrid_search_stmt`, HNSW scan parameters as in `search_embeddings`.
+    """
+    mode = mode or settings.vector_search_mode
+    candidates = max(settings.vector_search_hybrid_candidates, k)
+    ef_search = _scan_ef_search(candidates, mode, ef_search)
+    iterative_scan = (iterative_scan or settings.vector_search_iterative_scan) if filters or source_type is not None else "off"
+
+    await configure_hnsw_scan(db, ef_search, iterative_scan)
+
+    result = await db.execute(hybrid_search_stmt(query_text, query_embedding, k, mode, filters, source_type, iterative_scan == "relaxed_order"))
+    return list(result.scalars().all())
+
+
+async def hybrid_search_embeddings_batch(
+        db: AsyncSession,
+        query_texts: list[str],
+        query_embeddings: list[list[float]],
+        k: int,
+        filters: Sequence[ColumnElement[bool]] = (),
+        mode: Optional[str] = None,
+        source_type: Optional[EmbeddingSourceType] = None,
+        ef_search: Optional[int] = None,
+        iterative_scan: Optional[str] = None,
+) -> list[list[EmbeddingModel]]:
+    """
+    `hybrid_search_embeddings` for several queries, one list per query in the order of `query_texts`.
+
+    The HNSW scan parameters are set once and every query runs in the same transaction.
+    """
+    if not query_embeddings:
+        return []
+
+    mode = mode or settings.vector_search_mode
+    candidates = max(settings.vector_search_hybrid_candidates, k)
+    ef_search = _scan_ef_search(candidates, mode, ef_search)
+    iterative_scan = (iterative_scan or settings.vector_search_iterative_scan) if filters or source_type is not None else "off"
+
+    await configure_hnsw_scan(db, ef_search, iterative_scan)
+
+    started = time.perf_counter()
+    embeddings = []
+
+    for query_text, query_embedding in zip(query_texts, query_embeddings):
+        result = await db.execute(hybrid_search_stmt(query_text, query_embedding, k, mode, filters, source_type, iterative_scan == "relaxed_order"))
+        embeddings.append(list(result.scalars().all()))
+
+    logger.debug(f"Batched hybrid search of {len(query_embeddings)} queries took {(time.perf_counter() - started) * 1000:.1f}ms")
+
+    return embeddings
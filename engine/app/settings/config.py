@@ -15,6 +15,12 @@ class Settings(BaseSettings):
     neo4j_encrypted: bool = Field(default=False, alias="NEO4J_ENCRYPTED")
     neo4j_max_connection_lifetime: int = Field(default=3600, alias="NEO4J_MAX_CONNECTION_LIFETIME", ge=1) # Max lifetime of a connection in seconds
     neo4j_max_connection_pool_size: int = Field(default=50, alias="NEO4J_MAX_CONNECTION_POOL_SIZE", ge=1) # Max number of connections in the pool
+    neo4j_max_transaction_retry_time: float = Field(default=30.0, alias="NEO4J_MAX_TRANSACTION_RETRY_TIME", ge=0) # Seconds a managed transaction is retried on transient errors
+    neo4j_write_batch_size: int = Field(default=1000, alias="NEO4J_WRITE_BATCH_SIZE", ge=1) # Metrics nodes written per transaction
+    neo4j_write_concurrency: int = Field(default=4, alias="NEO4J_WRITE_CONCURRENCY", ge=1) # Write transactions in flight at once during bulk writes
+    neo4j_vector_search_overfetch: int = Field(default=4, alias="NEO4J_VECTOR_SEARCH_OVERFETCH", ge=1) # Candidates taken from the vector index per result when a kNN query is filtered
+    neo4j_persistent: bool = Field(default=True, alias="NEO4J_PERSISTENT") # Keep the graph across restarts, when off it is cleared on every start
+    neo4j_reset_batch_size: int = Field(default=10_000, alias="NEO4J_RESET_BATCH_SIZE", ge=1) # Nodes deleted per transaction when the graph is reset
 
     # --- Run Time ---
     environment: str = Field(default="development", alias="ENVIRONMENT")
@@ -24,9 +30,44 @@ class Settings(BaseSettings):
     workers: int = Field(default=1, alias="WORKERS", ge=1)
     thread_pool_worker_count: int = Field(default=10, alias="THREAD_POOL_WORKER_COUNT", ge=1) # Number of threads in the pool
     multi_process_worker_count: int = Field(default=4, alias="MULTI_PROCESS_WORKER_COUNT", ge=1) # Number of processes in the pool
+    multi_process_max_pending: int = Field(default=4, alias="MULTI_PROCESS_MAX_PENDING", ge=1) # Tasks handed to the process pool at once, the rest wait in line
 
     # --- API Credentials ---
     gemini_api_key: str = Field(alias="GEMINI_API_KEY")
+    admin_api_token: str | None = Field(default=None, alias="ADMIN_API_TOKEN") # Token for the /admin routes, sent as X-Admin-Token, the routes are disabled without it
+
+    # --- Embeddings ---
+    embedding_backend: str = Field(default="gemini", alias="EMBEDDING_BACKEND") # 'gemini', or 'hashing' for offline runs without network access
+    embedding_batch_size: int = Field(default=100, alias="EMBEDDING_BATCH_SIZE", ge=1, le=100) # Texts per embedding request, the API accepts at most 100
+    embedding_batch_max_chars: int = Field(default=200_000, alias="EMBEDDING_BATCH_MAX_CHARS", ge=1) # Approximate characters per embedding request
+    embedding_max_concurrency: int = Field(default=4, alias="EMBEDDING_MAX_CONCURRENCY", ge=1) # Embedding requests in flight at once
+    embedding_max_retries: int = Field(default=3, alias="EMBEDDING_MAX_RETRIES", ge=0) # Retries of a failed batch on rate limits and server errors
+    embedding_retry_backoff_seconds: float = Field(default=1.0, alias="EMBEDDING_RETRY_BACKOFF_SECONDS", ge=0) # First retry delay, doubled on every retry
+    embedding_cache_enabled: bool = Field(default=True, alias="EMBEDDING_CACHE_ENABLED")
+    embedding_cache_persistent: bool = Field(default=True, alias="EMBEDDING_CACHE_PERSISTENT") # Also keep cached embeddings in the embedding_cache table
+    embedding_cache_max_entries: int = Field(default=20_000, alias="EMBEDDING_CACHE_MAX_ENTRIES", ge=0) # Embeddings kept in memory before LRU eviction
+    embedding_bulk_batch_size: int = Field(default=5000, alias="EMBEDDING_BULK_BATCH_SIZE", ge=1) # Rows per COPY when bulk writing embeddings
+    embedding_bulk_min_rows: int = Field(default=500, alias="EMBEDDING_BULK_MIN_ROWS", ge=1) # Smaller writes go through the ORM
+
+    # --- Vector Search ---
+    vector_search_mode: str = Field(default="full", alias="VECTOR_SEARCH_MODE") # 'full', 'halfvec', or 'binary' with a full precision rerank
+    vector_search_rerank_factor: int = Field(default=4, alias="VECTOR_SEARCH_RERANK_FACTOR", ge=1) # Binary search shortlists k times this many candidates
+    vector_search_dual_read: bool = Field(default=False, alias="VECTOR_SEARCH_DUAL_READ") # Also run full precision searches and log the recall of the configured mode
+    vector_search_ef_search: int = Field(default=40, alias="VECTOR_SEARCH_EF_SEARCH", ge=1, le=1000) # HNSW candidate list size, raised to k when lower, pgvector allows at most 1000
+    vector_search_iterative_scan: str = Field(default="relaxed_order", alias="VECTOR_SEARCH_ITERATIVE_SCAN") # 'off', 'strict_order' or 'relaxed_order' for filtered searches, needs pgvector >= 0.8.0
+    vector_search_max_scan_tuples: int = Field(default=20000, alias="VECTOR_SEARCH_MAX_SCAN_TUPLES", ge=1) # Upper bound of index tuples an iterative scan visits
+    vector_search_hybrid: bool = Field(default=True, alias="VECTOR_SEARCH_HYBRID") # Fuse full-text and trigram matches into the vector ranking of similarity_search
+    vector_search_hybrid_candidates: int = Field(default=50, alias="VECTOR_SEARCH_HYBRID_CANDIDATES", ge=1) # Rows taken from each ranking before fusion
+    vector_search_hybrid_max_terms: int = Field(default=16, alias="VECTOR_SEARCH_HYBRID_MAX_TERMS", ge=1) # Query words used for lexical matching
+    vector_search_rrf_k: int = Field(default=60, alias="VECTOR_SEARCH_RRF_K", ge=1) # Reciprocal rank fusion constant, higher flattens the rank differences
+
+    # --- In-Process Vector Index ---
+    vector_index_enabled: bool = Field(default=False, alias="VECTOR_INDEX_ENABLED") # Serve searches scoped to one source_identifier from process memory
+    vector_index_max_rows: int = Field(default=200_000, alias="VECTOR_INDEX_MAX_ROWS", ge=1) # Embeddings held across all slices, about 3 KB each at 768 dimensions
+    vector_index_max_slice_rows: int = Field(default=50_000, alias="VECTOR_INDEX_MAX_SLICE_ROWS", ge=1) # Larger source identifiers are only searched in Postgres
+    vector_index_refresh_seconds: float = Field(default=5.0, alias="VECTOR_INDEX_REFRESH_SECONDS", ge=0) # Interval of incremental refreshes of a searched slice
+    vector_index_refresh_overlap_seconds: float = Field(default=60.0, alias="VECTOR_INDEX_REFRESH_OVERLAP_SECONDS", ge=0) # Refreshes also re-read changes this far before the last sync
+    vector_index_full_reload_seconds: float = Field(default=900.0, alias="VECTOR_INDEX_FULL_RELOAD_SECONDS", gt=0) # Slices are reloaded in full after this long
 
     # --- Database ---
     database_url: PostgresDsn = Field(alias="DATABASE_URL")
@@ -48,6 +89,37 @@ class Settings(BaseSettings):
     r2_secret_access_key: str = Field(alias="R2_SECRET_ACCESS_KEY")
     r2_bucket_name: str = Field(alias="R2_BUCKET_NAME")
     r2_endpoint_url: str = Field(alias="R2_ENDPOINT_URL")
+    r2_pipelined_upload: bool = Field(default=True, alias="R2_PIPELINED_UPLOAD") # Upload Parquet parts to R2 while the CSV is still being converted
+    r2_multipart_threshold: int = Field(default=16 * 1024 * 1024, alias="R2_MULTIPART_THRESHOLD", ge=5 * 1024 * 1024) # Objects at least this large are uploaded in parts
+    r2_multipart_min_chunksize: int = Field(default=8 * 1024 * 1024, alias="R2_MULTIPART_MIN_CHUNKSIZE", ge=5 * 1024 * 1024) # Smallest part size, grown for large objects to stay under the part limit
+    r2_multipart_max_concurrency: int = Field(default=10, alias="R2_MULTIPART_MAX_CONCURRENCY", ge=1) # Max parts uploaded in parallel for a single object
+
+    # --- DuckDB ---
+    duckdb_threads: int = Field(default=4, alias="DUCKDB_THREADS", ge=1) # Threads DuckDB uses per query, sandboxes split them between pool slots
+    duckdb_memory_limit: str = Field(default="2GB", alias="DUCKDB_MEMORY_LIMIT") # Memory limit of the shared DuckDB database, e.g. '2GB', sandboxes split it between pool slots
+    duckdb_pool_size: int = Field(default=8, alias="DUCKDB_POOL_SIZE", ge=1) # Max cursors and sandboxes checked out at once
+    duckdb_pool_timeout: int = Field(default=30, alias="DUCKDB_POOL_TIMEOUT", ge=1) # Seconds to wait for a free cursor or sandbox
+
+    # --- Parquet Cache ---
+    parquet_cache_enabled: bool = Field(default=True, alias="PARQUET_CACHE_ENABLED")
+    parquet_cache_dir: str = Field(default="tmp/parquet_cache", alias="PARQUET_CACHE_DIR") # Local directory holding cached Parquet objects
+    parquet_cache_max_bytes: int = Field(default=10 * 1024**3, alias="PARQUET_CACHE_MAX_BYTES", ge=0) # Total size of the cache before LRU eviction
+    parquet_cache_revalidate_seconds: int = Field(default=60, alias="PARQUET_CACHE_REVALIDATE_SECONDS", ge=0) # How long a cached ETag is trusted before checking R2 again
+
+    # --- Query Result Cache ---
+    query_cache_enabled: bool = Field(default=True, alias="QUERY_CACHE_ENABLED")
+    query_cache_ttl_seconds: int = Field(default=300, alias="QUERY_CACHE_TTL_SECONDS", ge=1) # How long a query result is served from the cache
+    query_cache_max_bytes: int = Field(default=256 * 1024 * 1024, alias="QUERY_CACHE_MAX_BYTES", ge=0) # Total size of cached results before LRU eviction
+    query_cache_max_entry_bytes: int = Field(default=16 * 1024 * 1024, alias="QUERY_CACHE_MAX_ENTRY_BYTES", ge=0) # Larger results are not cached
+
+    # --- Upload Query ---
+    upload_query_page_size: int = Field(default=10_000, alias="UPLOAD_QUERY_PAGE_SIZE", ge=1) # Rows per page when the client does not ask for a page size
+    upload_query_max_page_size: int = Field(default=100_000, alias="UPLOAD_QUERY_MAX_PAGE_SIZE", ge=1) # Largest page a client can ask for
+    upload_query_max_offset: int = Field(default=1_000_000, alias="UPLOAD_QUERY_MAX_OFFSET", ge=0) # Furthest row a page can start at, every page sorts the rows before it
+    upload_query_batch_rows: int = Field(default=8192, alias="UPLOAD_QUERY_BATCH_ROWS", ge=1) # Rows per streamed chunk
+
+    # --- Upload Ingestion ---
+    csv_read_block_size: int = Field(default=16 * 1024 * 1024, alias="CSV_READ_BLOCK_SIZE", ge=1024) # Bytes of CSV parsed per batch, each batch becomes one Parquet row group
 
 
     model_config = SettingsConfigDict(
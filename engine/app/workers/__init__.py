@@ -1,5 +1,7 @@
 from .threadpool_worker_queue import ThreadPoolWorkerQueue
+from .processpool_worker import ProcessPoolWorker
 
 __all__ = [
     "ThreadPoolWorkerQueue",
+    "ProcessPoolWorker",
 ]
\ No newline at end of file
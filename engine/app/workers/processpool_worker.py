@@ -0,0 +1,73 @@
+import asyncio
+import functools
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable
+from app.utils import APP_LOGGER_NAME
+
+logger = logging.getLogger(APP_LOGGER_NAME)
+
+class ProcessPoolWorker:
+    """
+    A bounded process pool for handling CPU-bound tasks from the event loop.
+
+    Tasks are executed in separate worker processes and awaited without blocking the loop.
+    At most `max_pending` tasks are handed to the pool at once, any further callers wait
+    for a free slot, so a burst of work queues up instead of growing without bound.
+    """
+    def __init__(self, num_workers=4, max_pending=None):
+        """
+        Initializes the process pool.
+
+        Args:
+            num_workers (int): The number of worker processes to run.
+            max_pending (int): The maximum number of tasks submitted to the pool at once,
+            defaults to `num_workers`.
+        """
+        self.num_workers = num_workers
+        self.max_pending = max_pending or num_workers
+
+        # 'spawn' avoids forking the parent's event loop, threads and open connections into the workers.
+        self._executor = ProcessPoolExecutor(
+            max_workers=num_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        self._slots = asyncio.Semaphore(self.max_pending)
+        self._waiting = 0
+
+    @property
+    def waiting(self) -> int:
+        """Number of tasks currently waiting for a free slot."""
+        return self._waiting
+
+    async def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Runs a task in a worker process and returns its result.
+
+        Args:
+            func: A picklable, module level function to execute.
+            *args: Positional arguments for the function.
+            **kwargs: Keyword arguments for the function.
+        """
+        self._waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self._waiting -= 1
+
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+        finally:
+            self._slots.release()
+
+    def shutdown(self, wait=True):
+        """
+        Shuts down the process pool.
+
+        Args:
+            wait (bool): If True, waits for the running tasks to complete before returning.
+        """
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)
+        logger.info("Process pool worker has been shut down.")
@@ -0,0 +1,94 @@
+"""
+Benchmark for the streaming CSV to Parquet conversion used by `POST /upload/csv`.
+
+Generates a synthetic CSV of the requested size on disk, converts it with
+`csv_service.convert_csv_to_parquet_stream` and reports throughput and the peak RSS
+of the API process and of the conversion worker. Peak memory should stay flat as `--size-gb` grows.
+
+Usage:
+    uv run python -m benchmarks.csv_to_parquet --size-gb 2 --max-rss-mb 1024
+"""
+import argparse
+import asyncio
+import os
+import random
+import resource
+import tempfile
+import time
+
+from app.services.upload import csv as csv_service
+from app.workers import ProcessPoolWorker
+
+HEADER = "id,signup_dt,country,plan,revenue,sessions,churned\n"
+COUNTRIES = ["IN", "US", "DE", "BR", "JP", "GB", "FR", "NG"]
+PLANS = ["free", "starter", "pro", "enterprise"]
+
+
+def _generate_csv(path: str, size_bytes: int) -> int:
+    """Writes a synthetic CSV of at least `size_bytes` bytes, returns the number of rows."""
+    rng = random.Random(42)
+    rows = 0
+
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(HEADER)
+        written = len(HEADER)
+
+        while written < size_bytes:
+            lines = []
+            for _ in range(10_000):
+                rows += 1
+                lines.append(
+                    f"{rows},2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d},{rng.choice(COUNTRIES)},"
+                    f"{rng.choice(PLANS)},{rng.uniform(0, 5000):.2f},{rng.randint(0, 400)},{rng.random() < 0.1}\n"
+                )
+            chunk = "".join(lines)
+            f.write(chunk)
+            written += len(chunk)
+
+    return rows
+
+
+def _peak_rss_mb(who: int = resource.RUSAGE_SELF) -> float:
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(who).ru_maxrss / 1024
+
+
+async def main(size_gb: float, max_rss_mb: float | None):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        csv_path = os.path.join(tmp_dir, "synthetic.csv")
+
+        print(f"Generating {size_gb} GB synthetic CSV at {csv_path} ...")
+        rows = _generate_csv(csv_path, int(size_gb * 1024**3))
+        csv_size = os.path.getsize(csv_path)
+        baseline_rss = _peak_rss_mb()
+
+        process_pool = ProcessPoolWorker(num_workers=1)
+
+        start = time.perf_counter()
+        parquet_file = await csv_service.convert_csv_to_parquet_stream(csv_path, process_pool)
+        elapsed = time.perf_counter() - start
+
+        parquet_size = parquet_file.seek(0, os.SEEK_END)
+        parquet_file.close()
+
+        # Shutting down reaps the worker process, so its peak RSS shows up under RUSAGE_CHILDREN
+        process_pool.shutdown()
+        peak_rss = max(_peak_rss_mb(), _peak_rss_mb(resource.RUSAGE_CHILDREN))
+
+        print(f"Rows:          {rows}")
+        print(f"CSV size:      {csv_size / 1024**2:.1f} MiB")
+        print(f"Parquet size:  {parquet_size / 1024**2:.1f} MiB")
+        print(f"Elapsed:       {elapsed:.2f} s ({csv_size / 1024**2 / elapsed:.1f} MiB/s)")
+        print(f"Peak RSS:      {peak_rss:.1f} MiB (API process baseline {baseline_rss:.1f} MiB)")
+
+        if max_rss_mb is not None and peak_rss > max_rss_mb:
+            raise SystemExit(f"Peak RSS {peak_rss:.1f} MiB exceeded the bound of {max_rss_mb} MiB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-gb", type=float, default=2.0, help="Size of the synthetic CSV in GB.")
+    parser.add_argument("--max-rss-mb", type=float, default=None, help="Fail if peak RSS exceeds this bound.")
+    args = parser.parse_args()
+
+    asyncio.run(main(args.size_gb, args.max_rss_mb))
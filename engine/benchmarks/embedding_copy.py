@@ -0,0 +1,88 @@
+"""
+Benchmark for bulk writes into `vector_embeddings`.
+
+Writes synthetic 768-dimensional embeddings through the ORM (`db.add_all`) and through
+`copy_embeddings` (binary COPY) and reports rows per second for each. Runs against the
+database in `DATABASE_URL`, every write is rolled back unless `--keep` is passed.
+
+Usage:
+    uv run python -m benchmarks.embedding_copy --rows 200000 --orm-rows 10000
+    uv run python -m benchmarks.embedding_copy --rows 1000000 --batch-size 10000 --defer-index
+"""
+import argparse
+import asyncio
+import time
+
+import numpy as np
+
+from app.db.models.vector_embedding import EmbeddingSourceType, VectorEmbedding as EmbeddingModel
+from app.db.session import AsyncSessionLocal
+from app.llm.embeddings import EMBEDDING_DIMENSIONS, copy_embeddings
+
+
+def _synthetic_embeddings(rows: int, seed: int = 42):
+    """Yields `rows` embeddings with random unit vectors, generated in chunks to bound memory."""
+    rng = np.random.default_rng(seed)
+    produced = 0
+
+    while produced < rows:
+        chunk = min(10_000, rows - produced)
+        vectors = rng.standard_normal((chunk, EMBEDDING_DIMENSIONS), dtype=np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+        for vector in vectors:
+            produced += 1
+            yield EmbeddingModel(
+                source_type=EmbeddingSourceType.CSV_COLUMN,
+                source_identifier="benchmark",
+                column_or_chunk_name=f"column_{produced}",
+                original_text=f"benchmark column {produced}",
+                embedding=vector,
+            )
+
+
+async def _bench_orm(rows: int, keep: bool) -> float:
+    async with AsyncSessionLocal() as db:
+        started = time.perf_counter()
+
+        db.add_all(list(_synthetic_embeddings(rows)))
+        await db.flush()
+
+        seconds = time.perf_counter() - started
+        await (db.commit() if keep else db.rollback())
+
+    return rows / seconds
+
+
+async def _bench_copy(rows: int, batch_size: int, defer_index: bool, keep: bool) -> float:
+    async with AsyncSessionLocal() as db:
+        stats = await copy_embeddings(db, _synthetic_embeddings(rows), batch_size=batch_size, defer_index=defer_index)
+        await (db.commit() if keep else db.rollback())
+
+    return stats.rows_per_second
+
+
+async def main(rows: int, orm_rows: int, batch_size: int, defer_index: bool, keep: bool):
+    if orm_rows:
+        print(f"ORM add_all: writing {orm_rows} rows ...")
+        orm_rate = await _bench_orm(orm_rows, keep)
+        print(f"  {orm_rate:,.0f} rows/s")
+
+    print(f"COPY: writing {rows} rows in batches of {batch_size}{' with deferred HNSW indexes' if defer_index else ''} ...")
+    copy_rate = await _bench_copy(rows, batch_size, defer_index, keep)
+    print(f"  {copy_rate:,.0f} rows/s")
+
+    if orm_rows:
+        print(f"COPY is {copy_rate / orm_rate:.1f}x the ORM throughput")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000, help="Rows written with COPY.")
+    parser.add_argument("--orm-rows", type=int, default=10_000, help="Rows written through the ORM, 0 to skip.")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Rows per COPY.")
+    parser.add_argument("--defer-index", action="store_true", help="Drop and rebuild HNSW indexes around the COPY.")
+    parser.add_argument("--keep", action="store_true", help="Commit the rows instead of rolling back.")
+    args = parser.parse_args()
+
+    asyncio.run(main(args.rows, args.orm_rows, args.batch_size, args.defer_index, args.keep))
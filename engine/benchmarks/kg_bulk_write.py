@@ -0,0 +1,82 @@
+"""
+Benchmark for bulk writes of Metrics Nodes into the Knowledge Graph.
+
+Writes `--nodes` synthetic nodes with random 768-dimensional embeddings through
+`KnowledgeGraph.add_metrics_nodes` for every combination of `--batch-sizes` and
+`--concurrency` and reports nodes per second. Runs against the graph in `NEO4J_URI`,
+each run writes under its own `source_id` and deletes its nodes afterwards unless
+`--keep` is passed.
+
+Usage:
+    uv run python -m benchmarks.kg_bulk_write --nodes 100000
+    uv run python -m benchmarks.kg_bulk_write --nodes 100000 --batch-sizes 500 2000 --concurrency 1 8
+"""
+import argparse
+import asyncio
+import uuid
+
+import numpy as np
+
+from app.kg import KnowledgeGraph
+from app.kg._schema import KgMetricsNode
+from app.llm.embeddings import EMBEDDING_DIMENSIONS
+from app.settings.config import settings
+
+
+def _synthetic_nodes(count: int, source_id: str, seed: int = 42) -> list[KgMetricsNode]:
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((count, EMBEDDING_DIMENSIONS), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    return [
+        KgMetricsNode(raw_metric=f"metric_{i}", embedding=vector.tolist(), source_id=source_id)
+        for i, vector in enumerate(vectors)
+    ]
+
+
+async def _delete_source(kg: KnowledgeGraph, source_id: str):
+    while True:
+        result = await kg.write(
+            "MATCH (n:Node {source_id: $source_id}) WITH n LIMIT 10000 DETACH DELETE n RETURN count(*) AS deleted",
+            {"source_id": source_id},
+        )
+        if not result or not result[0]["deleted"]:
+            break
+
+
+async def main(nodes: int, batch_sizes: list[int], concurrency: list[int], keep: bool):
+    kg = KnowledgeGraph()
+    await kg.initialize()
+
+    print(f"Generating {nodes} nodes ...")
+    template = _synthetic_nodes(nodes, source_id="")
+
+    print(f"{'batch size':>12}{'concurrency':>13}{'seconds':>10}{'nodes/s':>12}")
+
+    try:
+        for batch_size in batch_sizes:
+            for parallel in concurrency:
+                source_id = f"benchmark-{uuid.uuid4().hex}"
+                for node in template:
+                    node.source_id = source_id
+
+                settings.neo4j_write_concurrency = parallel
+                result = await kg.add_metrics_nodes(template, batch_size=batch_size)
+
+                print(f"{batch_size:>12}{parallel:>13}{result.seconds:>10.2f}{result.nodes_per_second:>12,.0f}")
+
+                if not keep:
+                    await _delete_source(kg, source_id)
+    finally:
+        await kg.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, default=100_000, help="Nodes written per run.")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1000], help="Nodes per transaction, one run each.")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4], help="Transactions in flight, one run each.")
+    parser.add_argument("--keep", action="store_true", help="Keep the written nodes instead of deleting them.")
+    args = parser.parse_args()
+
+    asyncio.run(main(args.nodes, args.batch_sizes, args.concurrency, args.keep))
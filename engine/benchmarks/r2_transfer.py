@@ -0,0 +1,115 @@
+"""
+Benchmark for R2Client uploads against a local S3 compatible stand-in.
+
+Uploads random objects of increasing size with the size-adaptive transfer configuration
+of `R2Client` and with the previous fixed 25 KB part size, and reports throughput and the
+number of parts used for each.
+
+By default a moto server is started in-process (`pip install "moto[server]"`), pass
+`--endpoint-url` to run against another stand-in such as MinIO instead.
+
+Usage:
+    uv run python -m benchmarks.r2_transfer --sizes-mb 1 16 64 256
+"""
+import argparse
+import io
+import math
+import os
+import time
+
+BUCKET_NAME = "benchmark"
+LEGACY_CHUNKSIZE = 1024 * 25
+
+
+def _configure_environment(endpoint_url: str):
+    # Point the settings at the stand-in before the app reads them
+    os.environ["R2_ENDPOINT_URL"] = endpoint_url
+    os.environ["R2_BUCKET_NAME"] = BUCKET_NAME
+    os.environ.setdefault("R2_ACCOUNT_ID", "benchmark")
+    os.environ.setdefault("R2_ACCESS_KEY_ID", "benchmark")
+    os.environ.setdefault("R2_SECRET_ACCESS_KEY", "benchmark")
+
+
+def _create_bucket(endpoint_url: str):
+    import boto3
+
+    # R2 uses the 'auto' region which stand-ins reject for bucket creation, so use a plain client here
+    s3 = boto3.client(
+        "s3",
+        endpoint_url=endpoint_url,
+        aws_access_key_id=os.environ["R2_ACCESS_KEY_ID"],
+        aws_secret_access_key=os.environ["R2_SECRET_ACCESS_KEY"],
+        region_name="us-east-1",
+    )
+    try:
+        s3.create_bucket(Bucket=BUCKET_NAME)
+    except s3.exceptions.BucketAlreadyOwnedByYou:
+        pass
+
+
+def _run(sizes_mb: list[float], skip_legacy: bool):
+    import boto3.s3.transfer
+    from s3transfer.utils import ChunksizeAdjuster
+    from app.cloud import R2Client
+
+    r2_client = R2Client()
+
+    print(f"{'size':>10} {'config':>9} {'part size':>10} {'parts':>6} {'threads':>7} {'seconds':>8} {'MiB/s':>8}")
+
+    for size_mb in sizes_mb:
+        size = int(size_mb * 1024 * 1024)
+        payload = os.urandom(size)
+
+        configs = [("adaptive", r2_client.transfer_config_for(size))]
+        if not skip_legacy:
+            configs.append(("legacy", boto3.s3.transfer.TransferConfig(
+                multipart_threshold=LEGACY_CHUNKSIZE,
+                max_concurrency=10,
+                multipart_chunksize=LEGACY_CHUNKSIZE,
+                use_threads=True,
+            )))
+
+        for name, config in configs:
+            # s3transfer silently raises part sizes below the 5 MiB minimum, report what is actually used
+            chunksize = ChunksizeAdjuster().adjust_chunksize(config.multipart_chunksize, size)
+            parts = 1 if size < config.multipart_threshold else math.ceil(size / chunksize)
+
+            start = time.perf_counter()
+            r2_client._client.upload_fileobj(io.BytesIO(payload), BUCKET_NAME, f"benchmark/{name}/{size}", Config=config)
+            elapsed = time.perf_counter() - start
+
+            print(
+                f"{size_mb:>8} MB {name:>9} {chunksize / 1024**2:>7.2f} MB {parts:>6} "
+                f"{config.max_concurrency:>7} {elapsed:>8.2f} {size_mb / elapsed:>8.1f}"
+            )
+
+    r2_client.close()
+
+
+def main(sizes_mb: list[float], endpoint_url: str | None, skip_legacy: bool):
+    server = None
+
+    if endpoint_url is None:
+        from moto.server import ThreadedMotoServer
+
+        server = ThreadedMotoServer(port=5055, verbose=False)
+        server.start()
+        endpoint_url = "http://127.0.0.1:5055"
+
+    try:
+        _configure_environment(endpoint_url)
+        _create_bucket(endpoint_url)
+        _run(sizes_mb, skip_legacy)
+    finally:
+        if server is not None:
+            server.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes-mb", type=float, nargs="+", default=[1, 16, 64, 256], help="Object sizes to upload, in MB.")
+    parser.add_argument("--endpoint-url", default=None, help="Endpoint of an S3 compatible stand-in, starts moto when omitted.")
+    parser.add_argument("--skip-legacy", action="store_true", help="Only run the adaptive configuration.")
+    args = parser.parse_args()
+
+    main(args.sizes_mb, args.endpoint_url, args.skip_legacy)
@@ -0,0 +1,98 @@
+"""
+Benchmark for the vector search modes of `vector_embeddings`.
+
+Embeds sample queries with random unit vectors, searches them in every mode of
+`nearest_embeddings_stmt` and reports recall@k against an exact (index free) scan,
+median latency per mode and the on-disk size of each HNSW index. Runs against the
+database in `DATABASE_URL`, which should already hold a representative number of rows,
+e.g. written with `benchmarks.embedding_copy --keep`.
+
+Usage:
+    uv run python -m benchmarks.vector_search --queries 100 --k 10
+    uv run python -m benchmarks.vector_search --k 20 --rerank-factor 8
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import numpy as np
+from sqlalchemy import select, text
+
+from app.db.models.vector_embedding import VectorEmbedding as EmbeddingModel
+from app.db.session import AsyncSessionLocal
+from app.llm.embeddings import EMBEDDING_DIMENSIONS
+from app.services.vector_search import VECTOR_SEARCH_MODES, nearest_embeddings_stmt
+from app.settings.config import settings
+
+_INDEXES = {
+    "full": "idx_vector_embeddings_embedding",
+    "halfvec": "ix_vector_embeddings_embedding_halfvec",
+    "binary": "ix_vector_embeddings_embedding_bq",
+}
+
+
+def _random_queries(count: int, seed: int = 7) -> list[list[float]]:
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((count, EMBEDDING_DIMENSIONS), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors.tolist()
+
+
+async def _exact_ids(db, query: list[float], k: int) -> set:
+    # Disabling index scans inside the transaction forces a sequential scan, i.e. the exact top k
+    await db.execute(text("SET LOCAL enable_indexscan = off"))
+    result = await db.execute(
+        select(EmbeddingModel.id)
+        .where(EmbeddingModel.deleted_at.is_(None))
+        .order_by(EmbeddingModel.embedding.cosine_distance(query))
+        .limit(k)
+    )
+    ids = set(result.scalars().all())
+    await db.execute(text("SET LOCAL enable_indexscan = on"))
+    return ids
+
+
+async def _index_sizes(db) -> dict[str, int]:
+    sizes = {}
+    for mode, index_name in _INDEXES.items():
+        result = await db.execute(text("SELECT pg_relation_size(to_regclass(:name))"), {"name": index_name})
+        sizes[mode] = result.scalar() or 0
+    return sizes
+
+
+async def main(queries: int, k: int):
+    vectors = _random_queries(queries)
+
+    async with AsyncSessionLocal() as db:
+        exact = [await _exact_ids(db, query, k) for query in vectors]
+
+        print(f"{'mode':<10}{'recall@' + str(k):>12}{'p50 ms':>10}{'index MB':>12}")
+        sizes = await _index_sizes(db)
+
+        for mode in VECTOR_SEARCH_MODES:
+            recalls, latencies = [], []
+
+            for query, expected in zip(vectors, exact):
+                started = time.perf_counter()
+                result = await db.execute(nearest_embeddings_stmt(query, k, mode).with_only_columns(EmbeddingModel.id))
+                ids = set(result.scalars().all())
+                latencies.append((time.perf_counter() - started) * 1000)
+                recalls.append(len(ids & expected) / len(expected) if expected else 1.0)
+
+            print(f"{mode:<10}{statistics.mean(recalls):>12.3f}{statistics.median(latencies):>10.2f}{sizes[mode] / 2**20:>12.1f}")
+
+        await db.rollback()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=50, help="Number of random queries.")
+    parser.add_argument("--k", type=int, default=10, help="Neighbours returned per query.")
+    parser.add_argument("--rerank-factor", type=int, default=None, help="Overrides VECTOR_SEARCH_RERANK_FACTOR for binary search.")
+    args = parser.parse_args()
+
+    if args.rerank_factor:
+        settings.vector_search_rerank_factor = args.rerank_factor
+
+    asyncio.run(main(args.queries, args.k))
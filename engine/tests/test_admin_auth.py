@@ -0,0 +1,45 @@
+import pytest
+from fastapi import APIRouter, Depends, FastAPI
+from fastapi.testclient import TestClient
+from app.api.deps import require_admin
+from app.settings.config import settings
+
+
+@pytest.fixture
+def client() -> TestClient:
+    router = APIRouter()
+
+    @router.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    app = FastAPI()
+    app.include_router(router, prefix="/admin", dependencies=[Depends(require_admin)])
+
+    return TestClient(app)
+
+
+def test_disabled_without_configured_token(client, monkeypatch):
+    monkeypatch.setattr(settings, "admin_api_token", None)
+
+    response = client.get("/admin/ping", headers={"X-Admin-Token": "anything"})
+
+    assert response.status_code == 403
+
+
+@pytest.mark.parametrize("headers", [{}, {"X-Admin-Token": ""}, {"X-Admin-Token": "wrong"}])
+def test_rejects_missing_or_invalid_token(client, monkeypatch, headers):
+    monkeypatch.setattr(settings, "admin_api_token", "s3cret")
+
+    response = client.get("/admin/ping", headers=headers)
+
+    assert response.status_code == 401
+
+
+def test_accepts_configured_token(client, monkeypatch):
+    monkeypatch.setattr(settings, "admin_api_token", "s3cret")
+
+    response = client.get("/admin/ping", headers={"X-Admin-Token": "s3cret"})
+
+    assert response.status_code == 200
+    assert response.json() == {"ok": True}
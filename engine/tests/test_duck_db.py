@@ -0,0 +1,132 @@
+import asyncio
+import duckdb
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from app.services import duck_db
+from app.services.duck_db import DuckDBConn
+
+
+@pytest.fixture
+def parquet_path(tmp_path) -> str:
+    path = str(tmp_path / "data.parquet")
+    pq.write_table(pa.table({"id": list(range(100)), "name": [f"name_{i}" for i in range(100)]}), path)
+    return path
+
+
+def test_cursor_state_does_not_leak_between_checkouts(pool):
+    with DuckDBConn() as duckdb_conn:
+        duckdb_conn.conn.execute("CREATE TEMP TABLE scratch (a INTEGER)")
+
+    with DuckDBConn() as duckdb_conn:
+        tables = duckdb_conn.conn.execute("SELECT table_name FROM duckdb_tables() WHERE temporary").fetchall()
+
+    assert tables == []
+
+
+def test_checkout_times_out_when_pool_is_full(pool):
+    with DuckDBConn(), DuckDBConn():
+        with pytest.raises(TimeoutError):
+            with DuckDBConn():
+                pass
+
+    with DuckDBConn() as duckdb_conn:
+        assert duckdb_conn.conn.execute("SELECT 1").fetchone() == (1,)
+
+
+def test_async_checkout(pool):
+    async def checkout():
+        async with DuckDBConn() as duckdb_conn:
+            return duckdb_conn.conn.execute("SELECT 1").fetchone()
+
+    assert asyncio.run(checkout()) == (1,)
+
+
+def test_sandbox_reads_only_allowed_paths(pool, parquet_path, tmp_path):
+    other_path = str(tmp_path / "other.parquet")
+    pq.write_table(pa.table({"secret": [1]}), other_path)
+
+    with DuckDBConn(sandbox_paths=[parquet_path], sandbox_views={"upload": parquet_path}) as duckdb_conn:
+        conn = duckdb_conn.conn
+
+        assert conn.execute("SELECT count(*) FROM upload").fetchone() == (100,)
+        assert conn.execute("SELECT count(*) FROM read_parquet(?)", (parquet_path,)).fetchone() == (100,)
+
+        for sql_query in [
+            f"SELECT * FROM read_parquet('{other_path}')",
+            "SELECT * FROM read_text('/etc/hostname')",
+            f"ATTACH '{tmp_path / 'attached.db'}'",
+            f"COPY (SELECT 1) TO '{tmp_path / 'out.csv'}'",
+            "SET enable_external_access = true",
+            "SET GLOBAL threads = 1",
+        ]:
+            with pytest.raises(duckdb.Error):
+                conn.execute(sql_query)
+
+
+def test_sandbox_objects_are_dropped_on_release(pool, parquet_path):
+    with DuckDBConn(sandbox_paths=[parquet_path]) as duckdb_conn:
+        duckdb_conn.conn.execute("CREATE TABLE leftover AS SELECT 1 AS a")
+
+    with DuckDBConn() as duckdb_conn:
+        assert duckdb_conn.conn.execute("SELECT count(*) FROM duckdb_tables()").fetchone() == (0,)
+
+    with DuckDBConn(sandbox_paths=[parquet_path]) as duckdb_conn:
+        assert duckdb_conn.conn.execute("SELECT count(*) FROM duckdb_tables()").fetchone() == (0,)
+
+
+def test_sql_literal_escapes_quotes():
+    assert duck_db._sql_literal("it's") == "'it''s'"
+
+
+def test_sandbox_is_reused_for_the_same_paths(pool, parquet_path, monkeypatch):
+    created = []
+    create_sandbox = pool._create_sandbox
+    monkeypatch.setattr(pool, "_create_sandbox", lambda *args: created.append(args) or create_sandbox(*args))
+
+    for _ in range(3):
+        with DuckDBConn(sandbox_paths=[parquet_path], sandbox_views={"upload": parquet_path}) as duckdb_conn:
+            duckdb_conn.conn.execute("CREATE TEMP TABLE scratch AS SELECT 1 AS a")
+            assert duckdb_conn.conn.execute("SELECT count(*) FROM upload").fetchone() == (100,)
+
+    assert len(created) == 1
+
+
+def test_changed_sandbox_is_not_reused(pool, parquet_path):
+    with DuckDBConn(sandbox_paths=[parquet_path], sandbox_views={"upload": parquet_path}) as duckdb_conn:
+        duckdb_conn.conn.execute("CREATE OR REPLACE VIEW upload AS SELECT 1 AS id")
+
+    with DuckDBConn(sandbox_paths=[parquet_path], sandbox_views={"upload": parquet_path}) as duckdb_conn:
+        assert duckdb_conn.conn.execute("SELECT count(*) FROM upload").fetchone() == (100,)
+
+
+def test_idle_sandboxes_are_bounded_by_pool_size(pool, tmp_path):
+    for i in range(4):
+        path = str(tmp_path / f"data_{i}.parquet")
+        pq.write_table(pa.table({"id": [i]}), path)
+        with DuckDBConn(sandbox_paths=[path]):
+            pass
+
+    assert pool._idle_count == 2
+    assert len(pool._idle_sandboxes) == 2
+
+
+def test_sandbox_limits_are_split_between_slots(pool, parquet_path, monkeypatch):
+    monkeypatch.setattr(duck_db.settings, "duckdb_memory_limit", "2GB")
+    monkeypatch.setattr(duck_db.settings, "duckdb_threads", 4)
+    duck_db.SingletonMeta._instances.pop(duck_db.DuckDBPool, None)
+
+    with DuckDBConn(sandbox_paths=[parquet_path]) as duckdb_conn:
+        conn = duckdb_conn.conn
+        assert conn.execute("SELECT current_setting('threads')").fetchone() == (2,)
+        assert conn.execute("SELECT current_setting('memory_limit')").fetchone() == ("953.6 MiB",)
+
+    duck_db.DuckDBPool().close()
+
+
+def test_memory_limit_bytes():
+    assert duck_db._memory_limit_bytes("2GB") == 2 * 1000**3
+    assert duck_db._memory_limit_bytes("512 MiB") == 512 * 1024**2
+
+    with pytest.raises(ValueError):
+        duck_db._memory_limit_bytes("80%")
@@ -0,0 +1,58 @@
+import asyncio
+import pytest
+from sqlalchemy.dialects import postgresql
+from app.llm.embeddings import cache as embedding_cache
+from app.llm.embeddings.cache import EmbeddingCache
+from app.settings.config import settings
+from app.utils import SingletonMeta
+
+ASYNCPG_MAX_PARAMETERS = 32767
+
+
+class FakeSession:
+    """
+    Answers every lookup with the keys of `stored` it asks for, recording the bound parameters of each statement.
+    """
+    def __init__(self, stored: dict[tuple, list[float]]):
+        self.stored = stored
+        self.parameter_counts: list[int] = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+    async def execute(self, statement):
+        compiled = statement.compile(dialect=postgresql.dialect(), compile_kwargs={"render_postcompile": True})
+        self.parameter_counts.append(len(compiled.params))
+
+        values = list(compiled.params.values())
+        keys = [tuple(values[i:i + 3]) for i in range(0, len(values), 3)]
+
+        return [(*key, self.stored[key]) for key in keys if key in self.stored]
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    monkeypatch.setattr(settings, "embedding_cache_enabled", True)
+    monkeypatch.setattr(settings, "embedding_cache_persistent", True)
+    SingletonMeta._instances.pop(EmbeddingCache, None)
+
+    yield EmbeddingCache()
+
+    SingletonMeta._instances.pop(EmbeddingCache, None)
+
+
+def test_persistent_lookup_is_chunked_under_the_parameter_limit(cache, monkeypatch):
+    keys = [("model", "RETRIEVAL_QUERY", f"{i:064x}") for i in range(11_500)]
+    session = FakeSession({key: [float(i)] for i, key in enumerate(keys) if i % 2 == 0})
+    monkeypatch.setattr(embedding_cache, "AsyncSessionLocal", lambda: session)
+
+    found = asyncio.run(cache.aget_many(keys))
+
+    assert len(found) == 5_750
+    assert found[keys[11_498]] == [11_498.0]
+    assert len(session.parameter_counts) == 12
+    assert max(session.parameter_counts) <= ASYNCPG_MAX_PARAMETERS
+    assert cache.stats()["persistent_hits"] == 5_750 and cache.stats()["misses"] == 5_750
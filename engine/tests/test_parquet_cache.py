@@ -0,0 +1,167 @@
+import os
+import pytest
+from app.services import parquet_cache
+from app.services.parquet_cache import ParquetCache
+from app.settings.config import settings
+from app.utils import SingletonMeta
+
+
+class FakeR2Client:
+    """
+    Serves objects from a dict of storage key to (etag, content), counting requests.
+    """
+    def __init__(self):
+        self.objects: dict[str, tuple[str, bytes]] = {}
+        self.heads = 0
+        self.downloads = 0
+
+    def head_object(self, object_key: str) -> tuple[str, int]:
+        self.heads += 1
+        etag, content = self.objects[object_key]
+        return etag, len(content)
+
+    def download_file(self, object_key: str, file_path: str, object_size: int | None = None):
+        self.downloads += 1
+        with open(file_path, "wb") as f:
+            f.write(self.objects[object_key][1])
+
+
+@pytest.fixture
+def r2(monkeypatch) -> FakeR2Client:
+    client = FakeR2Client()
+    monkeypatch.setattr(parquet_cache, "R2Client", lambda: client)
+    return client
+
+
+@pytest.fixture
+def cache(monkeypatch, tmp_path, r2):
+    monkeypatch.setattr(settings, "parquet_cache_enabled", True)
+    monkeypatch.setattr(settings, "parquet_cache_dir", str(tmp_path / "cache"))
+    monkeypatch.setattr(settings, "parquet_cache_max_bytes", 100)
+    monkeypatch.setattr(settings, "parquet_cache_revalidate_seconds", 60)
+    os.makedirs(settings.parquet_cache_dir)
+    SingletonMeta._instances.pop(ParquetCache, None)
+
+    yield ParquetCache()
+
+    SingletonMeta._instances.pop(ParquetCache, None)
+
+
+def test_second_lease_is_a_hit(cache, r2):
+    r2.objects["a"] = ("e1", b"x" * 10)
+
+    with cache.lease("a") as first:
+        pass
+    with cache.lease("a") as second:
+        pass
+
+    assert first == second and os.path.exists(first)
+    assert r2.downloads == 1
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_large_object_is_read_remotely_once(cache, r2):
+    r2.objects["small"] = ("e1", b"x" * 10)
+    r2.objects["big"] = ("e1", b"y" * 90)
+
+    with cache.lease("small"):
+        pass
+
+    with cache.lease("big") as first:
+        pass
+
+    r2.heads = r2.downloads = 0
+
+    with cache.lease("big") as second:
+        assert open(second, "rb").read() == b"y" * 90
+
+    assert first == second
+    assert r2.heads == 0 and r2.downloads == 0
+
+
+def test_objects_larger_than_the_cache_are_read_remotely(cache, r2):
+    r2.objects["huge"] = ("e1", b"x" * 101)
+
+    with cache.lease("huge") as uri:
+        assert uri == f"s3://{settings.r2_bucket_name}/huge"
+
+    assert r2.downloads == 0
+
+
+def test_evicted_file_is_kept_until_released(cache, r2):
+    r2.objects["a"] = ("e1", b"x" * 60)
+    r2.objects["b"] = ("e1", b"y" * 60)
+
+    lease = cache.lease("a")
+
+    # Makes room for b by evicting a, which is still being read
+    with cache.lease("b"):
+        pass
+
+    assert os.path.exists(lease.uri)
+    assert cache.stats()["evictions"] == 1
+
+    lease.release()
+
+    assert not os.path.exists(lease.uri)
+
+
+def test_invalidated_file_is_kept_until_released(cache, r2):
+    r2.objects["a"] = ("e1", b"x" * 10)
+
+    with cache.lease("a") as path:
+        cache.invalidate("a")
+        assert os.path.exists(path)
+
+    assert not os.path.exists(path)
+
+
+def test_changed_object_is_downloaded_again(cache, r2, monkeypatch):
+    monkeypatch.setattr(cache, "_revalidate_seconds", 0)
+    r2.objects["a"] = ("e1", b"x" * 10)
+
+    with cache.lease("a") as old_path:
+        r2.objects["a"] = ("e2", b"z" * 10)
+
+        with cache.lease("a") as new_path:
+            assert new_path != old_path
+            with open(new_path, "rb") as f:
+                assert f.read() == b"z" * 10
+
+        assert os.path.exists(old_path)
+
+    assert r2.downloads == 2
+    assert not os.path.exists(old_path)
+
+
+def test_download_locks_are_dropped(cache, r2):
+    for i in range(5):
+        r2.objects[f"key_{i}"] = ("e1", b"x" * 30)
+        cache.lease(f"key_{i}").release()
+
+    assert cache._key_locks == {}
+
+
+def test_startup_only_removes_files_of_stopped_processes(monkeypatch, tmp_path, r2):
+    root = tmp_path / "shared"
+    stale_dir = root / "worker-999999999"
+    live_dir = root / f"worker-{os.getppid()}"
+    for directory in (stale_dir, live_dir):
+        directory.mkdir(parents=True)
+        (directory / "object.parquet").write_bytes(b"x")
+    (root / "unrelated.parquet").write_bytes(b"x")
+    (stale_dir / "notes.txt").write_text("keep")
+
+    monkeypatch.setattr(settings, "parquet_cache_enabled", True)
+    monkeypatch.setattr(settings, "parquet_cache_dir", str(root))
+    SingletonMeta._instances.pop(ParquetCache, None)
+
+    try:
+        ParquetCache()
+    finally:
+        SingletonMeta._instances.pop(ParquetCache, None)
+
+    assert not (stale_dir / "object.parquet").exists()
+    assert (stale_dir / "notes.txt").exists()
+    assert (live_dir / "object.parquet").exists()
+    assert (root / "unrelated.parquet").exists()
@@ -0,0 +1,59 @@
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from app.services.upload import parquet as parquet_service
+from app.settings.config import settings
+
+
+@pytest.fixture
+def small_blocks(monkeypatch):
+    monkeypatch.setattr(settings, "csv_read_block_size", 1024)
+
+
+def _write_csv(tmp_path, rows: list[str]) -> str:
+    csv_path = tmp_path / "data.csv"
+    csv_path.write_text("\n".join(rows) + "\n")
+    return str(csv_path)
+
+
+def test_converts_all_rows(tmp_path, small_blocks):
+    csv_path = _write_csv(tmp_path, ["id,name"] + [f"{i},name_{i}" for i in range(1000)])
+    parquet_path = str(tmp_path / "data.parquet")
+
+    rows = parquet_service.convert_csv_file_to_parquet(csv_path, parquet_path)
+
+    table = pq.read_table(parquet_path)
+    assert rows == table.num_rows == 1000
+    assert table.schema.field("id").type == pa.int64()
+    assert pq.ParquetFile(parquet_path).num_row_groups > 1
+
+
+def test_widens_int_column_with_float_after_first_block(tmp_path, small_blocks):
+    csv_path = _write_csv(tmp_path, ["amount,name"] + [f"{i},n" for i in range(1000)] + ["1.5,n"])
+    parquet_path = str(tmp_path / "data.parquet")
+
+    rows = parquet_service.convert_csv_file_to_parquet(csv_path, parquet_path)
+
+    table = pq.read_table(parquet_path)
+    assert rows == table.num_rows == 1001
+    assert table.schema.field("amount").type == pa.float64()
+    assert table.column("amount")[-1].as_py() == 1.5
+
+
+def test_widens_to_string_when_float_does_not_fit(tmp_path, small_blocks):
+    csv_path = _write_csv(tmp_path, ["amount,name"] + [f"{i},n" for i in range(1000)] + ["1.5,n", "unknown,n"])
+    parquet_path = str(tmp_path / "data.parquet")
+
+    parquet_service.convert_csv_file_to_parquet(csv_path, parquet_path)
+
+    table = pq.read_table(parquet_path)
+    assert table.schema.field("amount").type == pa.string()
+    assert table.column("amount").to_pylist()[-2:] == ["1.5", "unknown"]
+
+
+def test_empty_csv_is_rejected(tmp_path):
+    csv_path = tmp_path / "empty.csv"
+    csv_path.write_bytes(b"")
+
+    with pytest.raises(ValueError, match="empty"):
+        parquet_service.convert_csv_file_to_parquet(str(csv_path), str(tmp_path / "empty.parquet"))
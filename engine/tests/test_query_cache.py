@@ -0,0 +1,116 @@
+import pytest
+from app.services import query_cache
+from app.services.query_cache import QueryResultCache, normalize_sql
+from app.settings.config import settings
+from app.utils import SingletonMeta
+
+
+class FakeParquetCache:
+    def __init__(self):
+        self.etags: dict[str, str | None] = {}
+
+    def etag(self, storage_key: str) -> str | None:
+        return self.etags.get(storage_key)
+
+
+@pytest.fixture
+def parquet_cache(monkeypatch) -> FakeParquetCache:
+    fake = FakeParquetCache()
+    monkeypatch.setattr(query_cache, "ParquetCache", lambda: fake)
+    return fake
+
+
+@pytest.fixture
+def cache(monkeypatch, parquet_cache):
+    monkeypatch.setattr(settings, "query_cache_enabled", True)
+    monkeypatch.setattr(settings, "query_cache_ttl_seconds", 60)
+    monkeypatch.setattr(settings, "query_cache_max_bytes", 1000)
+    monkeypatch.setattr(settings, "query_cache_max_entry_bytes", 500)
+    SingletonMeta._instances.pop(QueryResultCache, None)
+
+    yield QueryResultCache()
+
+    SingletonMeta._instances.pop(QueryResultCache, None)
+
+
+class Counter:
+    def __init__(self, value=None):
+        self.calls = 0
+        self.value = value if value is not None else [(1, "a")]
+
+    def __call__(self):
+        self.calls += 1
+        return self.value
+
+
+def test_normalize_sql_keeps_quoted_text():
+    assert normalize_sql("SELECT  *\n FROM t WHERE a = '  x  ';  ") == "SELECT * FROM t WHERE a = '  x  '"
+
+
+def test_equivalent_sql_is_a_hit(cache, parquet_cache):
+    parquet_cache.etags["a"] = "e1"
+    execute = Counter()
+
+    first = cache.fetch("a", "SELECT * FROM read_parquet(?)", execute)
+    second = cache.fetch("a", "SELECT *\n  FROM read_parquet(?);", execute)
+
+    assert first == second
+    assert execute.calls == 1
+    assert cache.stats()["hits"] == 1
+
+
+def test_changed_object_is_a_miss(cache, parquet_cache):
+    parquet_cache.etags["a"] = "e1"
+    execute = Counter()
+
+    cache.fetch("a", "SELECT 1", execute)
+    parquet_cache.etags["a"] = "e2"
+    cache.fetch("a", "SELECT 1", execute)
+
+    assert execute.calls == 2
+
+
+def test_key_parts_are_part_of_the_key(cache, parquet_cache):
+    parquet_cache.etags["a"] = "e1"
+    execute = Counter()
+
+    cache.fetch("a", "SELECT 1", execute, key_parts=(10,))
+    cache.fetch("a", "SELECT 1", execute, key_parts=(20,))
+
+    assert execute.calls == 2
+
+
+def test_results_are_not_cached_without_etag(cache, parquet_cache):
+    execute = Counter()
+
+    cache.fetch("missing", "SELECT 1", execute)
+    cache.fetch("missing", "SELECT 1", execute)
+
+    assert execute.calls == 2
+
+
+def test_large_results_are_rejected_and_lru_evicted(cache, parquet_cache):
+    parquet_cache.etags["a"] = "e1"
+
+    cache.fetch("a", "SELECT 'large'", Counter(), sizeof=lambda _: 600)
+    assert cache.stats()["rejected"] == 1
+
+    for i in range(3):
+        cache.fetch("a", f"SELECT {i}", Counter(), sizeof=lambda _: 400)
+
+    stats = cache.stats()
+    assert stats["entries"] == 2 and stats["evictions"] == 1 and stats["total_bytes"] == 800
+
+
+def test_errors_are_not_cached(cache, parquet_cache):
+    parquet_cache.etags["a"] = "e1"
+
+    def fail():
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        cache.fetch("a", "SELECT 1", fail)
+
+    execute = Counter()
+    cache.fetch("a", "SELECT 1", execute)
+    assert execute.calls == 1
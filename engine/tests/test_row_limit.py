@@ -0,0 +1,63 @@
+import duckdb
+import pytest
+from app.services.duck_db import execute_with_row_limit
+
+
+@pytest.fixture
+def conn():
+    conn = duckdb.connect(database=":memory:")
+    conn.execute("CREATE TABLE numbers AS SELECT range AS n FROM range(1000)")
+    yield conn
+    conn.close()
+
+
+def test_truncates_to_max_rows(conn):
+    table, truncated = execute_with_row_limit(conn, "SELECT n FROM numbers", max_rows=10)
+
+    assert table.num_rows == 10
+    assert truncated
+
+
+def test_result_at_the_limit_is_not_truncated(conn):
+    table, truncated = execute_with_row_limit(conn, "SELECT n FROM numbers WHERE n < 10;", max_rows=10)
+
+    assert table.num_rows == 10
+    assert not truncated
+
+
+def test_order_by_is_kept_through_the_wrapper(conn):
+    table, _ = execute_with_row_limit(conn, "SELECT n FROM numbers ORDER BY n DESC", max_rows=5)
+
+    assert table.column("n").to_pylist() == [999, 998, 997, 996, 995]
+
+
+def test_inner_limit_below_max_rows(conn):
+    table, truncated = execute_with_row_limit(conn, "SELECT n FROM numbers ORDER BY n LIMIT 3", max_rows=10)
+
+    assert table.column("n").to_pylist() == [0, 1, 2]
+    assert not truncated
+
+
+def test_parameters_are_passed(conn):
+    table, _ = execute_with_row_limit(conn, "SELECT n FROM numbers WHERE n >= ? ORDER BY n", (995,), max_rows=10)
+
+    assert table.column("n").to_pylist() == [995, 996, 997, 998, 999]
+
+
+def test_statements_that_cannot_be_wrapped_fall_back(conn):
+    conn.execute("CREATE TABLE wide AS SELECT 1 AS a, 2 AS b, 3 AS c")
+
+    table, truncated = execute_with_row_limit(conn, "PRAGMA table_info('wide')", max_rows=2)
+
+    assert table.num_rows == 2
+    assert truncated
+    assert table.column("name").to_pylist() == ["a", "b"]
+
+
+def test_fallback_with_empty_result():
+    conn = duckdb.connect(database=":memory:")
+
+    table, truncated = execute_with_row_limit(conn, "PRAGMA show_tables", max_rows=10)
+
+    assert table.num_rows == 0
+    assert not truncated
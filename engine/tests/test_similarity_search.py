@@ -0,0 +1,82 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+from app.llm.tools.search import similarity_search as search_tool
+from app.settings.config import settings
+
+
+class FakeEmbedder:
+    async def agenerate_embeddings(self, content: list[str]):
+        return [SimpleNamespace(values=[float(i + 1)] * 3) for i, _ in enumerate(content)]
+
+
+class FakeSession:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+
+def _embedding(name: str):
+    return SimpleNamespace(
+        id=name,
+        source_type=SimpleNamespace(value="csv"),
+        source_identifier="upload",
+        related_id=None,
+        column_or_chunk_name=name,
+        original_text=None,
+    )
+
+
+@pytest.fixture(autouse=True)
+def fakes(monkeypatch):
+    monkeypatch.setattr(search_tool, "Embedder", FakeEmbedder)
+    monkeypatch.setattr(search_tool, "AsyncSessionLocal", FakeSession)
+
+
+def test_hybrid_batch_search_passes_query_texts(monkeypatch):
+    monkeypatch.setattr(settings, "vector_search_hybrid", True)
+    calls = []
+
+    async def hybrid_batch(db, query_texts, query_embeddings, k, filters, source_type=None):
+        calls.append(query_texts)
+        return [[_embedding(text)] for text in query_texts]
+
+    monkeypatch.setattr(search_tool, "hybrid_search_embeddings_batch", hybrid_batch)
+
+    results = asyncio.run(search_tool.batch_similarity_search(["signup date", "revenue"], k=3))
+
+    assert calls == [["signup date", "revenue"]]
+    assert [result.results[0].column_or_chunk_name for result in results] == ["signup date", "revenue"]
+
+
+def test_in_memory_batch_search_passes_query_texts(monkeypatch):
+    monkeypatch.setattr(settings, "vector_search_hybrid", True)
+    calls = []
+
+    class FakeIndex:
+        enabled = True
+
+        def search_batch(self, source_identifier, query_embeddings, k, source_type=None, query_texts=None):
+            calls.append(query_texts)
+            return [[] for _ in query_embeddings]
+
+    monkeypatch.setattr(search_tool, "InMemoryVectorIndex", FakeIndex)
+
+    asyncio.run(search_tool.batch_similarity_search(["signup date"], additional_filters={"source_identifier": "upload"}))
+
+    assert calls == [["signup date"]]
+
+
+def test_batch_search_database_error_gives_empty_results(monkeypatch):
+    monkeypatch.setattr(settings, "vector_search_hybrid", False)
+
+    async def failing_batch(*args, **kwargs):
+        raise RuntimeError("connection lost")
+
+    monkeypatch.setattr(search_tool, "search_embeddings_batch", failing_batch)
+
+    results = asyncio.run(search_tool.batch_similarity_search(["signup date", "revenue"]))
+
+    assert [(result.query_str, result.results) for result in results] == [("signup date", []), ("revenue", [])]
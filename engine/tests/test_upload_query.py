@@ -0,0 +1,78 @@
+import duckdb
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from app.services.upload import query as query_service
+
+
+@pytest.fixture
+def parquet_path(tmp_path) -> str:
+    path = str(tmp_path / "upload.parquet")
+    pq.write_table(pa.table({"id": list(range(1000)), "group": [i % 37 for i in range(1000)]}), path)
+    return path
+
+
+def _read_pages(parquet_path: str, sql_query: str, page_size: int) -> list[dict]:
+    rows, offset, has_more = [], 0, True
+
+    while has_more:
+        page, has_more = query_service.run_page(parquet_path, sql_query, offset, page_size)
+        for batch in query_service.iter_page_batches(page):
+            rows.extend(batch.to_pylist())
+        offset += page_size
+
+    return rows
+
+
+def test_pages_of_an_unordered_query_cover_every_row_once(pool, parquet_path):
+    rows = _read_pages(parquet_path, 'SELECT "group", count(*) AS n FROM upload GROUP BY "group"', page_size=10)
+
+    assert len(rows) == 37
+    assert sorted(row["group"] for row in rows) == list(range(37))
+
+
+def test_pages_follow_the_query_order(pool, parquet_path):
+    rows = _read_pages(parquet_path, "SELECT id FROM upload ORDER BY id DESC;", page_size=300)
+
+    assert [row["id"] for row in rows] == list(range(999, -1, -1))
+
+
+def test_only_the_upload_is_readable(pool, parquet_path, tmp_path):
+    other_path = str(tmp_path / "other.parquet")
+    pq.write_table(pa.table({"secret": [1]}), other_path)
+
+    for sql_query in [f"SELECT * FROM read_parquet('{other_path}')", "SELECT * FROM read_text('/etc/hostname')"]:
+        with pytest.raises(duckdb.Error):
+            query_service.run_page(parquet_path, sql_query, 0, 10)
+
+
+@pytest.mark.parametrize("sql_query", [
+    "SELECT 1; SELECT 2",
+    "SET threads = 1",
+    "ATTACH 'other.db'",
+    "SELEC id FROM upload",
+])
+def test_only_a_single_select_is_accepted(pool, parquet_path, sql_query):
+    with pytest.raises(query_service.InvalidUploadQueryError):
+        query_service.run_page(parquet_path, sql_query, 0, 10)
+
+
+def test_page_runs_the_query_once(pool, parquet_path, monkeypatch):
+    page_sqls = []
+    page_sql = query_service._page_sql
+    monkeypatch.setattr(query_service, "_page_sql", lambda *args: page_sqls.append(args) or page_sql(*args))
+
+    page, has_more = query_service.run_page(parquet_path, "SELECT id FROM upload ORDER BY id", 990, 10)
+
+    assert page["id"].to_pylist() == list(range(990, 1000))
+    assert has_more is False
+    assert len(page_sqls) == 1
+
+
+def test_cursor_past_max_offset_is_rejected(monkeypatch):
+    monkeypatch.setattr(query_service.settings, "upload_query_max_offset", 100)
+    sql_query = "SELECT id FROM upload"
+    token = query_service.QueryCursor(offset=110, sql_hash=query_service.sql_hash(sql_query), etag="e1").encode()
+
+    with pytest.raises(query_service.InvalidQueryCursorError):
+        query_service.resolve_cursor(token, sql_query, "e1")
@@ -0,0 +1,219 @@
+import asyncio
+import datetime
+import time
+import uuid
+import numpy as np
+import pytest
+from app.db.models.vector_embedding import EMBEDDING_DIMENSIONS, EmbeddingSourceType
+from app.services import vector_index
+from app.services.vector_index import InMemoryVectorIndex
+from app.settings.config import settings
+from app.utils import SingletonMeta
+
+
+class FakeResult:
+    def __init__(self, value):
+        self._value = value
+
+    def scalar_one(self):
+        return self._value
+
+    def all(self):
+        return self._value
+
+
+class FakeDatabase:
+    """
+    Answers the index's two queries, the database time and then the rows of the slice.
+
+    `rows` maps source identifiers to (id, source type, related id, name, text, embedding, deleted_at) records.
+    """
+    def __init__(self):
+        self.rows: dict[str, list[tuple]] = {}
+        self.now = datetime.datetime(2026, 1, 1, tzinfo=datetime.timezone.utc)
+
+    def session(self):
+        return FakeSession(self)
+
+
+class FakeSession:
+    def __init__(self, database: FakeDatabase):
+        self._database = database
+        self._calls = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def execute(self, statement):
+        self._calls += 1
+        if self._calls == 1:
+            return FakeResult(self._database.now)
+
+        source_identifier = statement.compile().params["source_identifier_1"]
+        records = self._database.rows.get(source_identifier, [])
+
+        # A load reads the live rows, a refresh reads deleted ones too and gets deleted_at as a 7th column
+        if len(statement.selected_columns) == 6:
+            return FakeResult([record[:6] for record in records if record[6] is None])
+        return FakeResult(records)
+
+
+def _vector(*values: float) -> list[float]:
+    vector = [0.0] * EMBEDDING_DIMENSIONS
+    vector[:len(values)] = values
+    return vector
+
+
+def _record(name: str, vector: list[float], source_type=EmbeddingSourceType.CSV_COLUMN, deleted_at=None) -> tuple:
+    return (uuid.uuid4(), source_type, None, name, f"{name} column", vector, deleted_at)
+
+
+@pytest.fixture
+def database(monkeypatch) -> FakeDatabase:
+    database = FakeDatabase()
+    monkeypatch.setattr(vector_index, "AsyncSessionLocal", database.session)
+    return database
+
+
+@pytest.fixture
+def index(monkeypatch, database):
+    monkeypatch.setattr(settings, "vector_index_enabled", True)
+    monkeypatch.setattr(settings, "vector_index_max_rows", 5)
+    monkeypatch.setattr(settings, "vector_index_max_slice_rows", 4)
+    monkeypatch.setattr(settings, "vector_index_refresh_seconds", 3600)
+    SingletonMeta._instances.pop(InMemoryVectorIndex, None)
+
+    yield InMemoryVectorIndex()
+
+    SingletonMeta._instances.pop(InMemoryVectorIndex, None)
+
+
+async def _loaded(index: InMemoryVectorIndex, source_identifier: str):
+    """
+    Misses once to schedule the load of the slice and waits for it.
+    """
+    assert index.search(source_identifier, _vector(1.0), k=1) is None
+    await index._tasks[source_identifier]
+
+
+def test_miss_loads_the_slice_in_the_background(index, database):
+    database.rows["upload"] = [
+        _record("revenue", _vector(1.0, 0.0)),
+        _record("cost", _vector(0.0, 1.0)),
+        _record("margin", _vector(0.7, 0.7)),
+    ]
+
+    async def run():
+        await _loaded(index, "upload")
+        return index.search("upload", _vector(0.1, 1.0), k=2)
+
+    results = asyncio.run(run())
+
+    assert [result.column_or_chunk_name for result in results] == ["cost", "margin"]
+    assert results[0].source_identifier == "upload"
+    assert index.stats()["hits"] == 1 and index.stats()["misses"] == 1
+
+
+def test_search_matches_brute_force_cosine(index, database):
+    rng = np.random.default_rng(7)
+    vectors = rng.standard_normal((4, EMBEDDING_DIMENSIONS)).astype(np.float32)
+    database.rows["upload"] = [_record(f"column_{i}", vector.tolist()) for i, vector in enumerate(vectors)]
+    query = rng.standard_normal(EMBEDDING_DIMENSIONS).astype(np.float32)
+
+    async def run():
+        await _loaded(index, "upload")
+        return index.search("upload", query.tolist(), k=4)
+
+    results = asyncio.run(run())
+
+    cosine = vectors @ query / (np.linalg.norm(vectors, axis=1) * np.linalg.norm(query))
+    assert [result.column_or_chunk_name for result in results] == [f"column_{i}" for i in np.argsort(-cosine)]
+
+
+def test_source_type_filter(index, database):
+    database.rows["upload"] = [
+        _record("revenue", _vector(1.0)),
+        _record("notes", _vector(1.0), source_type=EmbeddingSourceType.PDF_CHUNK),
+    ]
+
+    async def run():
+        await _loaded(index, "upload")
+        return index.search("upload", _vector(1.0), k=5, source_type=EmbeddingSourceType.PDF_CHUNK)
+
+    assert [result.column_or_chunk_name for result in asyncio.run(run())] == ["notes"]
+
+
+def test_refresh_drops_soft_deleted_rows(index, database):
+    revenue = _record("revenue", _vector(1.0))
+    database.rows["upload"] = [revenue, _record("cost", _vector(0.0, 1.0))]
+
+    async def run():
+        await _loaded(index, "upload")
+
+        database.rows["upload"][0] = revenue[:6] + (database.now,)
+        database.now += datetime.timedelta(seconds=10)
+        index.mark_stale(["upload"])
+
+        # Served from the stale slice while the refresh runs
+        stale = index.search("upload", _vector(1.0), k=2)
+        await index._tasks["upload"]
+
+        return stale, index.search("upload", _vector(1.0), k=2)
+
+    stale, refreshed = asyncio.run(run())
+
+    assert len(stale) == 2
+    assert [result.column_or_chunk_name for result in refreshed] == ["cost"]
+
+
+def test_oversized_slices_are_not_loaded(index, database):
+    database.rows["large"] = [_record(f"column_{i}", _vector(1.0)) for i in range(5)]
+
+    async def run():
+        await _loaded(index, "large")
+        return index.search("large", _vector(1.0), k=1)
+
+    assert asyncio.run(run()) is None
+    assert index.stats()["slices"] == 0
+
+
+def test_finished_tasks_are_forgotten(index, database):
+    database.rows["upload"] = [_record("revenue", _vector(1.0))]
+
+    asyncio.run(_loaded(index, "upload"))
+
+    assert index._tasks == {}
+
+
+def test_expired_oversized_marks_are_dropped(index, database):
+    database.rows["large"] = [_record(f"column_{i}", _vector(1.0)) for i in range(5)]
+    index._oversized["gone"] = time.monotonic() - settings.vector_index_full_reload_seconds - 1
+
+    asyncio.run(_loaded(index, "large"))
+
+    assert list(index._oversized) == ["large"]
+
+
+def test_least_recently_used_slices_are_evicted(index, database):
+    database.rows["first"] = [_record(f"a_{i}", _vector(1.0)) for i in range(3)]
+    database.rows["second"] = [_record(f"b_{i}", _vector(1.0)) for i in range(3)]
+
+    async def run():
+        await _loaded(index, "first")
+        await _loaded(index, "second")
+
+    asyncio.run(run())
+
+    stats = index.stats()
+    assert stats["slices"] == 1 and stats["rows"] == 3 and stats["evictions"] == 1
+    assert "second" in index._slices
+
+
+def test_disabled_index_always_misses(index, monkeypatch):
+    monkeypatch.setattr(index, "_enabled", False)
+
+    assert index.search("upload", _vector(1.0), k=1) is None
+    assert index._tasks == {}